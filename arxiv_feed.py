@@ -0,0 +1,112 @@
+import logging
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+ENTRY_TAG = ATOM + "entry"
+# The ``AND submittedDate:[... TO ...]`` window of an incremental query
+DATE_WINDOW = re.compile(r"\s+AND\s+\w+:\[[^\]]*\]")
+
+
+class ArxivFeedClient:
+    """Streaming client for the arXiv Atom API.
+
+    Keeps one keep-alive ``requests.Session`` (gzip, timeouts, conditional
+    requests) and parses responses incrementally with ``iterparse``, yielding
+    each paper as soon as its ``<entry>`` closes and clearing it afterwards so
+    memory stays flat regardless of page size.
+    """
+
+    def __init__(
+        self,
+        timeout: Tuple[float, float] = (10.0, 60.0),
+        pool_size: int = 4,
+        user_agent: str = "ReSync-arXiv-fetcher/1.0",
+        session=None,
+    ):
+        self.timeout = timeout
+        # ``session`` substitutes a requests-compatible session (e.g. canned pages)
+        self.session = session if session is not None else requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"Accept-Encoding": "gzip", "User-Agent": user_agent, "Connection": "keep-alive"}
+        )
+        # query -> (ETag, Last-Modified) of the last full first-page response
+        self.validators: Dict[str, Tuple[str, str]] = {}
+
+    @staticmethod
+    def _validator_key(url: str) -> Optional[str]:
+        """Stable key for the first page of a query: its search without the date
+        window or paging, which change on every incremental fetch.
+
+        Later pages get no key; a 304 there would hide a page of a new window.
+        """
+        parts = urlsplit(url)
+        params = parse_qs(parts.query)
+        if params.get("start", ["0"])[0] != "0":
+            return None
+        search = DATE_WINDOW.sub("", params.get("search_query", [""])[0])
+        sort = params.get("sortBy", [""])[0], params.get("sortOrder", [""])[0]
+        return f"{parts.netloc}{parts.path}?{search}&{sort[0]}&{sort[1]}"
+
+    def iter_papers(self, url: str) -> Iterator[Dict]:
+        """Yield paper dicts from an Atom query URL while it downloads.
+
+        Yields nothing if the server answers 304 Not Modified.
+        """
+        headers = {}
+        key = self._validator_key(url)
+        etag, last_modified = self.validators.get(key, (None, None))
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                logging.info("arXiv feed not modified since last request")
+                return
+            response.raise_for_status()
+            if key is not None:
+                self.validators[key] = (
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
+            # Let urllib3 undo gzip while we read the raw stream
+            response.raw.decode_content = True
+
+            root = None
+            for event, elem in ET.iterparse(response.raw, events=("start", "end")):
+                if root is None and event == "start":
+                    root = elem
+                elif event == "end" and elem.tag == ENTRY_TAG:
+                    yield self._parse_entry(elem)
+                    elem.clear()
+                    root.remove(elem)
+
+    @staticmethod
+    def _parse_entry(entry) -> Dict:
+        """Build a paper dict from one ``<entry>`` in a single pass over its children"""
+        paper = {"authors": [], "categories": []}
+        for child in entry:
+            tag = child.tag[len(ATOM):] if child.tag.startswith(ATOM) else None
+            if tag == "id":
+                paper["id"] = child.text
+                paper["link"] = child.text
+            elif tag in ("title", "summary"):
+                paper[tag] = (child.text or "").replace("\n", " ")
+            elif tag in ("published", "updated"):
+                paper[tag] = child.text
+            elif tag == "author":
+                name = child.find(ATOM + "name")
+                if name is not None:
+                    paper["authors"].append(name.text)
+            elif tag == "category":
+                paper["categories"].append(child.get("term"))
+        return paper
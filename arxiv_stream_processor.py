@@ -1,14 +1,29 @@
-from confluent_kafka import Consumer, Producer, KafkaError
+from confluent_kafka import Consumer, KafkaError, TopicPartition
 import json
-import requests
-import xml.etree.ElementTree as ET
+import re
 from datetime import datetime, timedelta
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 import logging
+from functools import partial
+import heartbeat
 from dotenv import load_dotenv
-from confluent_kafka.admin import AdminClient, NewTopic
+from confluent_kafka.admin import AdminClient, NewPartitions, NewTopic
 from llm_client import LLMClient
+from arxiv_feed import ArxivFeedClient
+from checkpoint_store import CheckpointStore
+from dedup_store import DedupStore, DedupView
+from kafka_output import BatchingProducer
+from llm_cache import LLMResponseCache
+from metrics import COMMIT_SECONDS, FETCH_SECONDS, ITEMS, SCORE_TIERS, record_consumer_stats
+from near_duplicates import NearDuplicateIndex
+from offset_tracker import PartitionOffsetTracker
+from partition_state import MAX_SNAPSHOT_BYTES, TOPIC_CONFIG, PartitionStateTopic
+from rate_limiter import RateLimiter
+from scoring_cascade import ScoringCascade
+from serialization import TopicCodecs
+from tracing import TRACER, SpanContext
 from paper_filter import PaperFilter
 
 load_dotenv()
@@ -16,7 +31,25 @@ load_dotenv()
 
 class ArxivStreamProcessor:
     def __init__(
-        self, bootstrap_servers: str, api_key: str, api_secret: str, llm_api_key: str
+        self,
+        bootstrap_servers: str,
+        api_key: str,
+        api_secret: str,
+        llm_api_key: str,
+        llm_cache_path: Optional[str] = "llm_cache.db",
+        llm_requests_per_minute: Optional[int] = None,
+        llm_tokens_per_minute: Optional[int] = None,
+        producer_options: Optional[Dict] = None,
+        checkpoint_path: str = "arxiv_checkpoint.json",
+        dedup_path: Optional[str] = "arxiv_dedup.json",
+        dedup_read_only: bool = False,
+        near_duplicate_path: Optional[str] = "arxiv_near_duplicates.db",
+        prefilter_path: Optional[str] = "arxiv_prefilter.db",
+        num_partitions: int = 1,
+        partition_state_topic: Optional[str] = None,
+        serialization: Optional[Dict] = None,
+        clients: Optional[Dict] = None,
+        debug: bool = False,
     ):
         self.producer_config = {
             "bootstrap.servers": bootstrap_servers,
@@ -30,24 +63,96 @@ class ArxivStreamProcessor:
             **self.producer_config,
             "group.id": "arxiv_processor",
             "auto.offset.reset": "earliest",
+            "enable.auto.commit": False,
+            # Per-partition consumer lag for the metrics endpoint
+            "statistics.interval.ms": 15000,
+            "stats_cb": partial(record_consumer_stats, "arxiv_processor"),
         }
 
-        self.producer = Producer(self.producer_config)
-        self.consumer = Consumer(self.consumer_config)
-        self.llm_client = LLMClient(llm_api_key)
+        # ``clients`` may supply pre-built "producer", "consumer",
+        # "state_consumer", "admin", "llm" and "feed" clients in place of the
+        # real ones (see benchmarks/)
+        clients = clients or {}
+        # Wire format per topic (see serialization.TopicCodecs); JSON by default
+        self.codecs = TopicCodecs(serialization)
+        producer_config = self.producer_config
+        if partition_state_topic:
+            producer_config = {**producer_config, "message.max.bytes": MAX_SNAPSHOT_BYTES}
+        self.producer = BatchingProducer(
+            producer_config,
+            producer=clients.get("producer"),
+            precompressed=self.codecs.compresses,
+            **(producer_options or {}),
+        )
+        self.consumer = clients.get("consumer") or Consumer(self.consumer_config)
+        self.llm_cache = LLMResponseCache(path=llm_cache_path)
+        self.llm_client = LLMClient(
+            llm_api_key,
+            cache=self.llm_cache,
+            rate_limiter=RateLimiter(llm_requests_per_minute, llm_tokens_per_minute),
+            client=clients.get("llm"),
+        )
 
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
-        self.admin_client = AdminClient(self.producer_config)
-        self.processed_paper_ids = set()
+        self.admin_client = clients.get("admin") or AdminClient(self.producer_config)
+        # With partition_state_topic the scoring stage keeps one dedup store
+        # per input partition in that compacted topic, so whichever consumer
+        # is assigned a partition, on any host, loads its history
+        self.partition_state_topic = partition_state_topic
+        self.partition_state: Optional[PartitionStateTopic] = None
+        if partition_state_topic:
+            self.partition_state = PartitionStateTopic(
+                partition_state_topic,
+                self.producer,
+                clients.get("state_consumer") or Consumer({
+                    **self.producer_config,
+                    "group.id": "arxiv_processor_state",
+                    "enable.auto.commit": False,
+                }),
+            )
+        self.partition_dedup: Dict[Tuple[str, int], DedupStore] = {}
+        # Processed arXiv ids (with version), shared by the fetch and scoring
+        # stages. The scoring stage owns and saves the state; with
+        # ``dedup_read_only`` (a separate fetch process) it is only read,
+        # including the per-partition stores, and reloaded as it changes.
+        self.dedup_read_only = dedup_read_only
+        if dedup_read_only:
+            self.processed_paper_ids = DedupView(
+                [dedup_path] if dedup_path else [], self.partition_state
+            )
+        else:
+            self.processed_paper_ids = DedupStore(dedup_path)
+        # Scores of recently scored papers by abstract, so a new version or a
+        # near-identical paper reuses them instead of paying for LLM calls
+        self.near_duplicates = NearDuplicateIndex(near_duplicate_path)
+        # TF-IDF prefilter gating LLM scoring per context, set up by process_ideas
+        self.prefilter_path = prefilter_path
+        self.cascade: Optional[ScoringCascade] = None
+        # Small-model-first scoring settings, set up by process_ideas
+        self.model_tiers: Optional[Dict] = None
+        # Default partition count for topics this processor creates or grows
+        self.num_partitions = num_partitions
+        self._tracker: Optional[PartitionOffsetTracker] = None
+        # Whether the concurrent scorer has paused its partitions
+        self._paused = False
+        self.checkpoints = CheckpointStore(checkpoint_path)
+        self.feed_client = clients.get("feed") or ArxivFeedClient()
+        # Per-paper printing and logging is only worth its cost when debugging
+        self.debug = debug
 
     def create_topic_if_not_exists(
-        self, topic_name: str, num_partitions: int = 1, replication_factor: int = 3
+        self,
+        topic_name: str,
+        num_partitions: Optional[int] = None,
+        replication_factor: int = 3,
+        config: Optional[Dict] = None,
     ):
-        """Create a Kafka topic if it doesn't already exist"""
+        """Create a Kafka topic if it doesn't already exist, or grow its partitions"""
+        num_partitions = num_partitions or self.num_partitions
         topics = self.admin_client.list_topics().topics
         if topic_name not in topics:
-            new_topic = NewTopic(topic_name, num_partitions, replication_factor)
+            new_topic = NewTopic(topic_name, num_partitions, replication_factor, config=config or {})
             try:
                 self.admin_client.create_topics([new_topic])
                 self.logger.info(f"Created topic: {topic_name}")
@@ -55,56 +160,172 @@ class ArxivStreamProcessor:
                 time.sleep(5)
             except Exception as e:
                 self.logger.error(f"Error creating topic {topic_name}: {e}")
+        elif len(topics[topic_name].partitions) < num_partitions:
+            # Partitions can only be added, never removed, and this is safe online
+            try:
+                futures = self.admin_client.create_partitions(
+                    [NewPartitions(topic_name, num_partitions)]
+                )
+                for future in futures.values():
+                    future.result(timeout=30)
+                self.logger.info(
+                    f"Expanded topic {topic_name} to {num_partitions} partitions"
+                )
+            except Exception as e:
+                self.logger.error(f"Error expanding topic {topic_name}: {e}")
 
-    def fetch_arxiv_papers(
-        self, categories: List[str], max_results: int = 10
-    ) -> List[Dict]:
-        """Fetch recent papers from arXiv API with enhanced metadata"""
-        base_url = "http://export.arxiv.org/api/query?"
+    @staticmethod
+    def paper_partition_key(paper: Dict) -> str:
+        """Kafka key for a paper: its arXiv id without version, so every
+        version of a paper lands on the same partition"""
+        return re.sub(r"v\d+$", "", DedupStore.paper_key(paper["id"]))
+
+    def _dedup_for(self, topic: str, partition: int) -> DedupStore:
+        """Dedup store that owns this input partition"""
+        if self.partition_state is None:
+            return self.processed_paper_ids
+        store = self.partition_dedup.get((topic, partition))
+        if store is None:
+            store = DedupStore(None, sink=partial(self.partition_state.save, topic, partition))
+            state = self.partition_state.load(topic, partition)
+            if state is not None:
+                store.restore(state)
+            self.partition_dedup[(topic, partition)] = store
+        return store
+
+    def _save_dedup(self):
+        """Persist the shared dedup store, unless another process owns it"""
+        if not self.dedup_read_only:
+            self.processed_paper_ids.save()
+
+    def _mark_processed(self, topic: str, partition: int, paper_ids: List[str]):
+        ITEMS.labels("idea_scoring", "processed").inc(len(paper_ids))
+        store = self._dedup_for(topic, partition)
+        for paper_id in paper_ids:
+            store.add(paper_id)
+        store.maybe_save()
+
+    def _commit(self, message=None, **kwargs):
+        """Commit consumed offsets, timing the call"""
+        with TRACER.span("kafka.commit"), COMMIT_SECONDS.labels("arxiv_processor").time():
+            if message is not None:
+                self.consumer.commit(message, **kwargs)
+            else:
+                self.consumer.commit(**kwargs)
+
+    def _decode(self, msg) -> Tuple[Dict, Optional[SpanContext]]:
+        """Decode a consumed paper and the trace context it was produced under"""
+        trace_context = TRACER.extract(msg.headers())
+        with TRACER.span("ideas.decode", parent=trace_context):
+            return self.codecs.decode(msg), trace_context
+
+    def _on_assign(self, consumer, partitions):
+        """Load per-partition state for newly assigned partitions"""
+        self.logger.info(f"Assigned partitions: {[p.partition for p in partitions]}")
+        # A new assignment starts unpaused
+        self._paused = False
+        if self.partition_state is not None:
+            # Snapshots the previous owners saved on revocation
+            self.partition_state.refresh()
+            for tp in partitions:
+                self._dedup_for(tp.topic, tp.partition)
+
+    def _on_revoke(self, consumer, partitions):
+        """Hand revoked partitions over cleanly: deliver and commit finished
+        work, drop in-flight work (the new owner resumes from the committed
+        offset) and persist per-partition state for the new owner"""
+        self.logger.info(f"Revoking partitions: {[p.partition for p in partitions]}")
+        if self._tracker is not None:
+            self._release_scored_papers(self._tracker)
+            for tp in partitions:
+                dropped = self._tracker.forget(tp.topic, tp.partition)
+                if dropped:
+                    self.logger.info(
+                        f"Dropped {len(dropped)} in-flight papers from partition {tp.partition}"
+                    )
+        for tp in partitions:
+            store = self.partition_dedup.pop((tp.topic, tp.partition), None)
+            if store is not None:
+                store.save()
+        # Snapshots are delivered before the next owner reads them
+        self.producer.flush()
+        self._save_dedup()
+
+    def close(self):
+        """Leave the consumer group cleanly and persist local state.
+
+        Closing the consumer runs ``_on_revoke`` for the assigned partitions,
+        so finished work is delivered and committed before the process exits.
+        """
+        try:
+            self.consumer.close()
+        except Exception as e:
+            self.logger.error(f"Error closing consumer: {e}")
+        self.producer.flush()
+        self._save_dedup()
+        if self.partition_state is not None:
+            self.partition_state.close()
+        self.llm_cache.close()
+        self.near_duplicates.close()
+        if self.cascade is not None:
+            self.cascade.close()
 
-        last_processed_date = datetime.now() - timedelta(days=7)
-        date_query = last_processed_date.strftime("%Y%m%d")
+    def _arxiv_query_url(
+        self,
+        categories: List[str],
+        max_results: int = 10,
+        start: int = 0,
+        date_range: Optional[Tuple[datetime, datetime]] = None,
+        sort_by: str = "submittedDate",
+    ) -> str:
+        """Build an arXiv API query URL"""
+        base_url = "http://export.arxiv.org/api/query?"
 
         category_query = " OR ".join(f"cat:{cat}" for cat in categories)
-        query = f"search_query=({category_query})&sortBy=submittedDate&sortOrder=descending&max_results={max_results}"
+        search_query = f"({category_query})"
+        if date_range:
+            range_start, range_end = date_range
+            search_query += (
+                f" AND {sort_by}:[{range_start.strftime('%Y%m%d%H%M')}"
+                f" TO {range_end.strftime('%Y%m%d%H%M')}]"
+            )
+        query = f"search_query={search_query}&sortBy={sort_by}&sortOrder=descending&start={start}&max_results={max_results}"
+        return base_url + query
 
-        print(f"Fetching papers with query: {query}")   
+    def iter_arxiv_papers(self, categories: List[str], **query) -> Iterator[Dict]:
+        """Yield papers as their entries finish downloading (see ``fetch_arxiv_papers``)"""
+        url = self._arxiv_query_url(categories, **query)
+        print(f"Fetching papers with query: {url}")
+        return self.feed_client.iter_papers(url)
 
+    def fetch_arxiv_papers(
+        self,
+        categories: List[str],
+        max_results: int = 10,
+        start: int = 0,
+        date_range: Optional[Tuple[datetime, datetime]] = None,
+        sort_by: str = "submittedDate",
+        raise_errors: bool = False,
+    ) -> List[Dict]:
+        """Fetch recent papers from arXiv API with enhanced metadata
 
+        ``date_range`` restricts results to a ``sort_by`` date window and
+        ``start`` pages through the result set. Errors are logged and yield an
+        empty list unless ``raise_errors`` is set.
+        """
         try:
-            response = requests.get(base_url + query)
-            root = ET.fromstring(response.content)
-
-            papers = []
-            for entry in root.findall("{http://www.w3.org/2005/Atom}entry"):
-                authors = [
-                    author.find("{http://www.w3.org/2005/Atom}name").text
-                    for author in entry.findall("{http://www.w3.org/2005/Atom}author")
-                ]
-
-                paper = {
-                    "id": entry.find("{http://www.w3.org/2005/Atom}id").text,
-                    "title": entry.find(
-                        "{http://www.w3.org/2005/Atom}title"
-                    ).text.replace("\n", " "),
-                    "summary": entry.find(
-                        "{http://www.w3.org/2005/Atom}summary"
-                    ).text.replace("\n", " "),
-                    "categories": [
-                        cat.get("term")
-                        for cat in entry.findall(
-                            "{http://www.w3.org/2005/Atom}category"
-                        )
-                    ],
-                    "authors": authors,
-                    "published": entry.find(
-                        "{http://www.w3.org/2005/Atom}published"
-                    ).text,
-                    "updated": entry.find("{http://www.w3.org/2005/Atom}updated").text,
-                    "link": entry.find("{http://www.w3.org/2005/Atom}id").text,
-                }
-                papers.append(paper)
-            
+            with TRACER.span("arxiv.fetch", start=start), FETCH_SECONDS.labels("arxiv").time():
+                papers = list(
+                    self.iter_arxiv_papers(
+                        categories,
+                        max_results=max_results,
+                        start=start,
+                        date_range=date_range,
+                        sort_by=sort_by,
+                    )
+                )
+            ITEMS.labels("arxiv_fetch", "fetched").inc(len(papers))
+
             if papers:
                 self.last_processed_date = datetime.strptime(papers[0]['updated'], "%Y-%m-%dT%H:%M:%SZ")
 
@@ -112,81 +333,462 @@ class ArxivStreamProcessor:
             return papers
         except Exception as e:
             self.logger.error(f"Error fetching papers: {e}")
+            if raise_errors:
+                raise
             return []
 
-    def categorize_rank(self, paper: Dict, context: Dict) -> Optional[Dict]:
+    def _checkpoint_key(self, categories: List[str]) -> str:
+        return "arxiv:" + ",".join(sorted(categories))
+
+    def fetch_new_arxiv_papers(
+        self,
+        categories: List[str],
+        page_size: int = 100,
+        max_pages: int = 50,
+        initial_lookback: timedelta = timedelta(days=7),
+    ) -> Tuple[List[Dict], Optional[Dict]]:
+        """Fetch papers new or updated since the persisted high-watermark.
+
+        Pages through a ``lastUpdatedDate`` range query, newest first, until it
+        reaches the watermark. Returns the papers and the checkpoint to save
+        with ``save_checkpoint`` once they have been delivered downstream.
+        """
+        key = self._checkpoint_key(categories)
+        checkpoint = self.checkpoints.get(key)
+        if checkpoint:
+            watermark = datetime.strptime(checkpoint["watermark"], "%Y-%m-%dT%H:%M:%SZ")
+            boundary_ids = set(checkpoint.get("boundary_ids", []))
+        else:
+            watermark = datetime.utcnow() - initial_lookback
+            boundary_ids = set()
+
+        # arXiv date ranges have minute resolution, so start at the watermark's
+        # minute and drop already-seen entries below
+        date_range = (watermark.replace(second=0), datetime.utcnow() + timedelta(minutes=1))
+
+        papers = []
+        reached_watermark = False
+        for page in range(max_pages):
+            if page:
+                heartbeat.sleep(3)  # arXiv asks clients to wait 3s between calls
+            try:
+                batch = self.fetch_arxiv_papers(
+                    categories,
+                    max_results=page_size,
+                    start=page * page_size,
+                    date_range=date_range,
+                    sort_by="lastUpdatedDate",
+                    raise_errors=True,
+                )
+            except Exception:
+                # Keep the old watermark so the missed pages are retried
+                return papers, None
+            for paper in batch:
+                updated = datetime.strptime(paper["updated"], "%Y-%m-%dT%H:%M:%SZ")
+                if updated < watermark:
+                    reached_watermark = True
+                    break
+                if updated == watermark and paper["id"] in boundary_ids:
+                    continue
+                papers.append(paper)
+            if reached_watermark or len(batch) < page_size:
+                break
+        else:
+            self.logger.warning(
+                f"Stopped after {max_pages} pages before reaching watermark "
+                f"{watermark}; older updates in between are skipped"
+            )
+
+        if not papers:
+            return papers, None
+
+        latest = max(paper["updated"] for paper in papers)
+        new_boundary = {paper["id"] for paper in papers if paper["updated"] == latest}
+        if latest == watermark.strftime("%Y-%m-%dT%H:%M:%SZ"):
+            new_boundary |= boundary_ids
+        return papers, {"watermark": latest, "boundary_ids": sorted(new_boundary)}
+
+    def save_checkpoint(self, categories: List[str], checkpoint: Optional[Dict]):
+        """Persist the fetch checkpoint for these categories"""
+        if checkpoint:
+            self.checkpoints.set(self._checkpoint_key(categories), checkpoint)
+
+    def _format_context_profile(self, context: Dict) -> str:
+        """Render a company or project context as a prompt profile block"""
+        if "industry" in context:
+            lines = [
+                "Industry: " + context["industry"],
+                "Research Focus Areas: " + ", ".join(context["research_focus"]),
+                "Active Projects: " + ", ".join(context["current_projects"]),
+                "Core Technologies: " + ", ".join(context.get("core_technologies", [])),
+                "Available Resources: " + ", ".join(context.get("available_resources", [])),
+            ]
+        else:
+            lines = [
+                "Project Name: " + context["name"],
+                "Project Goals: " + ", ".join(context["goals"]),
+                "Current Challenges: " + ", ".join(context["challenges"]),
+                "Key Technologies: " + ", ".join(context.get("key_technologies", [])),
+            ]
+        return "\n        ".join(lines)
+
+    def _format_paper(self, paper: Dict) -> str:
+        """Render the paper fields shared by every scoring prompt"""
+        return f"""Title: {paper['title']}
+        Authors: {', '.join(paper['authors'])}
+        Summary: {paper['summary']}
+        Categories: {', '.join(paper['categories'])}"""
+
+    def _build_relevance_result(
+        self, paper: Dict, relevance_score: int, context_type: str, model_tier: str = "large"
+    ) -> Dict:
+        """Build the relevance record produced to the output topics"""
+        return {
+            "paper_id": paper["id"],
+            "paper_title": paper["title"],
+            "paper_link": paper["link"],
+            "relevance_score": relevance_score,
+            "timestamp": datetime.now().isoformat(),
+            "context_type": context_type,
+            "model_tier": model_tier,
+        }
+
+    def _relevance_cache_key(
+        self, paper: Dict, context: Dict, template: str, model: Optional[str] = None
+    ) -> str:
+        """Cache key for a (paper id+version, context, model, prompt template) score"""
+        return LLMResponseCache.make_key(
+            paper["id"],
+            LLMResponseCache.hash_context(context),
+            model or self.llm_client.model,
+            template,
+        )
+
+    def _tier_settings(self, tier: str, max_tokens: int) -> Dict:
+        """``generate`` options for a scoring call on ``tier`` ("small" or "large").
+
+        Without model tiers the client's defaults are used. With them both
+        tiers answer deterministically within ``max_tokens``, so a score only
+        depends on the paper, the context and the model.
+        """
+        if self.model_tiers is None:
+            return {}
+        if tier == "small":
+            model = self.model_tiers["small_model"]
+        else:
+            model = self.model_tiers.get("large_model") or self.llm_client.model
+        return {"model": model, "max_tokens": max_tokens, "temperature": 0.0}
+
+    def categorize_rank(self, paper: Dict, context: Dict, tier: str = "large") -> Optional[Dict]:
         """Generate relevance score for a paper based on the given context"""
-        is_company_context = "industry" in context
-        context_type = "Company" if is_company_context else "Project"
+        context_type = "Company" if "industry" in context else "Project"
 
         prompt = f"""
         Paper Analysis:
-        Title: {paper['title']}
-        Authors: {', '.join(paper['authors'])}
-        Summary: {paper['summary']}
-        Categories: {', '.join(paper['categories'])}
+        {self._format_paper(paper)}
         
         {context_type} Profile:
-        {"Industry: " + context['industry'] if is_company_context else "Project Name: " + context['name']}
-        {"Research Focus Areas: " + ', '.join(context['research_focus']) if is_company_context else "Project Goals: " + ', '.join(context['goals'])}
-        {"Active Projects: " + ', '.join(context['current_projects']) if is_company_context else "Current Challenges: " + ', '.join(context['challenges'])}
-        {"Core Technologies: " + ', '.join(context.get('core_technologies', [])) if is_company_context else "Key Technologies: " + ', '.join(context.get('key_technologies', []))}
-        {"Available Resources: " + ', '.join(context.get('available_resources', [])) if is_company_context else ""}
+        {self._format_context_profile(context)}
         
         Based on this information, please provide a relevance score from 0 to 100, where 100 is extremely relevant to the {context_type.lower()}'s goals and 0 is not relevant at all.
         
         Output only the numeric score (0-100) with no additional text or explanation.
         """
 
-        response = self.llm_client.generate(prompt)
-        if response:
-            try:
-                relevance_score = int(response.strip())
-                if 0 <= relevance_score <= 100:
-                    result = {
-                        "paper_id": paper["id"],
-                        "paper_title": paper["title"],
-                        "paper_link": paper["link"],
-                        "relevance_score": relevance_score,
-                        "timestamp": datetime.now().isoformat(),
-                        "context_type": context_type,
-                    }
-                    return result
-            except ValueError:
+        # A score is at most three digits
+        settings = self._tier_settings(tier, max_tokens=8)
+        cache_key = self._relevance_cache_key(
+            paper, context, "categorize_rank:v1", settings.get("model")
+        )
+        response = self.llm_client.generate(
+            prompt,
+            cache_key=cache_key,
+            validate=lambda response: self._parse_score(response) is not None,
+            **settings,
+        )
+        relevance_score = self._parse_score(response)
+        if relevance_score is None:
+            if response:
                 self.logger.error(f"Invalid relevance score: {response}")
-        return None
+            return None
+        return self._build_relevance_result(paper, relevance_score, context_type, tier)
+
+    @staticmethod
+    def _parse_score(response: Optional[str]) -> Optional[int]:
+        """The 0-100 relevance score in ``response``, or None if it is not one"""
+        try:
+            relevance_score = int(response.strip())
+        except (AttributeError, ValueError):
+            return None
+        return relevance_score if 0 <= relevance_score <= 100 else None
+
+    @staticmethod
+    def _parse_score_map(response: Optional[str], keys) -> Dict[str, int]:
+        """Valid 0-100 scores by key from a JSON score map response"""
+        try:
+            match = re.search(r"\{.*\}", response, re.DOTALL)
+            scores = json.loads(match.group(0) if match else response)
+        except (ValueError, TypeError):
+            return {}
+        if not isinstance(scores, dict):
+            return {}
+        parsed = {}
+        for key in keys:
+            try:
+                relevance_score = int(scores[key])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= relevance_score <= 100:
+                parsed[key] = relevance_score
+        return parsed
+
+    def categorize_rank_multi(
+        self, paper: Dict, contexts: Dict[str, Dict], tier: str = "large"
+    ) -> Dict[str, Dict]:
+        """Score a paper against several contexts with a single LLM call.
+
+        ``contexts`` maps a key (e.g. the output topic) to a company or project
+        context. Returns a map of the same keys to relevance records; contexts
+        the model did not score validly are left out.
+        """
+        if not contexts:
+            return {}
+
+        profiles = []
+        for key, context in contexts.items():
+            context_type = "Company" if "industry" in context else "Project"
+            profiles.append(
+                f"""[{key}] {context_type} Profile:
+        {self._format_context_profile(context)}"""
+            )
+        profiles_text = "\n\n        ".join(profiles)
+        keys_text = ", ".join(f'"{key}"' for key in contexts)
+
+        prompt = f"""
+        Paper Analysis:
+        {self._format_paper(paper)}
+        
+        {profiles_text}
+        
+        For each profile above, provide a relevance score from 0 to 100, where 100 is extremely relevant to that profile's goals and 0 is not relevant at all.
+        
+        Output only a JSON object mapping each profile key ({keys_text}) to its integer score, with no additional text or explanation.
+        """
+
+        # The JSON object: its keys plus a few tokens per score
+        settings = self._tier_settings(
+            tier, max_tokens=16 + 8 * len(contexts) + RateLimiter.estimate_tokens(keys_text)
+        )
+        cache_key = self._relevance_cache_key(
+            paper, contexts, "categorize_rank_multi:v1", settings.get("model")
+        )
+        # Only cache a map that scores every context
+        response = self.llm_client.generate(
+            prompt,
+            cache_key=cache_key,
+            validate=lambda response: len(self._parse_score_map(response, contexts))
+            == len(contexts),
+            **settings,
+        )
+        if not response:
+            return {}
+
+        scores = self._parse_score_map(response, contexts)
+        results = {}
+        for key, context in contexts.items():
+            if key not in scores:
+                self.logger.error(f"Missing or invalid score for context {key}: {response}")
+                continue
+            context_type = "Company" if "industry" in context else "Project"
+            results[key] = self._build_relevance_result(
+                paper, scores[key], context_type, tier
+            )
+        return results
+
+    def _categorize_rank_each(
+        self, paper: Dict, contexts: Dict[str, Dict], tier: str = "large"
+    ) -> Dict[str, Dict]:
+        """``categorize_rank`` once per context, keyed like ``categorize_rank_multi``"""
+        results = {}
+        for key, context in contexts.items():
+            idea = self.categorize_rank(paper, context, tier)
+            if idea:
+                results[key] = idea
+        return results
+
+    def _score_with_tiers(
+        self, contexts: Dict[str, Dict], score: Callable[[Dict[str, Dict], str], Dict[str, Dict]]
+    ) -> Dict[str, Dict]:
+        """Score ``contexts`` with ``score(contexts, tier)``, small model first if tiers are on.
+
+        Contexts the small model scored inside the uncertainty band, or did
+        not score validly, are rescored by the large model. If that fails too
+        the small model's score (if any) is kept.
+        """
+        if self.model_tiers is None:
+            results = score(contexts, "large")
+        else:
+            results = score(contexts, "small")
+            low, high = self.model_tiers["uncertainty_band"]
+            escalate = {
+                key: context
+                for key, context in contexts.items()
+                if key not in results or low <= results[key]["relevance_score"] <= high
+            }
+            if escalate:
+                results.update(score(escalate, "large"))
+        for idea in results.values():
+            SCORE_TIERS.labels(idea["model_tier"]).inc()
+        return {key: results[key] for key in contexts if key in results}
 
     def stream_papers_to_kafka(
-        self, categories: List[str], topic: str, company_context: Dict
+        self,
+        categories: List[str],
+        topic: str,
+        company_context: Dict,
+        incremental: bool = True,
+        max_results: int = 10,
     ):
-        """Stream relevant papers to Kafka topic"""
+        """Stream relevant papers to Kafka topic
+
+        With ``incremental`` only papers new or updated since the persisted
+        checkpoint are produced, and the checkpoint advances once they are
+        delivered. Otherwise the newest ``max_results`` papers are streamed to
+        the producer while the response is still downloading.
+        """
         self.create_topic_if_not_exists(topic)
 
         while True:
+            heartbeat.beat()
             try:
-                papers = self.fetch_arxiv_papers(categories=categories)
-            
+                if incremental:
+                    papers, checkpoint = self.fetch_new_arxiv_papers(categories)
+                else:
+                    # Stream entries straight to the producer as they are parsed
+                    papers = self.iter_arxiv_papers(categories, max_results=max_results)
+                    checkpoint = None
+
+                produced = 0
                 for paper in papers:
-                    self.producer.produce(
-                        topic, key=paper["id"], value=json.dumps(paper)
-                    )
+                    # Already scored under this id and version
+                    if paper["id"] in self.processed_paper_ids:
+                        ITEMS.labels("arxiv_fetch", "deduped").inc()
+                        continue
+                    # Each paper starts its own trace, followed downstream
+                    with TRACER.span("arxiv.produce", paper_id=paper["id"]) as span:
+                        value, headers = self.codecs.encode(topic, paper)
+                        self.producer.produce(
+                            topic,
+                            key=self.paper_partition_key(paper),
+                            value=value,
+                            headers=TRACER.inject(headers, span.context),
+                        )
+                    produced += 1
                 
 
-                self.producer.flush()
+                if self.producer.flush():
+                    self.save_checkpoint(categories, checkpoint)
+                    ITEMS.labels("arxiv_fetch", "produced").inc(produced)
                 self.logger.info(
-                    f"Fetched {len(papers)} papers successfully"
+                    f"Fetched {produced} papers successfully"
                 )
 
-                if len(self.processed_paper_ids) > 10000:
-                    self.processed_paper_ids = set(
-                        list(self.processed_paper_ids)[-10000:]
-                    )
-
-                time.sleep(120)
+                heartbeat.sleep(120)
 
             except Exception as e:
                 self.logger.error(f"Error in paper streaming: {e}")
-                time.sleep(120)
+                heartbeat.sleep(120)
+
+    def _score_paper(
+        self,
+        paper: Dict,
+        company: str,
+        company_context: Dict,
+        projects: Dict[str, Dict],
+        multi_context: bool = True,
+        trace_context: Optional[SpanContext] = None,
+    ) -> List[Tuple[str, Dict]]:
+        """Score a paper against the company and project contexts.
+
+        Returns ``(output_topic, idea)`` pairs, company first. A near-duplicate
+        of a recently scored paper (e.g. its next arXiv version) reuses that
+        paper's scores; its records name the original in ``duplicate_of``.
+        """
+        with TRACER.span("ideas.score", parent=trace_context, paper_id=paper["id"]):
+            paper_key = DedupStore.paper_key(paper["id"])
+            signature = self.near_duplicates.signature(
+                NearDuplicateIndex.text_of(paper["title"], paper["summary"])
+            )
+            # Scores are only reusable against the same contexts and models
+            scoring_key = LLMResponseCache.hash_context(
+                [company, company_context, projects, multi_context, self.llm_client.model,
+                 self.model_tiers]
+            )
+            match = self.near_duplicates.query(signature, exclude=paper_key)
+            if match is not None and match[2] and match[2].get("scoring") == scoring_key:
+                prior_id, similarity, prior = match
+                ITEMS.labels("idea_scoring", "near_duplicate").inc()
+                self.logger.debug(
+                    f"Reusing scores of {prior_id} for near-duplicate paper "
+                    f"{paper['id']} (similarity {similarity:.2f})"
+                )
+                # Re-index under this id so the entry stays inside the window
+                self.near_duplicates.add(paper_key, signature, prior)
+                ideas = []
+                for output_topic, relevance_score, context_type, model_tier in prior["scores"]:
+                    idea = self._build_relevance_result(
+                        paper, relevance_score, context_type, model_tier
+                    )
+                    idea["duplicate_of"] = prior_id
+                    ideas.append((output_topic, idea))
+                return ideas
+
+            ideas = self._score_contexts(
+                paper, company, company_context, projects, multi_context
+            )
+            if ideas:
+                self.near_duplicates.add(paper_key, signature, {
+                    "scoring": scoring_key,
+                    "scores": [
+                        [output_topic, idea["relevance_score"], idea["context_type"],
+                         idea["model_tier"]]
+                        for output_topic, idea in ideas
+                    ],
+                })
+            return ideas
+
+    def _score_contexts(
+        self,
+        paper: Dict,
+        company: str,
+        company_context: Dict,
+        projects: Dict[str, Dict],
+        multi_context: bool,
+    ) -> List[Tuple[str, Dict]]:
+        contexts = self._scoring_contexts(company, company_context, projects)
+        samples = {}
+        if self.cascade is not None:
+            # Only contexts the prefilter lets through go to the LLM
+            contexts, samples = self.cascade.select(paper)
+            if not contexts:
+                return []
+
+        score = self.categorize_rank_multi if multi_context else self._categorize_rank_each
+        ideas = list(self._score_with_tiers(contexts, partial(score, paper)).items())
+
+        if self.cascade is not None:
+            self.cascade.record(samples, ideas)
+        return ideas
+
+    @staticmethod
+    def _scoring_contexts(
+        company: str, company_context: Dict, projects: Dict[str, Dict]
+    ) -> Dict[str, Dict]:
+        """Contexts keyed by output topic, company first"""
+        contexts = {company: company_context}
+        for topic, context in projects.items():
+            contexts[f"{company}_{topic}"] = context
+        return contexts
 
     def process_ideas(
         self,
@@ -194,16 +796,76 @@ class ArxivStreamProcessor:
         company: str,
         company_context: Dict,
         projects: Dict[str, Dict],
+        multi_context: bool = True,
+        max_concurrency: int = 1,
+        batch_size: int = 1,
+        batch_timeout: float = 1.0,
+        prefilter: Optional[Dict] = None,
+        model_tiers: Optional[Dict] = None,
     ):
-        """Process papers and generate ideas with separate company and project outputs"""
+        """Process papers and generate ideas with separate company and project outputs.
+
+        With ``multi_context`` each paper is scored against the company and all
+        project contexts in one LLM call instead of one call per context.
+        ``max_concurrency`` > 1 scores that many papers at once on a thread
+        pool (see ``_process_ideas_concurrent``). ``batch_size`` > 1 consumes
+        up to that many messages at a time and commits once per batch (see
+        ``_process_ideas_batches``). ``prefilter`` enables the TF-IDF cascade
+        that skips the LLM for contexts a paper is clearly unrelated to; its
+        keys are ``ScoringCascade`` options such as ``target_recall``.
+
+        ``model_tiers`` scores each paper with ``small_model`` first and only
+        sends contexts whose score falls inside ``uncertainty_band``
+        (inclusive) to the large model (``large_model``, by default the
+        client's). Each record's ``model_tier`` says which one scored it.
+        """
+        if model_tiers is not None:
+            self.model_tiers = {
+                "small_model": "claude-3-5-haiku-20241022",
+                "uncertainty_band": [35, 75],
+                **model_tiers,
+            }
+        if prefilter is not None:
+            self.cascade = ScoringCascade(
+                company_context,
+                self._scoring_contexts(company, company_context, projects),
+                path=self.prefilter_path,
+                **prefilter,
+            )
         self.create_topic_if_not_exists(input_topic)
         self.create_topic_if_not_exists(company)
         for topic in projects.keys():
             self.create_topic_if_not_exists(f"{company}_{topic}")
-        self.consumer.subscribe([input_topic])
+        if self.partition_state_topic:
+            self.create_topic_if_not_exists(
+                self.partition_state_topic, num_partitions=1, config=TOPIC_CONFIG
+            )
+        self.consumer.subscribe(
+            [input_topic], on_assign=self._on_assign, on_revoke=self._on_revoke
+        )
+
+        if batch_size > 1:
+            self._process_ideas_batches(
+                company,
+                company_context,
+                projects,
+                multi_context,
+                max_concurrency,
+                batch_size,
+                batch_timeout,
+            )
+            return
+
+        if max_concurrency > 1:
+            self._process_ideas_concurrent(
+                company, company_context, projects, multi_context, max_concurrency
+            )
+            return
 
         while True:
+            heartbeat.beat()
             try:
+                poll_started = time.time()
                 msg = self.consumer.poll(1.0)
 
                 if msg is None:
@@ -215,48 +877,285 @@ class ArxivStreamProcessor:
                         self.logger.error(f"Consumer error: {msg.error()}")
                         break
 
-                paper = json.loads(msg.value())
-                
-                # Check if the paper has already been processed
-                if paper["id"] in self.processed_paper_ids:
-                    self.logger.info(f"Skipping already processed paper: {paper['id']}")
-                    self.consumer.commit(msg)
-                    continue
+                paper, trace_context = self._decode(msg)
+                TRACER.record_child("kafka.poll", trace_context, poll_started, time.time())
+
+                with TRACER.span("ideas.message", parent=trace_context, offset=msg.offset()):
+                    # Check if the paper has already been processed
+                    if paper["id"] in self._dedup_for(msg.topic(), msg.partition()):
+                        ITEMS.labels("idea_scoring", "deduped").inc()
+                        self.logger.debug(f"Skipping already processed paper: {paper['id']}")
+                        self._commit(msg)
+                        continue
 
-                company_idea = self.categorize_rank(paper, company_context)
+                    ideas = self._score_paper(
+                        paper, company, company_context, projects, multi_context
+                    )
+                    for output_topic, idea in ideas:
+                        self._produce_relevance(output_topic, paper["id"], idea)
+                        self._log_generated_idea(output_topic, idea)
 
-                if company_idea:
-                    self._produce_relevance(company, paper["id"], company_idea)
+                    # Commit the offset once the outputs for this message are delivered,
+                    # then mark the paper as processed
+                    if self.producer.flush():
+                        self._commit(msg)
+                        self._mark_processed(msg.topic(), msg.partition(), [paper["id"]])
+            except Exception as e:
+                self.logger.error(f"Error processing ideas: {e}")
+                heartbeat.sleep(60)
 
-                for topic, context in projects.items():
-                    project_idea = self.categorize_rank(paper, context)
-                    if project_idea:
-                        self._produce_relevance(f"{company}_{topic}", paper["id"], project_idea)
+    def _process_ideas_batches(
+        self,
+        company: str,
+        company_context: Dict,
+        projects: Dict[str, Dict],
+        multi_context: bool,
+        max_concurrency: int,
+        batch_size: int,
+        batch_timeout: float,
+    ):
+        """Consume up to ``batch_size`` messages or ``batch_timeout`` seconds at a
+        time, score the batch and make one asynchronous commit for it.
 
-                # Mark the paper as processed
-                self.processed_paper_ids.add(paper["id"])
-                self._log_generated_idea(f"Project ({topic})", project_idea)
+        A paper that fails to score is logged and skipped, as in
+        ``_release_scored_papers``. The commit names the batch's offsets
+        explicitly and is only made once its outputs are delivered; otherwise
+        the consumer seeks back so the batch is consumed again.
+        """
 
-                # Commit the offset after processing the message
-                self.consumer.commit(msg)
+        def score(paper, trace_context):
+            try:
+                return self._score_paper(
+                    paper, company, company_context, projects, multi_context, trace_context
+                )
             except Exception as e:
-                self.logger.error(f"Error processing ideas: {e}")
-                time.sleep(60)
+                self.logger.error(f"Error scoring paper {paper['id']}: {e}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            while True:
+                heartbeat.beat()
+                # First offset of the current batch per partition, to rewind to on failure
+                batch_start: Dict[Tuple[str, int], int] = {}
+                try:
+                    consume_started = time.time()
+                    messages = self.consumer.consume(
+                        num_messages=batch_size, timeout=batch_timeout
+                    )
+                    if not messages:
+                        continue
+                    consumed = time.time()
+
+                    papers = []
+                    sources = []
+                    contexts = []
+                    commit_offsets = {}
+                    for msg in messages:
+                        if msg.error():
+                            if msg.error().code() != KafkaError._PARTITION_EOF:
+                                self.logger.error(f"Consumer error: {msg.error()}")
+                            continue
+                        source = (msg.topic(), msg.partition())
+                        batch_start.setdefault(source, msg.offset())
+                        commit_offsets[source] = msg.offset() + 1
+                        try:
+                            paper, trace_context = self._decode(msg)
+                        except ValueError as e:
+                            self.logger.error(f"Invalid message at offset {msg.offset()}: {e}")
+                            continue
+                        TRACER.record_child("kafka.consume", trace_context, consume_started, consumed)
+                        if paper["id"] in self._dedup_for(*source):
+                            ITEMS.labels("idea_scoring", "deduped").inc()
+                            self.logger.debug(
+                                f"Skipping already processed paper: {paper['id']}"
+                            )
+                            continue
+                        papers.append(paper)
+                        sources.append(source)
+                        contexts.append(trace_context)
+
+                    # executor.map keeps the batch in offset order
+                    results = executor.map(score, papers, contexts)
+                    for paper, trace_context, ideas in zip(papers, contexts, results):
+                        # A large batch can take longer to score than the health timeout
+                        heartbeat.beat()
+                        for output_topic, idea in ideas:
+                            self._produce_relevance(
+                                output_topic, paper["id"], idea, trace_context
+                            )
+                            self._log_generated_idea(output_topic, idea)
+
+                    # One commit per batch, once its outputs are delivered
+                    with TRACER.span("ideas.batch_commit", size=len(papers)):
+                        if not self.producer.flush():
+                            raise RuntimeError("batch outputs were not delivered")
+                        if commit_offsets:
+                            self._commit(
+                                offsets=[
+                                    TopicPartition(topic, partition, offset)
+                                    for (topic, partition), offset in commit_offsets.items()
+                                ],
+                                asynchronous=True,
+                            )
+                        for (topic, partition), paper in zip(sources, papers):
+                            self._mark_processed(topic, partition, [paper["id"]])
+                except Exception as e:
+                    self.logger.error(f"Error processing ideas: {e}")
+                    self._rewind(batch_start)
+                    heartbeat.sleep(60)
+
+    def _rewind(self, offsets: Dict[Tuple[str, int], int]):
+        """Seek back to these offsets so an unfinished batch is consumed again"""
+        for (topic, partition), offset in offsets.items():
+            try:
+                self.consumer.seek(TopicPartition(topic, partition, offset))
+            except Exception as e:
+                # Partition no longer assigned: its new owner resumes from the commit
+                self.logger.warning(f"Could not rewind partition {partition}: {e}")
+
+    def _process_ideas_concurrent(
+        self,
+        company: str,
+        company_context: Dict,
+        projects: Dict[str, Dict],
+        multi_context: bool,
+        max_concurrency: int,
+    ):
+        """Score up to ``max_concurrency`` papers in parallel.
+
+        LLM calls are still bounded by the client's rate limiter. Results are
+        produced in offset order per partition and offsets are only committed
+        past papers whose scores have all been produced. While ``2 *
+        max_concurrency`` papers are in flight the assigned partitions are
+        paused, but polling continues so the consumer stays in the group
+        however long the LLM calls take.
+        """
+        tracker = PartitionOffsetTracker()
+        self._tracker = tracker
+        max_in_flight = max_concurrency * 2
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            while True:
+                heartbeat.beat()
+                try:
+                    saturated = tracker.in_flight() >= max_in_flight
+                    if saturated != self._paused:
+                        assignment = self.consumer.assignment()
+                        if saturated:
+                            self.consumer.pause(assignment)
+                        else:
+                            self.consumer.resume(assignment)
+                        self._paused = saturated
+                    if saturated:
+                        wait(
+                            [
+                                future
+                                for _, future, _ in tracker.pending_items()
+                                if future is not None
+                            ],
+                            timeout=0.1,
+                            return_when=FIRST_COMPLETED,
+                        )
+                    # Keep polling while paused: it serves rebalances and
+                    # keeps max.poll.interval.ms from expiring
+                    poll_started = time.time()
+                    msg = self.consumer.poll(0 if saturated else 0.1)
+
+                    if msg is not None:
+                        if msg.error():
+                            if msg.error().code() != KafkaError._PARTITION_EOF:
+                                self.logger.error(f"Consumer error: {msg.error()}")
+                                break
+                        else:
+                            paper, trace_context = self._decode(msg)
+                            TRACER.record_child(
+                                "kafka.poll", trace_context, poll_started, time.time()
+                            )
+                            if paper["id"] in self._dedup_for(msg.topic(), msg.partition()):
+                                ITEMS.labels("idea_scoring", "deduped").inc()
+                                self.logger.debug(
+                                    f"Skipping already processed paper: {paper['id']}"
+                                )
+                                future = None
+                            else:
+                                future = executor.submit(
+                                    self._score_paper,
+                                    paper,
+                                    company,
+                                    company_context,
+                                    projects,
+                                    multi_context,
+                                    trace_context,
+                                )
+                            tracker.add(
+                                msg.topic(),
+                                msg.partition(),
+                                msg.offset(),
+                                (paper, future, trace_context),
+                            )
+
+                    self._release_scored_papers(tracker)
+                except Exception as e:
+                    self.logger.error(f"Error processing ideas: {e}")
+                    heartbeat.sleep(60)
+
+    def _release_scored_papers(self, tracker: PartitionOffsetTracker):
+        """Produce finished papers in partition order and commit past them"""
+        ready = tracker.drain(lambda item: item[1] is None or item[1].done())
+        if not ready:
+            return
+
+        commit_offsets = {}
+        scored_ids = {}
+        for topic, partition, offset, (paper, future, trace_context) in ready:
+            if future is not None:
+                try:
+                    ideas = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error scoring paper {paper['id']}: {e}")
+                    ideas = []
+                for output_topic, idea in ideas:
+                    self._produce_relevance(output_topic, paper["id"], idea, trace_context)
+                    self._log_generated_idea(output_topic, idea)
+                scored_ids.setdefault((topic, partition), []).append(paper["id"])
+            commit_offsets[(topic, partition)] = offset + 1
+
+        # Only commit once every output up to these offsets has been delivered
+        if not self.producer.flush():
+            return
+        self._commit(
+            offsets=[
+                TopicPartition(topic, partition, offset)
+                for (topic, partition), offset in commit_offsets.items()
+            ],
+            asynchronous=False,
+        )
+        for (topic, partition), paper_ids in scored_ids.items():
+            self._mark_processed(topic, partition, paper_ids)
 
-    def _produce_relevance(self, topic: str, key: str, idea: Dict):
+    def _produce_relevance(
+        self, topic: str, key: str, idea: Dict,
+        trace_context: Optional[SpanContext] = None,
+    ):
         """Helper method to produce an idea to a Kafka topic"""
         try:
-            json_str = json.dumps(idea)
-            self.producer.produce(topic, key=key, value=json_str)
-            self.producer.flush()
-            self.logger.info(
-                f"Generated relevance for paper: {idea['paper_title']} in topic: {topic}"
-            )
+            with TRACER.span("ideas.produce", parent=trace_context, topic=topic) as span:
+                value, headers = self.codecs.encode(topic, idea)
+                self.producer.produce(
+                    topic, key=key, value=value,
+                    headers=TRACER.inject(headers, span.context),
+                )
+            if self.debug:
+                self.logger.info(
+                    f"Generated relevance for paper: {idea['paper_title']} in topic: {topic}"
+                )
         except TypeError as e:
-            self.logger.error(f"JSON serialization error: {e}")
+            self.logger.error(f"Serialization error: {e}")
 
     def _log_generated_idea(self, idea_type: str, idea: Dict):
-        """Helper method to log generated ideas"""
+        """Helper method to log generated ideas (debug mode only)"""
+        if not self.debug:
+            return
         print(f"Paper Title: {idea['paper_title']}")
         print(f"Context Type: {idea['context_type']}")
         print(f"Relevance Score: {idea['relevance_score']}")
@@ -0,0 +1,535 @@
+"""In-memory stand-ins for Kafka, Anthropic, the arXiv API and praw.
+
+They implement only the calls the pipeline makes and are injected through
+the processors' ``clients`` argument (and ``ArxivFeedClient(session=...)``,
+``RedditClient(reddit=...)``), so benchmarks exercise the real pipeline
+code with no network access. Everything is seeded and deterministic.
+"""
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+WORDS = (
+    "model language transformer attention training inference dataset benchmark "
+    "vision image segmentation reinforcement policy reward agent robot planning "
+    "federated privacy gradient optimization convergence theory bound kernel "
+    "graph network protein molecule drug clinical genomic cell screening "
+    "code generation retrieval reasoning alignment bias evaluation scaling "
+    "efficient sparse quantization distillation multimodal speech audio video "
+    "deep learning neural embedding latent diffusion generative adversarial "
+    "the a of and to in for with on we our this that is are by from as"
+).split()
+
+
+class BenchmarkDone(BaseException):
+    """Raised by the fake consumer once every message is committed.
+
+    A BaseException so it escapes the processors' ``except Exception`` retry
+    loops and ends the run.
+    """
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+# --- Kafka -----------------------------------------------------------------
+
+class FakeTopicPartition:
+    def __init__(self, topic: str, partition: int, offset: int = -1001):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+
+class FakeMessage:
+    def __init__(self, topic: str, partition: int, offset: int, key, value, headers):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._key = key
+        self._value = value
+        self._headers = headers
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+    def headers(self):
+        return self._headers
+
+    def error(self):
+        return None
+
+
+class FakeBroker:
+    """Topics as lists of partition logs, shared by fake producers and consumers"""
+
+    def __init__(self, num_partitions: int = 1):
+        self.num_partitions = num_partitions
+        self.logs: Dict[str, List[List[FakeMessage]]] = {}
+        self.lock = threading.Lock()
+
+    def partitions(self, topic: str) -> List[List[FakeMessage]]:
+        if topic not in self.logs:
+            self.logs[topic] = [[] for _ in range(self.num_partitions)]
+        return self.logs[topic]
+
+    def append(self, topic: str, key, value, headers=None) -> FakeMessage:
+        with self.lock:
+            logs = self.partitions(topic)
+            partition = zlib.crc32(str(key).encode()) % len(logs) if key is not None else 0
+            log = logs[partition]
+            msg = FakeMessage(topic, partition, len(log), key, value, headers)
+            log.append(msg)
+            return msg
+
+    def size(self, topic: str) -> int:
+        return sum(len(log) for log in self.logs.get(topic, []))
+
+
+class FakeProducer:
+    """librdkafka-style producer: delivery callbacks are served by poll/flush"""
+
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        self.pending = deque()
+
+    def produce(self, topic, key=None, value=None, headers=None, on_delivery=None):
+        msg = self.broker.append(topic, key, value, headers)
+        if on_delivery is not None:
+            self.pending.append((on_delivery, msg))
+
+    def poll(self, timeout: float = 0) -> int:
+        served = 0
+        while self.pending:
+            callback, msg = self.pending.popleft()
+            callback(None, msg)
+            served += 1
+        return served
+
+    def flush(self, timeout: float = None) -> int:
+        self.poll()
+        return 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+
+class _TopicMetadata:
+    def __init__(self, num_partitions: int):
+        self.partitions = {p: None for p in range(num_partitions)}
+
+
+class _AllTopics(dict):
+    """Every topic exists, so processors never wait on topic creation"""
+
+    def __init__(self, num_partitions: int):
+        super().__init__()
+        self.num_partitions = num_partitions
+
+    def __contains__(self, topic) -> bool:
+        return True
+
+    def __getitem__(self, topic):
+        return _TopicMetadata(self.num_partitions)
+
+
+class _ClusterMetadata:
+    def __init__(self, num_partitions: int):
+        self.topics = _AllTopics(num_partitions)
+
+
+class FakeAdminClient:
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+
+    def list_topics(self, timeout: float = None):
+        return _ClusterMetadata(self.broker.num_partitions)
+
+    def create_topics(self, topics):
+        return {}
+
+    def create_partitions(self, partitions):
+        return {}
+
+
+class FakeLogReader:
+    """Manually assigned consumer over a FakeBroker, for reading a topic to its end"""
+
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        self.positions: Dict = {}
+
+    def list_topics(self, topic: str = None, timeout: float = None):
+        return _ClusterMetadata(self.broker.num_partitions)
+
+    def get_watermark_offsets(self, partition, timeout: float = None):
+        return 0, len(self.broker.partitions(partition.topic)[partition.partition])
+
+    def assign(self, partitions):
+        self.positions = {(tp.topic, tp.partition): max(tp.offset, 0) for tp in partitions}
+
+    def unassign(self):
+        self.positions = {}
+
+    def poll(self, timeout: float = None):
+        with self.broker.lock:
+            for (topic, partition), position in self.positions.items():
+                log = self.broker.partitions(topic)[partition]
+                if position < len(log):
+                    self.positions[(topic, partition)] = position + 1
+                    return log[position]
+        return None
+
+    def close(self):
+        self.positions = {}
+
+
+class FakeConsumer:
+    """Consumer over a FakeBroker that owns every partition of its topics.
+
+    Records, per message, the time from hand-out to offset commit, and raises
+    ``BenchmarkDone`` once all messages present at subscribe time are
+    committed.
+    """
+
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        self.topics: List[str] = []
+        self.positions: Dict = {}
+        self.committed: Dict = {}
+        self.end_offsets: Dict = {}
+        self.handed_out: Dict = {}
+        self.paused: set = set()
+        self.latencies: List[float] = []
+        self.on_revoke: Optional[Callable] = None
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        self.topics = list(topics)
+        self.on_revoke = on_revoke
+        assignment = []
+        for topic in self.topics:
+            for partition, log in enumerate(self.broker.partitions(topic)):
+                self.positions[(topic, partition)] = 0
+                self.committed[(topic, partition)] = 0
+                self.end_offsets[(topic, partition)] = len(log)
+                assignment.append(FakeTopicPartition(topic, partition))
+        if on_assign is not None:
+            on_assign(self, assignment)
+
+    def _done(self) -> bool:
+        return all(self.committed[tp] >= end for tp, end in self.end_offsets.items())
+
+    def _next(self) -> Optional[FakeMessage]:
+        for (topic, partition), position in self.positions.items():
+            if (topic, partition) in self.paused:
+                continue
+            if position < self.end_offsets[(topic, partition)]:
+                msg = self.broker.logs[topic][partition][position]
+                self.positions[(topic, partition)] = position + 1
+                self.handed_out[(topic, partition, msg.offset())] = time.perf_counter()
+                return msg
+        return None
+
+    def poll(self, timeout: float = None):
+        msg = self._next()
+        if msg is None:
+            if self._done():
+                raise BenchmarkDone()
+            time.sleep(min(timeout or 0.001, 0.001))
+        return msg
+
+    def consume(self, num_messages: int = 1, timeout: float = None):
+        messages = []
+        while len(messages) < num_messages:
+            msg = self._next()
+            if msg is None:
+                break
+            messages.append(msg)
+        if not messages and self._done():
+            raise BenchmarkDone()
+        return messages
+
+    def _commit_to(self, topic: str, partition: int, offset: int):
+        now = time.perf_counter()
+        for committed in range(self.committed[(topic, partition)], offset):
+            started = self.handed_out.pop((topic, partition, committed), None)
+            if started is not None:
+                self.latencies.append(now - started)
+        self.committed[(topic, partition)] = max(self.committed[(topic, partition)], offset)
+
+    def commit(self, message=None, offsets=None, asynchronous: bool = True):
+        if message is not None:
+            self._commit_to(message.topic(), message.partition(), message.offset() + 1)
+        elif offsets is not None:
+            for tp in offsets:
+                self._commit_to(tp.topic, tp.partition, tp.offset)
+        else:
+            for (topic, partition), position in self.positions.items():
+                self._commit_to(topic, partition, position)
+
+    def assignment(self):
+        return [FakeTopicPartition(topic, partition) for topic, partition in self.positions]
+
+    def pause(self, partitions):
+        self.paused.update((tp.topic, tp.partition) for tp in partitions)
+
+    def resume(self, partitions):
+        self.paused.difference_update((tp.topic, tp.partition) for tp in partitions)
+
+    def seek(self, partition):
+        self.positions[(partition.topic, partition.partition)] = partition.offset
+
+    def close(self):
+        if self.on_revoke is not None:
+            self.on_revoke(self, [FakeTopicPartition(t, p) for t, p in self.positions])
+
+
+# --- Anthropic ---------------------------------------------------------------
+
+class _Text:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Usage:
+    def __init__(self, input_tokens: int, output_tokens: int):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class _Message:
+    def __init__(self, text: str, input_tokens: int):
+        self.content = [_Text(text)]
+        self.usage = _Usage(input_tokens, len(text) // 4 + 1)
+
+
+class _Messages:
+    def __init__(self, llm: "FakeAnthropic"):
+        self.llm = llm
+
+    def create(self, model: str = None, max_tokens: int = None, messages=None, **kwargs):
+        return self.llm.create(model, messages)
+
+
+class FakeAnthropic:
+    """Anthropic client stand-in answering relevance prompts after a simulated delay"""
+
+    PROFILE_KEYS = re.compile(r"profile key \(([^)]*)\)")
+
+    def __init__(self, latency_ms: float = 5.0, jitter_ms: float = 2.0, seed: int = 0,
+                 model_latency_ms: Optional[Dict[str, float]] = None):
+        self.latency = latency_ms / 1000
+        # Per-model latency overrides, e.g. for a small scoring model
+        self.model_latency = {
+            model: latency / 1000 for model, latency in (model_latency_ms or {}).items()
+        }
+        self.jitter = jitter_ms / 1000
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.messages = _Messages(self)
+
+    def create(self, model, messages) -> _Message:
+        prompt = messages[-1]["content"]
+        with self.lock:
+            self.calls += 1
+            latency = self.model_latency.get(model, self.latency)
+            delay = max(0.0, latency + self.rng.uniform(-self.jitter, self.jitter))
+            score = self.rng.randint(0, 100)
+        time.sleep(delay)
+        match = self.PROFILE_KEYS.search(prompt)
+        if match:
+            keys = json.loads(f"[{match.group(1)}]")
+            text = json.dumps({key: (score + 17 * i) % 101 for i, key in enumerate(keys)})
+        else:
+            text = str(score)
+        return _Message(text, len(prompt) // 4)
+
+
+# --- arXiv -----------------------------------------------------------------
+
+def atom_entry(rng: random.Random, index: int, updated: datetime) -> str:
+    stamp = updated.strftime("%Y-%m-%dT%H:%M:%SZ")
+    authors = "".join(
+        f"<author><name>Author {rng.randint(1, 5000)}</name></author>"
+        for _ in range(rng.randint(1, 6))
+    )
+    return (
+        "<entry>"
+        f"<id>http://arxiv.org/abs/2410.{index:05d}v1</id>"
+        f"<updated>{stamp}</updated><published>{stamp}</published>"
+        f"<title>{escape(sentence(rng, 10))}</title>"
+        f"<summary>{escape(sentence(rng, 150))}</summary>"
+        f"{authors}"
+        '<category term="cs.LG"/><category term="cs.AI"/>'
+        "</entry>"
+    )
+
+
+def atom_page(total: int, start: int, max_results: int, seed: int = 0) -> bytes:
+    """One Atom response page out of a feed of ``total`` papers, newest first"""
+    rng = random.Random(seed + start)
+    now = datetime(2024, 10, 1, tzinfo=timezone.utc)
+    entries = [
+        atom_entry(rng, index, now - timedelta(minutes=index))
+        for index in range(start, min(total, start + max_results))
+    ]
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>arXiv Query</title>{''.join(entries)}</feed>"
+    ).encode("utf-8")
+
+
+class _Response:
+    def __init__(self, body: bytes):
+        self.status_code = 200
+        self.headers = {}
+        self.raw = io.BytesIO(body)
+        self.raw.decode_content = False
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.raw.close()
+
+
+class FakeArxivSession:
+    """requests.Session stand-in serving canned Atom pages for any query"""
+
+    def __init__(self, total: int, seed: int = 0):
+        self.total = total
+        self.seed = seed
+        self.headers = {}
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, headers=None, stream=False, timeout=None) -> _Response:
+        query = parse_qs(urlparse(url).query)
+        start = int(query.get("start", ["0"])[0])
+        max_results = int(query.get("max_results", ["10"])[0])
+        return _Response(atom_page(self.total, start, max_results, self.seed))
+
+
+# --- Reddit ----------------------------------------------------------------
+
+class _Named:
+    def __init__(self, display_name: str):
+        self.display_name = display_name
+
+
+class FakeComment:
+    def __init__(self, rng: random.Random, index: int):
+        self.id = f"c{index}"
+        self.body = sentence(rng, rng.randint(5, 60))
+        self.score = rng.randint(-5, 500)
+        self.created_utc = time.time() - rng.randint(0, 3600)
+
+
+class _CommentForest:
+    def __init__(self, comments: List[FakeComment]):
+        self.comments = comments
+
+    def replace_more(self, limit=None):
+        return []
+
+    def list(self) -> List[FakeComment]:
+        return self.comments
+
+
+class FakeSubmission:
+    def __init__(self, rng: random.Random, index: int, subreddit: str, num_comments: int):
+        self.id = f"p{index:07d}"
+        self.title = sentence(rng, rng.randint(6, 14))
+        self.selftext = sentence(rng, rng.randint(20, 200))
+        self.created_utc = time.time() - rng.randint(0, 24 * 3600)
+        self.subreddit = _Named(subreddit)
+        self.permalink = f"/r/{subreddit}/comments/{self.id}/"
+        self.url = f"https://www.reddit.com{self.permalink}"
+        self.score = rng.randint(0, 5000)
+        self.upvote_ratio = round(rng.uniform(0.5, 1.0), 2)
+        self.num_comments = num_comments
+        self._comment_seed = rng.random()
+
+    def build_comments(self) -> List[FakeComment]:
+        rng = random.Random(self._comment_seed)
+        return [FakeComment(rng, i) for i in range(self.num_comments)]
+
+
+class _Subreddit:
+    def __init__(self, reddit: "FakeReddit", name: str):
+        self.reddit = reddit
+        self.name = name
+
+    def _listing(self, limit):
+        return iter(self.reddit.posts[: limit or len(self.reddit.posts)])
+
+    def hot(self, limit=None):
+        return self._listing(limit)
+
+    def new(self, limit=None):
+        return self._listing(limit)
+
+    def top(self, time_filter=None, limit=None):
+        return self._listing(limit)
+
+
+class _Auth:
+    limits = {}
+
+
+class FakeReddit:
+    """praw.Reddit stand-in with ``num_posts`` generated submissions.
+
+    Thread-safe, so RedditClient shares it across comment workers;
+    ``comment_latency_ms`` simulates the per-submission round trip.
+    """
+
+    def __init__(self, num_posts: int, comments_per_post: int = 10,
+                 comment_latency_ms: float = 0.0, seed: int = 0):
+        rng = random.Random(seed)
+        names = ["MachineLearning", "LocalLLaMA", "OpenAI", "artificial", "MLOps"]
+        self.posts = [
+            FakeSubmission(rng, i, names[i % len(names)], comments_per_post)
+            for i in range(num_posts)
+        ]
+        self.by_id = {post.id: post for post in self.posts}
+        self.comment_latency = comment_latency_ms / 1000
+        self.auth = _Auth()
+
+    def subreddit(self, name: str) -> _Subreddit:
+        return _Subreddit(self, name)
+
+    def submission(self, id: str):
+        if self.comment_latency:
+            time.sleep(self.comment_latency)
+        post = self.by_id[id]
+        post.comments = _CommentForest(post.build_comments())
+        return post
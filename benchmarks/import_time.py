@@ -0,0 +1,84 @@
+"""Cold-start import benchmark for the pipeline modules.
+
+Each module is imported in a fresh interpreter (``python -X importtime``) so
+results reflect a consumer pod's cold start. Exits non-zero if any module's
+cumulative import time exceeds the target.
+
+    python benchmarks/import_time.py --target-ms 300
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "sentiment_analyzer",
+    "paper_filter",
+    "reddit_client",
+    "llm_client",
+    "arxiv_stream_processor",
+    "reddit_stream_processor",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\| (.+)")
+
+
+def measure(module: str, runs: int = 3) -> Dict:
+    """Best-of-``runs`` cumulative import time for ``module`` and its slowest dependencies"""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1]}
+        entries = []
+        for line in proc.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                raw_name = match.group(3)
+                depth = (len(raw_name) - len(raw_name.lstrip())) // 2
+                entries.append((int(match.group(2)), raw_name.strip(), depth))
+        total = next((us for us, name, depth in entries if name == module and depth == 0), 0)
+        if best is None or total < best["total_us"]:
+            # Direct imports of the module, slowest first
+            top = sorted(
+                ((us, name) for us, name, depth in entries if depth == 1),
+                reverse=True,
+            )[:5]
+            best = {"module": module, "total_us": total, "top": top}
+    return best
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--target-ms", type=float, default=300.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        result = measure(module, args.runs)
+        if "error" in result:
+            print(f"{module:28s} ERROR {result['error']}")
+            failed = True
+            continue
+        ms = result["total_us"] / 1000
+        status = "ok" if ms <= args.target_ms else "OVER TARGET"
+        failed |= ms > args.target_ms
+        print(f"{module:28s} {ms:8.1f} ms  {status}")
+        for us, name in result["top"]:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
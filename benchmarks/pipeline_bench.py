@@ -0,0 +1,355 @@
+"""Offline pipeline benchmark: throughput, p50/p99 latency and memory per stage.
+
+Runs the real pipeline code against the in-memory stand-ins in
+``benchmarks/fakes.py`` (no Kafka, Anthropic, arXiv or Reddit access). Each
+stage/size case runs in a fresh interpreter so peak RSS is per case.
+Results can be saved and compared against a baseline from another commit;
+the exit status is non-zero if any case regressed beyond the tolerance.
+
+    python benchmarks/pipeline_bench.py --sizes 10 1000
+    python benchmarks/pipeline_bench.py --output baseline.json
+    python benchmarks/pipeline_bench.py --compare baseline.json --tolerance 0.2
+
+Throughput and latency cover the stage call only, not building fakes and
+inputs. Latency is per item: gap between successive items for the fetch stages,
+poll-to-commit for ``process_ideas``, one call for ``analyze_sentiment``,
+and one ``score_batch`` chunk per paper for ``paper_filter``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+STAGES = ["fetch_arxiv_papers", "process_ideas", "fetch_posts", "analyze_sentiment", "paper_filter"]
+DEFAULT_SIZES = [10, 1000, 100000]
+
+COMPANY_CONTEXT = {
+    "industry": "Artificial Intelligence",
+    "research_focus": ["Natural Language Processing", "Computer Vision", "Reinforcement Learning"],
+    "current_projects": ["Large Language Model Development", "Multi-modal AI Systems"],
+    "core_technologies": ["Transformer Architecture", "Deep Learning", "Federated Learning"],
+    "available_resources": ["GPU/TPU Clusters", "Massive Text Corpora"],
+}
+PROJECTS = {
+    "llm_development": {
+        "name": "Large Language Model Development",
+        "goals": ["Improve model efficiency"],
+        "challenges": ["Reducing training time and costs"],
+    },
+    "multimodal_ai": {
+        "name": "Multi-modal AI Systems",
+        "goals": ["Integrate vision and language understanding"],
+        "challenges": ["Aligning different modalities"],
+    },
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+class TimedFeed:
+    """Wraps an ArxivFeedClient and records the gap between parsed papers"""
+
+    def __init__(self, feed_client):
+        self.feed_client = feed_client
+        self.latencies: List[float] = []
+
+    def iter_papers(self, url: str):
+        last = time.perf_counter()
+        for paper in self.feed_client.iter_papers(url):
+            now = time.perf_counter()
+            self.latencies.append(now - last)
+            last = now
+            yield paper
+
+
+def _arxiv_processor(broker, state_dir: str, llm=None, feed=None):
+    from fakes import FakeAdminClient, FakeAnthropic, FakeConsumer, FakeProducer
+    from arxiv_stream_processor import ArxivStreamProcessor
+
+    return ArxivStreamProcessor(
+        "localhost:9092", "bench", "bench", "bench",
+        llm_cache_path=None,
+        checkpoint_path=os.path.join(state_dir, "checkpoint.json"),
+        dedup_path=None,
+        near_duplicate_path=None,
+        clients={
+            "producer": FakeProducer(broker),
+            "consumer": FakeConsumer(broker),
+            "admin": FakeAdminClient(broker),
+            "llm": llm or FakeAnthropic(),
+            "feed": feed,
+        },
+    )
+
+
+def _papers(size: int) -> List[Dict]:
+    from arxiv_feed import ArxivFeedClient
+    from fakes import FakeArxivSession
+
+    feed = ArxivFeedClient(session=FakeArxivSession(size))
+    return list(feed.iter_papers(f"http://export.arxiv.org/api/query?start=0&max_results={size}"))
+
+
+def bench_fetch_arxiv_papers(size: int, args, state_dir: str):
+    from arxiv_feed import ArxivFeedClient
+    from fakes import FakeArxivSession, FakeBroker
+
+    feed = TimedFeed(ArxivFeedClient(session=FakeArxivSession(size)))
+    processor = _arxiv_processor(FakeBroker(), state_dir, feed=feed)
+    started = time.perf_counter()
+    papers = processor.fetch_arxiv_papers(["cs.LG"], max_results=size)
+    return len(papers), feed.latencies, time.perf_counter() - started
+
+
+def bench_process_ideas(size: int, args, state_dir: str):
+    from fakes import BenchmarkDone, FakeAnthropic, FakeBroker
+
+    broker = FakeBroker(num_partitions=args.partitions)
+    model_tiers = None
+    model_latency_ms = None
+    if args.small_llm_latency_ms is not None:
+        # Small model first. The fake scores uniformly, so ~40% of contexts (and
+        # most multi-context papers) escalate: a pessimistic case
+        model_tiers = {"small_model": "bench-small"}
+        model_latency_ms = {"bench-small": args.small_llm_latency_ms}
+    llm = FakeAnthropic(args.llm_latency_ms, args.llm_jitter_ms, model_latency_ms=model_latency_ms)
+    processor = _arxiv_processor(broker, state_dir, llm=llm)
+    for paper in _papers(size):
+        value, headers = processor.codecs.encode("papers", paper)
+        broker.append("papers", processor.paper_partition_key(paper), value, headers)
+    started = time.perf_counter()
+    try:
+        processor.process_ideas(
+            "papers", "bench", COMPANY_CONTEXT, PROJECTS,
+            max_concurrency=args.concurrency, batch_size=args.batch_size,
+            model_tiers=model_tiers,
+        )
+    except BenchmarkDone:
+        pass
+    return size, processor.consumer.latencies, time.perf_counter() - started
+
+
+def bench_fetch_posts(size: int, args, state_dir: str):
+    from fakes import FakeReddit
+    from reddit_client import RedditClient
+
+    reddit = FakeReddit(size, comment_latency_ms=args.comment_latency_ms)
+    client = RedditClient(None, None, "bench", "", reddit=reddit)
+    latencies = []
+    started = last = time.perf_counter()
+    count = 0
+    candidates = client.fetch_candidates(COMPANY_CONTEXT, limit=size)
+    for _ in client.iter_enriched_posts(candidates):
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+        count += 1
+    elapsed = time.perf_counter() - started
+    client.close()
+    return count, latencies, elapsed
+
+
+def bench_analyze_sentiment(size: int, args, state_dir: str):
+    from fakes import FakeReddit
+    from reddit_client import RedditClient
+    from sentiment_analyzer import SentimentAnalyzer
+
+    client = RedditClient(None, None, "bench", "", reddit=FakeReddit(size, seed=1))
+    contents = []
+    for submission in client.reddit.posts:
+        post = client._build_post_data(submission, 1.0, COMPANY_CONTEXT)
+        post["content"]["comments"] = [
+            {"id": c.id, "body": c.body, "score": c.score, "created_utc": c.created_utc}
+            for c in submission.build_comments()
+        ]
+        contents.append(post["content"])
+
+    analyzer = SentimentAnalyzer()
+    latencies = []
+    for content in contents:
+        started = time.perf_counter()
+        analyzer.analyze_sentiment(content)
+        latencies.append(time.perf_counter() - started)
+    return len(contents), latencies, sum(latencies)
+
+
+def bench_paper_filter(size: int, args, state_dir: str):
+    from paper_filter import PaperFilter
+
+    papers = _papers(size)
+    paper_filter = PaperFilter(COMPANY_CONTEXT, reference_papers=papers[:2000])
+    latencies = []
+    elapsed = 0.0
+    for start in range(0, len(papers), args.chunk_size):
+        chunk = papers[start:start + args.chunk_size]
+        started = time.perf_counter()
+        paper_filter.score_batch(chunk)
+        chunk_seconds = time.perf_counter() - started
+        elapsed += chunk_seconds
+        latencies.extend([chunk_seconds / len(chunk)] * len(chunk))
+    return len(papers), latencies, elapsed
+
+
+def run_case(stage: str, size: int, args) -> Dict:
+    """Run one case in this process and return its measurements"""
+    import tempfile
+
+    # The processors log and print per item; keep that out of the timings' output
+    logging.basicConfig(level=logging.WARNING)
+    os.environ.setdefault("NLTK_OFFLINE", "1")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    bench = globals()[f"bench_{stage}"]
+    rss_before = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as state_dir, contextlib.redirect_stdout(io.StringIO()):
+        items, latencies, elapsed = bench(size, args, state_dir)
+    return {
+        "stage": stage,
+        "size": size,
+        "items": items,
+        "seconds": round(elapsed, 4),
+        "throughput": round(items / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+    }
+
+
+def spawn_case(stage: str, size: int, argv: List[str]) -> Dict:
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", stage, str(size), *argv],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines() or ["no output"]
+        return {"stage": stage, "size": size, "error": lines[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                          capture_output=True, text=True)
+    return proc.stdout.strip() or "unknown"
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Cases whose throughput dropped or p99 rose by more than ``tolerance``"""
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"] if "error" not in r}
+    regressions = []
+    for result in results:
+        before = previous.get((result["stage"], result["size"]))
+        if before is None or "error" in result:
+            continue
+        name = f"{result['stage']}@{result['size']}"
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput']:.1f} -> {result['throughput']:.1f}/s"
+            )
+        if before["p99_ms"] and result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']:.3f} -> {result['p99_ms']:.3f} ms")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--run-case", nargs=2, metavar=("STAGE", "SIZE"), help=argparse.SUPPRESS)
+    case_options = parser.add_argument_group("stage options")
+    case_options.add_argument("--llm-latency-ms", type=float, default=5.0)
+    case_options.add_argument("--llm-jitter-ms", type=float, default=2.0)
+    case_options.add_argument("--small-llm-latency-ms", type=float,
+                              help="score with a small model of this latency first")
+    case_options.add_argument("--concurrency", type=int, default=8)
+    case_options.add_argument("--batch-size", type=int, default=1)
+    case_options.add_argument("--partitions", type=int, default=4)
+    case_options.add_argument("--comment-latency-ms", type=float, default=0.0)
+    case_options.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    case_argv = [
+        "--llm-latency-ms", str(args.llm_latency_ms),
+        "--llm-jitter-ms", str(args.llm_jitter_ms),
+        *(["--small-llm-latency-ms", str(args.small_llm_latency_ms)]
+          if args.small_llm_latency_ms is not None else []),
+        "--concurrency", str(args.concurrency),
+        "--batch-size", str(args.batch_size),
+        "--partitions", str(args.partitions),
+        "--comment-latency-ms", str(args.comment_latency_ms),
+        "--chunk-size", str(args.chunk_size),
+    ]
+
+    if args.run_case:
+        stage, size = args.run_case
+        print(json.dumps(run_case(stage, int(size), args)))
+        return 0
+
+    results = []
+    print(f"{'stage':20s} {'size':>7s} {'items/s':>10s} {'p50 ms':>9s} {'p99 ms':>9s} {'rss MB':>8s}")
+    for stage in args.stages:
+        for size in args.sizes:
+            result = spawn_case(stage, size, case_argv)
+            results.append(result)
+            if "error" in result:
+                print(f"{stage:20s} {size:7d} ERROR {result['error']}")
+                continue
+            print(
+                f"{stage:20s} {size:7d} {result['throughput']:10.1f} {result['p50_ms']:9.3f} "
+                f"{result['p99_ms']:9.3f} {result['peak_rss_mb']:8.1f}"
+            )
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": case_argv,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = any("error" in result for result in results)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("options") != case_argv:
+            print("warning: baseline was run with different stage options")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed |= bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
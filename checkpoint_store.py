@@ -0,0 +1,47 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Optional
+
+
+class CheckpointStore:
+    """Small durable key/value store for fetch checkpoints.
+
+    The whole store is one JSON file, rewritten atomically (write to a temp
+    file, fsync, rename) so a crash never leaves a torn checkpoint behind.
+    """
+
+    def __init__(self, path: str = "arxiv_checkpoint.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not read checkpoint file {path}: {e}")
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            value = self.data.get(key)
+            return dict(value) if value is not None else None
+
+    def set(self, key: str, value: Dict):
+        """Store ``value`` under ``key`` and persist the file"""
+        with self.lock:
+            self.data[key] = value
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self.data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
@@ -0,0 +1,254 @@
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytearray] = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DedupStore:
+    """Durable, time-windowed set of processed item keys.
+
+    Recent keys live in an exact insertion-ordered index (O(1) lookups,
+    expired from the front). Older keys are kept for the rest of
+    ``window_seconds`` in a ring of Bloom filter generations, rotated so
+    memory stays bounded. The whole store is persisted atomically to
+    ``path``, or handed to ``sink`` as a snapshot (see ``partition_state``);
+    it is thread-safe so fetch and scoring stages can share it.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = "arxiv_dedup.json",
+        window_seconds: float = 14 * 24 * 3600,
+        exact_window_seconds: float = 2 * 24 * 3600,
+        generations: int = 4,
+        items_per_generation: int = 50000,
+        error_rate: float = 1e-5,
+        sink: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.path = path
+        self.sink = sink
+        self.window_seconds = window_seconds
+        self.exact_window_seconds = exact_window_seconds
+        self.generation_seconds = window_seconds / generations
+        self.generations = generations
+        self.items_per_generation = items_per_generation
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.exact: "OrderedDict[str, float]" = OrderedDict()
+        # Newest generation last: [(created_at, BloomFilter), ...]
+        self.blooms: List = []
+        self.dirty = False
+        self.last_saved = time.time()
+        if path and os.path.exists(path):
+            self._load()
+        if not self.blooms:
+            self.blooms.append((time.time(), self._new_bloom()))
+
+    @staticmethod
+    def paper_key(paper_id: str) -> str:
+        """Normalise an arXiv id URL (``http://arxiv.org/abs/2410.01234v2``) to ``2410.01234v2``"""
+        return paper_id.rsplit("/abs/", 1)[-1]
+
+    def _new_bloom(self) -> BloomFilter:
+        return BloomFilter(self.items_per_generation, self.error_rate)
+
+    def _expire(self, now: float):
+        cutoff = now - self.exact_window_seconds
+        while self.exact:
+            key, seen_at = next(iter(self.exact.items()))
+            if seen_at >= cutoff:
+                break
+            self.exact.popitem(last=False)
+            self.dirty = True
+
+        created_at, current = self.blooms[-1]
+        if now - created_at >= self.generation_seconds or current.count >= self.items_per_generation:
+            self.blooms.append((now, self._new_bloom()))
+            self.dirty = True
+        while len(self.blooms) > self.generations or (
+            len(self.blooms) > 1 and self.blooms[0][0] < now - self.window_seconds
+        ):
+            self.blooms.pop(0)
+            self.dirty = True
+
+    def add(self, key: str, seen_at: Optional[float] = None):
+        """Record ``key`` as processed"""
+        key = self.paper_key(key)
+        now = seen_at if seen_at is not None else time.time()
+        with self.lock:
+            self._expire(now)
+            self.exact[key] = now
+            self.exact.move_to_end(key)
+            self.blooms[-1][1].add(key)
+            self.dirty = True
+
+    def __contains__(self, key: str) -> bool:
+        key = self.paper_key(key)
+        with self.lock:
+            if key in self.exact:
+                return True
+            return any(key in bloom for _, bloom in self.blooms)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.exact)
+
+    def snapshot(self) -> Dict:
+        """JSON-serialisable state of the store, marking it saved"""
+        with self.lock:
+            state = {
+                "exact": list(self.exact.items()),
+                "blooms": [
+                    {
+                        "created_at": created_at,
+                        "count": bloom.count,
+                        "bits": base64.b64encode(bytes(bloom.bits)).decode("ascii"),
+                    }
+                    for created_at, bloom in self.blooms
+                ],
+            }
+            self.dirty = False
+            self.last_saved = time.time()
+        return state
+
+    def restore(self, state: Dict):
+        """Replace the store's contents with a ``snapshot``"""
+        exact = OrderedDict((key, seen_at) for key, seen_at in state["exact"])
+        blooms = []
+        for generation in state["blooms"]:
+            bloom = BloomFilter(
+                self.items_per_generation,
+                self.error_rate,
+                bytearray(base64.b64decode(generation["bits"])),
+            )
+            if len(bloom.bits) != (bloom.num_bits + 7) // 8:
+                # Sizing changed since this snapshot was taken; drop the filter
+                continue
+            bloom.count = generation["count"]
+            blooms.append((generation["created_at"], bloom))
+        if not blooms:
+            blooms.append((time.time(), self._new_bloom()))
+        with self.lock:
+            self.exact = exact
+            self.blooms = blooms
+            self._expire(time.time())
+
+    def save(self):
+        """Persist the store atomically"""
+        if self.sink is not None:
+            self.sink(self.snapshot())
+            return
+        if not self.path:
+            return
+        state = self.snapshot()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"Error saving dedup store {self.path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def maybe_save(self, interval_seconds: float = 30.0):
+        """Save if there are unsaved changes and ``interval_seconds`` have passed"""
+        if self.dirty and time.time() - self.last_saved >= interval_seconds:
+            self.save()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                self.restore(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Could not load dedup store {self.path}: {e}")
+
+
+class DedupView:
+    """Read-only view over dedup stores that other processes own and save.
+
+    Lets the fetch stage skip papers the scoring stage already processed
+    without ever writing (and so overwriting) the scoring stage's state.
+    ``paths`` and the per-partition snapshots in ``partition_state`` (a
+    ``PartitionStateTopic``) are reloaded when they change, at most every
+    ``reload_seconds``.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        partition_state=None,
+        reload_seconds: float = 60.0,
+    ):
+        self.paths = paths
+        self.partition_state = partition_state
+        self.reload_seconds = reload_seconds
+        # path or state key -> (version loaded, store)
+        self.stores: Dict[str, Tuple[object, DedupStore]] = {}
+        self.last_reload = 0.0
+        self.reload()
+
+    def reload(self):
+        """Load stores that are new or were saved since the last reload"""
+        stores = {}
+        for path in self.paths:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            loaded = self.stores.get(path)
+            if loaded is None or loaded[0] != mtime:
+                # Stores are replaced atomically, so this never sees a partial file
+                loaded = (mtime, DedupStore(path))
+            stores[path] = loaded
+        if self.partition_state is not None:
+            for key, value in self.partition_state.refresh().items():
+                loaded = self.stores.get(key)
+                if loaded is None or loaded[0] is not value:
+                    store = DedupStore(None)
+                    store.restore(json.loads(value))
+                    loaded = (value, store)
+                stores[key] = loaded
+        self.stores = stores
+        self.last_reload = time.time()
+
+    def __contains__(self, key: str) -> bool:
+        if time.time() - self.last_reload >= self.reload_seconds:
+            self.reload()
+        return any(key in store for _, store in self.stores.values())
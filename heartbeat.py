@@ -0,0 +1,37 @@
+"""Liveness heartbeat beaten from the stage loops themselves.
+
+The supervisor gives each worker a shared ``multiprocessing.Value`` and
+restarts workers whose value stops advancing. Stage loops call ``beat`` once
+per iteration (and per item of long batches), and deliberate waits such as
+retry backoff, rate limiting and producer flushes use ``sleep`` or beat as
+they go, so only a stage stuck in a poll or an LLM call stops beating.
+Outside a supervised worker both are plain no-ops / sleeps.
+"""
+import time
+
+_heartbeat = None
+_interval = 5.0
+
+
+def install(heartbeat, interval: float = 5.0):
+    """Beat ``heartbeat`` from this process's stage loop"""
+    global _heartbeat, _interval
+    _heartbeat = heartbeat
+    _interval = interval
+    beat()
+
+
+def beat():
+    if _heartbeat is not None:
+        _heartbeat.value = time.time()
+
+
+def sleep(seconds: float):
+    """``time.sleep`` that keeps beating, for deliberate waits between iterations"""
+    deadline = time.monotonic() + seconds
+    while True:
+        beat()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, _interval))
@@ -0,0 +1,152 @@
+import logging
+import time
+from functools import partial
+from typing import Callable, Dict, List, Optional
+from confluent_kafka import Producer
+import heartbeat
+from metrics import DELIVERY_FAILURES, DELIVERY_SECONDS
+from tracing import TRACER
+
+
+class BatchingProducer:
+    """Asynchronous Kafka producer that only flushes at commit boundaries.
+
+    Messages are produced with a delivery callback and left to librdkafka to
+    batch (``linger.ms``/``batch.size``/compression). ``flush`` waits for
+    every outstanding delivery; messages whose delivery failed are re-produced
+    there rather than dropped, and ``flush`` reports whether everything was
+    delivered so callers only commit offsets once their outputs are durable.
+
+    Topics for which ``precompressed(topic)`` is true carry values the codec
+    already compressed; they go through a second producer with compression
+    off, so they are not compressed twice.
+    """
+
+    def __init__(
+        self,
+        producer_config: Dict,
+        linger_ms: int = 50,
+        batch_size: int = 131072,
+        # gzip is the only codec the kafkajs dashboard consumer decodes natively
+        compression_type: str = "gzip",
+        retry_backoff_seconds: float = 1.0,
+        producer=None,
+        precompressed: Optional[Callable[[str], bool]] = None,
+    ):
+        self.config = {
+            **producer_config,
+            "linger.ms": linger_ms,
+            "batch.size": batch_size,
+            "compression.type": compression_type,
+            "enable.idempotence": True,
+        }
+        # ``producer`` substitutes a pre-built client (e.g. an in-memory fake)
+        self.producer = producer if producer is not None else Producer(self.config)
+        self.precompressed = precompressed
+        # Created on first use; a pre-built client serves both
+        self.uncompressed_producer = producer
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.failed: List[Dict] = []
+        self.delivered = 0
+        self.logger = logging.getLogger(__name__)
+
+    def produce(
+        self,
+        topic: str,
+        key: Optional[str] = None,
+        value=None,
+        headers: Optional[List] = None,
+        attempt: int = 0,
+    ):
+        """Queue a message for asynchronous delivery"""
+        message = {"topic": topic, "key": key, "value": value, "headers": headers}
+        callback = partial(self._on_delivery, message, attempt, time.monotonic())
+        producer = self._producer_for(topic)
+        while True:
+            try:
+                producer.produce(
+                    topic, key=key, value=value, headers=headers, on_delivery=callback
+                )
+                break
+            except BufferError:
+                # Local queue is full: serve delivery reports to make room
+                producer.poll(0.5)
+        # Serve delivery callbacks for earlier messages without blocking
+        producer.poll(0)
+
+    def _producer_for(self, topic: str):
+        if self.precompressed is None or not self.precompressed(topic):
+            return self.producer
+        if self.uncompressed_producer is None:
+            self.uncompressed_producer = Producer({**self.config, "compression.type": "none"})
+        return self.uncompressed_producer
+
+    def _producers(self) -> List:
+        producers = [self.producer]
+        if self.uncompressed_producer not in (None, self.producer):
+            producers.append(self.uncompressed_producer)
+        return producers
+
+    def _flush_producers(self, timeout: float) -> int:
+        deadline = time.monotonic() + timeout
+        remaining = 0
+        for producer in self._producers():
+            # Flush in short slices so the stage keeps beating while it waits
+            while True:
+                heartbeat.beat()
+                left = producer.flush(max(0.0, min(1.0, deadline - time.monotonic())))
+                if not left or time.monotonic() >= deadline:
+                    break
+            remaining += left
+        return remaining
+
+    def _on_delivery(self, message: Dict, attempt: int, produced_at: float, err, msg):
+        if err is None:
+            self.delivered += 1
+            DELIVERY_SECONDS.labels(message["topic"]).observe(time.monotonic() - produced_at)
+            return
+        DELIVERY_FAILURES.labels(message["topic"]).inc()
+        self.logger.warning(
+            f"Delivery failed for {message['topic']} key={message['key']} "
+            f"(attempt {attempt + 1}): {err}"
+        )
+        self.failed.append({**message, "attempt": attempt + 1})
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait for outstanding deliveries, retrying failed ones once.
+
+        Returns True only if every produced message has been delivered.
+        Undelivered messages are kept and retried on the next flush.
+        """
+        with TRACER.span("kafka.flush", pending=len(self)):
+            return self._flush(timeout)
+
+    def _flush(self, timeout: float) -> bool:
+        remaining = self._flush_producers(timeout)
+
+        if self.failed:
+            retries, self.failed = self.failed, []
+            time.sleep(self.retry_backoff_seconds)
+            for message in retries:
+                self.produce(
+                    message["topic"],
+                    key=message["key"],
+                    value=message["value"],
+                    headers=message["headers"],
+                    attempt=message["attempt"],
+                )
+            remaining = self._flush_producers(timeout)
+
+        if remaining or self.failed:
+            self.logger.error(
+                f"{remaining} messages still in flight and {len(self.failed)} "
+                f"failed after flush; holding offset commit"
+            )
+            return False
+        return True
+
+    def poll(self, timeout: float = 0) -> int:
+        return sum(producer.poll(timeout) for producer in self._producers())
+
+    def __len__(self) -> int:
+        return sum(len(producer) for producer in self._producers()) + len(self.failed)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class LLMResponseCache:
+    """Two-level cache for LLM responses: in-memory LRU in front of SQLite.
+
+    Entries expire after ``ttl_seconds`` and the on-disk store is trimmed to
+    ``max_disk_entries`` (oldest first). Pass ``path=None`` for a memory-only
+    cache.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = "llm_cache.db",
+        max_memory_entries: int = 10000,
+        max_disk_entries: int = 500000,
+        ttl_seconds: float = 30 * 24 * 3600,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._writes_since_trim = 0
+
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_created_at ON llm_cache (created_at)"
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def hash_context(context) -> str:
+        """Stable hash of a context dict (or dict of contexts)"""
+        payload = json.dumps(context, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def make_key(paper_id: str, context_hash: str, model: str, template: str) -> str:
+        """Build a cache key from paper id+version, context hash, model and prompt template"""
+        raw = "|".join([paper_id, context_hash, model, template])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def with_settings(key: str, **settings) -> str:
+        """Extend a cache key with the generation settings a response depends on"""
+        raw = "|".join([key, *(f"{name}={value}" for name, value in sorted(settings.items()))])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on miss/expiry"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self.memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return response
+                del self.memory[key]
+
+            if self.conn is not None:
+                try:
+                    row = self.conn.execute(
+                        "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logging.error(f"LLM cache read error: {e}")
+                    row = None
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    self._remember(key, row[0], row[1])
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, response: str):
+        """Store a response in memory and on disk"""
+        now = time.time()
+        with self.lock:
+            self._remember(key, response, now)
+            self.stats["writes"] += 1
+            if self.conn is None:
+                return
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, response, now),
+                )
+                self.conn.commit()
+                self._writes_since_trim += 1
+                if self._writes_since_trim >= 1000:
+                    self._evict_disk(now)
+            except sqlite3.Error as e:
+                logging.error(f"LLM cache write error: {e}")
+
+    def _remember(self, key: str, response: str, created_at: float):
+        self.memory[key] = (response, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        """Drop expired rows and trim the store to max_disk_entries"""
+        self._writes_since_trim = 0
+        self.conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        self.conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+        self.conn.commit()
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters plus current sizes"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self.memory)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            return stats
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+                self.conn = None
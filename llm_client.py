@@ -1,28 +1,92 @@
-from anthropic import Anthropic
 import logging
+import time
+from typing import Callable, Optional
 from dotenv import load_dotenv
+from llm_cache import LLMResponseCache
+from metrics import LLM_REQUESTS, LLM_SECONDS, LLM_TOKENS
+from rate_limiter import RateLimiter
+from tracing import TRACER
 
 load_dotenv()
 
 
 class LLMClient:
-    def __init__(self, api_key: str):
-        self.client = Anthropic(api_key=api_key)
-
-    def generate(self, prompt: str) -> str:
-        try:
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1024,
-                temperature=0.7,
-                system="""
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-5-sonnet-20241022",
+        cache: Optional[LLMResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        client=None,
+    ):
+        if client is None:
+            # Imported here so that importing this module does not load the SDK
+            from anthropic import Anthropic
+
+            client = Anthropic(api_key=api_key)
+        # Anthropic-compatible client; benchmarks pass a local stand-in
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+
+    def generate(
+        self,
+        prompt: str,
+        cache_key: Optional[str] = None,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """Generate a completion, serving it from the cache when ``cache_key`` is given.
+
+        ``model`` overrides the client's model for this call. Responses are
+        cached per model, ``max_tokens`` and ``temperature``, and only if
+        ``validate`` (when given) accepts them, so a malformed response is
+        never replayed.
+        """
+        model = model or self.model
+        if self.cache is not None and cache_key is not None:
+            cache_key = LLMResponseCache.with_settings(
+                cache_key, model=model, max_tokens=max_tokens, temperature=temperature
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                LLM_REQUESTS.labels(model, "cached").inc()
+                return cached
+
+        with TRACER.span("llm.generate", model=model):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(RateLimiter.estimate_tokens(prompt))
+
+            started = time.perf_counter()
+            try:
+                message = self.client.messages.create(
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    system="""
                     You are a research expert tasked with generating innovative research ideas. Focus on practical, impactful suggestions that build upon existing research while considering business context and feasibility.
                     """,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            if hasattr(message.content[0], "text"):
-                return message.content[0].text
-            return str(message.content)
-        except Exception as e:
-            logging.error(f"LLM generation error: {e}")
-            return None
+                    messages=[{"role": "user", "content": prompt}],
+                )
+                LLM_SECONDS.labels(model).observe(time.perf_counter() - started)
+                usage = getattr(message, "usage", None)
+                if usage is not None:
+                    LLM_TOKENS.labels(model, "input").inc(usage.input_tokens)
+                    LLM_TOKENS.labels(model, "output").inc(usage.output_tokens)
+                if hasattr(message.content[0], "text"):
+                    response = message.content[0].text
+                else:
+                    response = str(message.content)
+            except Exception as e:
+                LLM_REQUESTS.labels(model, "error").inc()
+                logging.error(f"LLM generation error: {e}")
+                return None
+            LLM_REQUESTS.labels(model, "ok").inc()
+
+        if self.cache is not None and cache_key is not None:
+            if validate is None or validate(response):
+                self.cache.set(cache_key, response)
+        return response
@@ -0,0 +1,238 @@
+"""Process-local pipeline metrics in the Prometheus text format.
+
+Counters, gauges and histograms are cheap enough to update per message
+(a dict lookup and a lock). ``start_metrics_server`` serves them on
+``/metrics`` from a daemon thread; under the supervisor every worker
+process gets its own port.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children: Dict[Tuple, object] = {}
+
+    def labels(self, *values, **labels):
+        """Child metric for one label combination"""
+        key = values or tuple(str(labels[name]) for name in self.labelnames)
+        key = tuple(str(value) for value in key)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self.children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {self.value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        names = labelnames + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(names, key + (le,))} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {self.sum}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: _HistogramValue):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+FETCH_SECONDS = REGISTRY.register(Histogram(
+    "pipeline_fetch_seconds", "Duration of one source fetch", ["source"]))
+ITEMS = REGISTRY.register(Counter(
+    "pipeline_items_total",
+    "Items seen per stage by outcome "
+    "(fetched, filtered, deduped, near_duplicate, produced, processed)",
+    ["stage", "outcome"]))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "pipeline_llm_request_seconds", "LLM API call latency", ["model"]))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "pipeline_llm_requests_total", "LLM requests by result (ok, error, cached)", ["model", "result"]))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "pipeline_llm_tokens_total", "LLM tokens used", ["model", "direction"]))
+DELIVERY_SECONDS = REGISTRY.register(Histogram(
+    "pipeline_produce_delivery_seconds", "Time from produce to delivery report", ["topic"]))
+DELIVERY_FAILURES = REGISTRY.register(Counter(
+    "pipeline_produce_failures_total", "Failed delivery reports", ["topic"]))
+COMMIT_SECONDS = REGISTRY.register(Histogram(
+    "pipeline_commit_seconds", "Offset commit call latency", ["group"]))
+PREFILTER_CONTEXTS = REGISTRY.register(Counter(
+    "pipeline_prefilter_contexts_total",
+    "Paper/context pairs by prefilter decision (called, skipped, explored, warmup)",
+    ["context", "decision"]))
+PREFILTER_THRESHOLD = REGISTRY.register(Gauge(
+    "pipeline_prefilter_threshold", "Calibrated TF-IDF similarity threshold", ["context"]))
+SCORE_TIERS = REGISTRY.register(Counter(
+    "pipeline_relevance_scores_total", "Relevance scores by the model tier that produced them",
+    ["tier"]))
+CONSUMER_LAG = REGISTRY.register(Gauge(
+    "pipeline_consumer_lag", "Messages behind the partition high watermark",
+    ["group", "topic", "partition"]))
+
+
+def record_consumer_stats(group: str, stats_json: str):
+    """librdkafka ``stats_cb``: export per-partition consumer lag"""
+    try:
+        stats = json.loads(stats_json)
+        for topic, topic_stats in stats.get("topics", {}).items():
+            for partition, partition_stats in topic_stats.get("partitions", {}).items():
+                lag = partition_stats.get("consumer_lag", -1)
+                # Partition -1 is librdkafka's internal UA partition; -1 lag means unknown
+                if partition == "-1" or lag < 0:
+                    continue
+                CONSUMER_LAG.labels(group, topic, partition).set(lag)
+    except (ValueError, AttributeError) as e:
+        logging.debug(f"Ignoring malformed Kafka statistics: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         registry: Optional[Registry] = None) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` on ``host:port`` from a daemon thread.
+
+    Local only by default; pass ``host="0.0.0.0"`` to expose it.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,222 @@
+import bisect
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, List, Optional, Tuple
+
+_EMPTY = 1 << 32
+_MAX_HASH = _EMPTY - 1
+# Odd constant offsetting values borrowed by empty bins during densification
+_ROTATION_OFFSET = 0x9E3779B1
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class NearDuplicateIndex:
+    """Time-windowed MinHash/LSH index of recently processed texts.
+
+    Texts are reduced to word shingles and a MinHash signature of
+    ``num_perm`` values, split into ``bands`` LSH bands. Items sharing a band
+    are candidates; the best candidate whose estimated Jaccard similarity is
+    at least ``threshold`` is a near-duplicate. Each item carries a JSON value
+    (e.g. a prior result to reuse).
+
+    The index lives in SQLite so scoring workers on the same host share it;
+    entries older than ``window_seconds`` expire. Pass ``path=None`` for a
+    memory-only index.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        min_tokens: int = 8,
+        window_seconds: float = 14 * 24 * 3600,
+        expire_every: int = 1000,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_tokens = min_tokens
+        self.window_seconds = window_seconds
+        self.expire_every = expire_every
+        self.lock = threading.Lock()
+        self.stats = {"queries": 0, "matches": 0, "adds": 0}
+        self._adds_since_expiry = 0
+
+        self.conn = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        if path:
+            # Several workers share the file; WAL lets them read while one writes
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS near_dup_items ("
+            "key TEXT PRIMARY KEY, signature BLOB NOT NULL, value TEXT, seen_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS near_dup_bands ("
+            "band INTEGER NOT NULL, key TEXT NOT NULL, seen_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS near_dup_bands_band ON near_dup_bands (band)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS near_dup_bands_seen_at ON near_dup_bands (seen_at)"
+        )
+        self.conn.commit()
+
+    def _shingles(self, text: str) -> List[bytes]:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) < self.min_tokens:
+            return []
+        size = self.shingle_size
+        return list({
+            " ".join(tokens[i:i + size]).encode("utf-8")
+            for i in range(len(tokens) - size + 1)
+        })
+
+    def signature(self, text: str) -> Optional[array]:
+        """MinHash signature of ``text``, or None if it is too short to compare"""
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+        # One-permutation hashing: one hash per shingle, whose low bits pick a
+        # bin and high bits compete for that bin's minimum. Empty bins borrow
+        # from the next filled bin (rotation densification).
+        num_perm = self.num_perm
+        bins = [_EMPTY] * num_perm
+        blake2b = hashlib.blake2b
+        for shingle in shingles:
+            value = int.from_bytes(blake2b(shingle, digest_size=8).digest(), "little")
+            index = value % num_perm
+            value >>= 32
+            if value < bins[index]:
+                bins[index] = value
+        if _EMPTY in bins:
+            filled = [index for index, value in enumerate(bins) if value != _EMPTY]
+            densified = list(bins)
+            for index in range(num_perm):
+                if bins[index] == _EMPTY:
+                    # Nearest filled bin to the right, wrapping around
+                    source = filled[bisect.bisect_right(filled, index) % len(filled)]
+                    distance = (source - index) % num_perm
+                    densified[index] = (bins[source] + distance * _ROTATION_OFFSET) & _MAX_HASH
+            bins = densified
+        return array("I", bins)
+
+    def _band_keys(self, signature: array) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=8, salt=band.to_bytes(8, "little"))
+            keys.append(int.from_bytes(digest.digest(), "little", signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(first: array, second: array) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+    def query(self, signature: Optional[array], exclude: Optional[str] = None,
+              now: Optional[float] = None) -> Optional[Tuple[str, float, Any]]:
+        """Most similar unexpired item as ``(key, similarity, value)``, or None"""
+        if signature is None:
+            return None
+        cutoff = (now if now is not None else time.time()) - self.window_seconds
+        bands = self._band_keys(signature)
+        with self.lock:
+            self.stats["queries"] += 1
+            try:
+                rows = self.conn.execute(
+                    "SELECT key, signature, value FROM near_dup_items WHERE seen_at >= ? "
+                    "AND key IN (SELECT key FROM near_dup_bands WHERE band IN "
+                    f"({','.join('?' * len(bands))}))",
+                    (cutoff, *bands),
+                ).fetchall()
+            except sqlite3.Error as e:
+                logging.error(f"Near-duplicate index read error: {e}")
+                return None
+
+        best = None
+        for key, blob, value in rows:
+            if key == exclude:
+                continue
+            candidate = array("I")
+            candidate.frombytes(blob)
+            score = self.similarity(signature, candidate)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score, value)
+        if best is None:
+            return None
+        with self.lock:
+            self.stats["matches"] += 1
+        key, score, value = best
+        return key, score, json.loads(value) if value is not None else None
+
+    def add(self, key: str, signature: Optional[array], value: Any = None,
+            seen_at: Optional[float] = None):
+        """Index ``key`` under ``signature`` with a JSON-serialisable ``value``"""
+        if signature is None:
+            return
+        now = seen_at if seen_at is not None else time.time()
+        payload = json.dumps(value, default=str) if value is not None else None
+        bands = self._band_keys(signature)
+        with self.lock:
+            try:
+                # Band rows of an earlier signature for this key are left to
+                # expire; query() re-checks every candidate's current signature
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO near_dup_items (key, signature, value, seen_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, signature.tobytes(), payload, now),
+                )
+                self.conn.executemany(
+                    "INSERT INTO near_dup_bands (band, key, seen_at) VALUES (?, ?, ?)",
+                    ((band, key, now) for band in bands),
+                )
+                self.conn.commit()
+                self.stats["adds"] += 1
+                self._adds_since_expiry += 1
+                if self._adds_since_expiry >= self.expire_every:
+                    self._expire_locked(now)
+            except sqlite3.Error as e:
+                logging.error(f"Near-duplicate index write error: {e}")
+
+    def _expire_locked(self, now: float):
+        cutoff = now - self.window_seconds
+        self.conn.execute("DELETE FROM near_dup_items WHERE seen_at < ?", (cutoff,))
+        self.conn.execute("DELETE FROM near_dup_bands WHERE seen_at < ?", (cutoff,))
+        self.conn.commit()
+        self._adds_since_expiry = 0
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM near_dup_items").fetchone()[0]
+
+    def close(self):
+        if self.conn is None:
+            return
+        with self.lock:
+            try:
+                self._expire_locked(time.time())
+            except sqlite3.Error as e:
+                logging.error(f"Near-duplicate index expiry error: {e}")
+            self.conn.close()
+            self.conn = None
+
+    @staticmethod
+    def text_of(*parts: Optional[str]) -> str:
+        """Join the fields an item is compared on"""
+        return " ".join(part for part in parts if part)
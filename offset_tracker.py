@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+
+class PartitionOffsetTracker:
+    """Track in-flight messages per partition and release them in offset order.
+
+    Work may finish out of order, but ``drain`` only returns completed
+    messages that have no unfinished message before them in the same
+    partition, so outputs keep per-partition ordering and commits never skip
+    past a paper that is still being scored.
+    """
+
+    def __init__(self):
+        self.partitions: Dict[Tuple[str, int], OrderedDict] = {}
+        self.lock = threading.Lock()
+
+    def add(self, topic: str, partition: int, offset: int, item: Any):
+        """Register a message whose result is ``item`` (e.g. a Future)"""
+        with self.lock:
+            self.partitions.setdefault((topic, partition), OrderedDict())[offset] = item
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return sum(len(pending) for pending in self.partitions.values())
+
+    def pending_items(self) -> List[Any]:
+        with self.lock:
+            return [item for pending in self.partitions.values() for item in pending.values()]
+
+    def drain(self, is_done) -> List[Tuple[str, int, int, Any]]:
+        """Pop the completed head of every partition, in offset order"""
+        ready = []
+        with self.lock:
+            for (topic, partition), pending in self.partitions.items():
+                while pending:
+                    offset, item = next(iter(pending.items()))
+                    if not is_done(item):
+                        break
+                    pending.popitem(last=False)
+                    ready.append((topic, partition, offset, item))
+        return ready
+
+    def forget(self, topic: str, partition: int) -> List[Any]:
+        """Drop a partition (e.g. on revoke) and return its pending items"""
+        with self.lock:
+            pending = self.partitions.pop((topic, partition), OrderedDict())
+        return list(pending.values())
@@ -1,6 +1,5 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import Dict
+from collections import deque
+from typing import Dict, Iterable, List, Optional
 from dotenv import load_dotenv
 import logging
 
@@ -8,31 +7,115 @@ load_dotenv()
 
 
 class PaperFilter:
-    def __init__(self, company_context: Dict):
-        self.vectorizer = TfidfVectorizer(stop_words="english")
-        self.company_focus = " ".join(
-            [
-                company_context["industry"],
-                " ".join(company_context["research_focus"]),
-                " ".join(company_context["current_projects"]),
-            ]
-        )
+    def __init__(
+        self,
+        company_context: Dict,
+        reference_papers: Optional[Iterable[Dict]] = None,
+        max_reference_papers: int = 2000,
+        contexts: Optional[Dict[str, Dict]] = None,
+    ):
+        # Imported here so that importing this module does not load sklearn
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True)
+        self.company_focus = self.context_text(company_context)
+        # Optional named company/project contexts scored by ``score_contexts``
+        self.context_keys = list(contexts or {})
+        self.context_texts = [self.context_text(context) for context in (contexts or {}).values()]
         self.min_similarity_threshold = 0.05
+        # Rolling sample of recent papers used as the IDF reference corpus
+        self.reference_texts = deque(maxlen=max_reference_papers)
+        self.company_vector = None
+        self.context_matrix = None
+        self.add_reference_papers(reference_papers or [], refit=True)
 
-    def calculate_relevance(self, paper: Dict) -> float:
-        """Calculate relevance score between paper and company focus"""
-        paper_text = f"{paper['title']} {paper['summary']}"
+    @staticmethod
+    def paper_text(paper: Dict) -> str:
+        return f"{paper['title']} {paper['summary']}"
+
+    @staticmethod
+    def context_text(context: Dict) -> str:
+        """Text a company or project context is matched on"""
+        if "industry" in context:
+            fields = [
+                [context["industry"]],
+                context["research_focus"],
+                context["current_projects"],
+            ]
+        else:
+            fields = [
+                [context.get("name", "")],
+                context.get("goals", []),
+                context.get("challenges", []),
+            ]
+        return " ".join(" ".join(field) for field in fields)
+
+    def add_reference_papers(self, papers: Iterable[Dict], refit: bool = False):
+        """Add papers to the rolling reference corpus, optionally refitting"""
+        self.reference_texts.extend(self.paper_text(paper) for paper in papers)
+        if refit:
+            self.fit()
+
+    def fit(self):
+        """Fit the vectorizer once on company focus + reference corpus.
+
+        Scores stay stable between calls until the next ``fit``.
+        """
         try:
-            tfidf_matrix = self.vectorizer.fit_transform(
-                [self.company_focus, paper_text]
+            self.vectorizer.fit(
+                [self.company_focus, *self.context_texts, *self.reference_texts]
             )
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            return float(similarity)
+            # Rows are L2-normalised, so a dot product is the cosine similarity
+            self.company_vector = self.vectorizer.transform([self.company_focus]).T.tocsc()
+            if self.context_texts:
+                self.context_matrix = self.vectorizer.transform(self.context_texts).T.tocsc()
+        except Exception as e:
+            logging.error(f"Paper filter fit error: {e}")
+            self.company_vector = None
+            self.context_matrix = None
+
+    def score_batch(self, papers: List[Dict]) -> List[float]:
+        """Score many papers against the company focus with one sparse product"""
+        if not papers:
+            return []
+        if self.company_vector is None:
+            return [0.0] * len(papers)
+        try:
+            paper_matrix = self.vectorizer.transform([self.paper_text(p) for p in papers])
+            scores = (paper_matrix @ self.company_vector).toarray().ravel()
+            return [float(score) for score in scores]
+        except Exception as e:
+            logging.error(f"Relevance calculation error: {e}")
+            return [0.0] * len(papers)
+
+    def score_contexts(self, papers: List[Dict]) -> List[Dict[str, float]]:
+        """Score many papers against every named context with one sparse product"""
+        if not papers:
+            return []
+        if self.context_matrix is None:
+            return [dict.fromkeys(self.context_keys, 0.0) for _ in papers]
+        try:
+            paper_matrix = self.vectorizer.transform([self.paper_text(p) for p in papers])
+            scores = (paper_matrix @ self.context_matrix).toarray()
+            return [dict(zip(self.context_keys, map(float, row))) for row in scores]
         except Exception as e:
             logging.error(f"Relevance calculation error: {e}")
-            return 0.0
+            return [dict.fromkeys(self.context_keys, 0.0) for _ in papers]
+
+    def calculate_relevance(self, paper: Dict) -> float:
+        """Calculate relevance score between paper and company focus"""
+        return self.score_batch([paper])[0]
 
     def is_relevant(self, paper: Dict) -> bool:
         """Determine if paper is relevant enough to process"""
         relevance_score = self.calculate_relevance(paper)
         return relevance_score >= self.min_similarity_threshold
+
+    def filter_relevant(self, papers: List[Dict]) -> List[Dict]:
+        """Keep only the papers at or above the similarity threshold"""
+        scores = self.score_batch(papers)
+        return [
+            paper
+            for paper, score in zip(papers, scores)
+            if score >= self.min_similarity_threshold
+        ]
@@ -0,0 +1,112 @@
+import json
+import logging
+import time
+from typing import Dict, Optional
+from confluent_kafka import TopicPartition
+import heartbeat
+
+# Dedup snapshots carry a few Bloom filter generations; allow them through
+MAX_SNAPSHOT_BYTES = 8 * 1024 * 1024
+
+# Log compaction keeps the latest snapshot per (topic, partition) key
+TOPIC_CONFIG = {
+    "cleanup.policy": "compact",
+    "max.message.bytes": str(MAX_SNAPSHOT_BYTES),
+    "min.cleanable.dirty.ratio": "0.1",
+    "segment.ms": str(6 * 3600 * 1000),
+}
+
+
+class PartitionStateTopic:
+    """Per-input-partition state kept in a compacted Kafka topic.
+
+    The consumer that owns an input partition publishes snapshots of its
+    state keyed by ``<topic>:<partition>``; whichever consumer is assigned
+    the partition next, on any host, reads the topic up to its high
+    watermark in ``_on_assign`` and resumes from the latest snapshot.
+
+    ``producer`` is the owner's ``BatchingProducer``, so snapshots are
+    delivered by the same flush that gates offset commits. ``consumer`` is a
+    dedicated reader that only ever uses manual assignment.
+    """
+
+    def __init__(self, topic: str, producer, consumer, read_timeout: float = 30.0):
+        self.topic = topic
+        self.producer = producer
+        self.consumer = consumer
+        self.read_timeout = read_timeout
+        # Latest raw snapshot per key, and how far each state partition was read
+        self.latest: Dict[str, bytes] = {}
+        self.positions: Dict[int, int] = {}
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def key(topic: str, partition: int) -> str:
+        return f"{topic}:{partition}"
+
+    def save(self, topic: str, partition: int, state: Dict):
+        """Publish a snapshot for an input partition"""
+        self.producer.produce(
+            self.topic,
+            key=self.key(topic, partition),
+            value=json.dumps(state).encode("utf-8"),
+        )
+
+    def load(self, topic: str, partition: int) -> Optional[Dict]:
+        """Latest snapshot for an input partition, as of the last ``refresh``"""
+        value = self.latest.get(self.key(topic, partition))
+        return json.loads(value) if value is not None else None
+
+    def refresh(self) -> Dict[str, bytes]:
+        """Read snapshots published since the last refresh, up to the high watermark"""
+        metadata = self.consumer.list_topics(self.topic, timeout=10)
+        if self.topic not in metadata.topics:
+            return self.latest
+        topic = metadata.topics[self.topic]
+        if getattr(topic, "error", None) is not None:
+            # Not created yet: nothing has been saved
+            return self.latest
+        for partition in topic.partitions:
+            self._read_partition(partition)
+        return self.latest
+
+    def _read_partition(self, partition: int):
+        low, high = self.consumer.get_watermark_offsets(
+            TopicPartition(self.topic, partition), timeout=10
+        )
+        position = max(self.positions.get(partition, low), low)
+        if position >= high:
+            return
+        self.consumer.assign([TopicPartition(self.topic, partition, position)])
+        deadline = time.monotonic() + self.read_timeout
+        try:
+            # Compaction leaves gaps, so track the offsets actually read
+            while position < high:
+                if time.monotonic() > deadline:
+                    self.logger.error(
+                        f"Timed out reading {self.topic} [{partition}] at offset "
+                        f"{position} of {high}; continuing with the snapshots read so far"
+                    )
+                    break
+                heartbeat.beat()
+                msg = self.consumer.poll(1.0)
+                if msg is None:
+                    continue
+                if msg.error():
+                    self.logger.warning(f"Error reading partition state: {msg.error()}")
+                    continue
+                position = msg.offset() + 1
+                key = msg.key().decode("utf-8") if isinstance(msg.key(), bytes) else msg.key()
+                if msg.value() is None:
+                    self.latest.pop(key, None)
+                else:
+                    self.latest[key] = msg.value()
+        finally:
+            self.positions[partition] = position
+            self.consumer.unassign()
+
+    def close(self):
+        try:
+            self.consumer.close()
+        except Exception as e:
+            self.logger.error(f"Error closing partition state reader: {e}")
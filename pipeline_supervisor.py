@@ -0,0 +1,318 @@
+"""Run the pipeline stages as supervised worker processes.
+
+The topology (topic names, contexts, per-stage worker counts and options)
+comes from one config file, so producers and consumers cannot drift onto
+different topics. Credentials and local state paths still come from the
+environment.
+
+    python main.py                                   # every stage
+    python main.py --stages reddit_fetch sentiment   # Reddit pipeline only
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from worker_launcher import (
+    run_arxiv_fetch_worker,
+    run_idea_worker,
+    run_reddit_fetch_worker,
+    run_sentiment_worker,
+)
+
+load_dotenv()
+
+# Upstream stages first: shutdown follows this order so nothing new is
+# produced while downstream consumers are committing
+STAGE_ORDER = ["arxiv_fetch", "idea_scoring", "reddit_fetch", "sentiment"]
+
+STAGE_TARGETS = {
+    "arxiv_fetch": run_arxiv_fetch_worker,
+    "idea_scoring": run_idea_worker,
+    "reddit_fetch": run_reddit_fetch_worker,
+    "sentiment": run_sentiment_worker,
+}
+
+# Fetch stages poll external APIs and are not partitioned, so a second
+# worker would only produce duplicates
+SINGLE_WORKER_STAGES = {"arxiv_fetch", "reddit_fetch"}
+
+
+def load_topology(path: str) -> Dict:
+    """Load and validate the pipeline topology file"""
+    with open(path) as f:
+        topology = json.load(f)
+    for key in ("topics", "company", "company_context", "stages"):
+        if key not in topology:
+            raise ValueError(f"{path}: missing '{key}'")
+    for stage, spec in topology["stages"].items():
+        if stage not in STAGE_TARGETS:
+            raise ValueError(f"{path}: unknown stage '{stage}'")
+        workers = spec.get("workers", 1)
+        if stage in SINGLE_WORKER_STAGES and workers > 1:
+            raise ValueError(f"{path}: stage '{stage}' supports at most one worker")
+    return topology
+
+
+def stage_kwargs(topology: Dict, stage: str) -> Dict:
+    """Keyword arguments for the stage's processor method, wired from the shared topics"""
+    topics = topology["topics"]
+    options = topology["stages"][stage].get("options", {})
+    if stage == "arxiv_fetch":
+        wiring = {"topic": topics["arxiv_papers"], "company_context": topology["company_context"]}
+    elif stage == "idea_scoring":
+        wiring = {
+            "input_topic": topics["arxiv_papers"],
+            "company": topology["company"],
+            "company_context": topology["company_context"],
+            "projects": topology.get("projects", {}),
+        }
+    elif stage == "reddit_fetch":
+        wiring = {"output_topic": topics["reddit_posts"], "company_context": topology["company_context"]}
+    else:
+        wiring = {
+            "input_topic": topics["reddit_posts"],
+            "output_topic": topics["sentiment_analysis"],
+            "company_context": topology["company_context"],
+        }
+    return {**options, **wiring}
+
+
+def serialization_options(topology: Dict) -> Dict:
+    """Per-topic wire formats, keyed by the topics' configured names.
+
+    Topics not listed, including the dashboard-facing outputs, stay JSON.
+    """
+    topics = topology["topics"]
+    return {
+        "topics": {
+            topics[name]: options
+            for name, options in topology.get("serialization", {}).items()
+        }
+    }
+
+
+def processor_config(topology: Dict, stage: str) -> Dict:
+    """Constructor arguments for the stage's processor"""
+    config = {
+        "bootstrap_servers": os.getenv("CONFLUENT_BOOTSTRAP_SERVERS"),
+        "api_key": os.getenv("CONFLUENT_API_KEY"),
+        "api_secret": os.getenv("CONFLUENT_API_SECRET"),
+        "num_partitions": topology.get("num_partitions", 1),
+        "serialization": serialization_options(topology),
+        "debug": topology.get("debug", False)
+        or os.getenv("PIPELINE_DEBUG", "").lower() in ("1", "true", "yes"),
+    }
+    if stage in ("reddit_fetch", "sentiment"):
+        config["near_duplicate_path"] = os.getenv(
+            "REDDIT_NEAR_DUPLICATE_PATH", "reddit_near_duplicates.db"
+        )
+        return config
+
+    config.update({
+        "llm_api_key": os.getenv("ANTHROPIC_API_KEY"),
+        "llm_cache_path": os.getenv("LLM_CACHE_PATH", "llm_cache.db"),
+        "llm_requests_per_minute": int(os.getenv("LLM_REQUESTS_PER_MINUTE", "50")),
+        "llm_tokens_per_minute": int(os.getenv("LLM_TOKENS_PER_MINUTE", "40000")),
+        "checkpoint_path": os.getenv("ARXIV_CHECKPOINT_PATH", "arxiv_checkpoint.json"),
+        "dedup_path": os.getenv("ARXIV_DEDUP_PATH", "arxiv_dedup.json"),
+        "near_duplicate_path": os.getenv(
+            "ARXIV_NEAR_DUPLICATE_PATH", "arxiv_near_duplicates.db"
+        ),
+        "prefilter_path": os.getenv("ARXIV_PREFILTER_PATH", "arxiv_prefilter.db"),
+    })
+    if topology["stages"].get("idea_scoring", {}).get("workers", 1) > 1:
+        # Each scoring worker owns the dedup state of its partitions, kept in
+        # a compacted topic so it follows a partition to any worker
+        config["dedup_path"] = None
+        config["partition_state_topic"] = topology.get(
+            "partition_state_topic", "arxiv_partition_state"
+        )
+    if stage == "arxiv_fetch":
+        # The scoring stage owns the dedup state; fetch only reads it
+        config["dedup_read_only"] = True
+    return config
+
+
+class WorkerSlot:
+    """One supervised worker process and its restart state"""
+
+    def __init__(self, stage: str, index: int, heartbeat, metrics_port: Optional[int] = None):
+        self.stage = stage
+        self.index = index
+        self.heartbeat = heartbeat
+        self.metrics_port = metrics_port
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at: Optional[float] = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.stage}-{self.index}"
+
+
+class PipelineSupervisor:
+    """Starts every stage's workers, restarts crashed or wedged ones with
+    exponential backoff, and shuts the pipeline down in stage order"""
+
+    def __init__(
+        self,
+        topology: Dict,
+        stages: Optional[List[str]] = None,
+        health_timeout_seconds: float = 60.0,
+        restart_backoff_seconds: float = 5.0,
+        max_restart_backoff_seconds: float = 300.0,
+        stable_after_seconds: float = 600.0,
+        shutdown_timeout_seconds: float = 30.0,
+    ):
+        self.topology = topology
+        self.health_timeout_seconds = health_timeout_seconds
+        self.restart_backoff_seconds = restart_backoff_seconds
+        self.max_restart_backoff_seconds = max_restart_backoff_seconds
+        self.stable_after_seconds = stable_after_seconds
+        self.shutdown_timeout_seconds = shutdown_timeout_seconds
+        # spawn, not fork: librdkafka and SQLite handles must not be inherited
+        self.context = multiprocessing.get_context("spawn")
+        self.stopping = False
+        self.logger = logging.getLogger(__name__)
+
+        # Each worker serves metrics on its own port, counting up from the
+        # base, on localhost unless the config sets a wider "host"
+        metrics_port = topology.get("metrics", {}).get("port")
+        self.metrics_host = topology.get("metrics", {}).get("host", "127.0.0.1")
+        selected = stages or list(topology["stages"])
+        self.slots: List[WorkerSlot] = []
+        for stage in STAGE_ORDER:
+            if stage not in selected or stage not in topology["stages"]:
+                continue
+            for index in range(topology["stages"][stage].get("workers", 1)):
+                port = metrics_port + len(self.slots) if metrics_port else None
+                self.slots.append(WorkerSlot(stage, index, self.context.Value("d", 0.0), port))
+
+    def _start(self, slot: WorkerSlot):
+        slot.heartbeat.value = time.time()
+        slot.process = self.context.Process(
+            target=STAGE_TARGETS[slot.stage],
+            args=(
+                slot.index,
+                processor_config(self.topology, slot.stage),
+                stage_kwargs(self.topology, slot.stage),
+                slot.heartbeat,
+            ),
+            kwargs={"metrics_port": slot.metrics_port, "metrics_host": self.metrics_host},
+            name=slot.name,
+        )
+        slot.process.start()
+        slot.started_at = time.time()
+        slot.restart_at = None
+        self.logger.info(f"Started {slot.name} (pid {slot.process.pid})")
+
+    def _stop_processes(self, slots: List[WorkerSlot]):
+        """SIGTERM the workers, wait for them to commit and exit, then kill stragglers"""
+        running = [s for s in slots if s.process is not None and s.process.is_alive()]
+        for slot in running:
+            slot.process.terminate()
+        deadline = time.time() + self.shutdown_timeout_seconds
+        for slot in running:
+            slot.process.join(max(0.0, deadline - time.time()))
+            if slot.process.is_alive():
+                self.logger.warning(f"{slot.name} did not stop in time, killing it")
+                slot.process.kill()
+                slot.process.join()
+
+    def _schedule_restart(self, slot: WorkerSlot, reason: str):
+        now = time.time()
+        if now - slot.started_at >= self.stable_after_seconds:
+            slot.failures = 0
+        delay = min(
+            self.max_restart_backoff_seconds,
+            self.restart_backoff_seconds * (2 ** slot.failures),
+        )
+        slot.failures += 1
+        slot.restart_at = now + delay
+        self.logger.error(f"{slot.name} {reason}; restarting in {delay:.0f}s")
+
+    def check(self):
+        """One supervision round: start due workers, restart dead or unresponsive ones"""
+        now = time.time()
+        for slot in self.slots:
+            if slot.restart_at is not None:
+                if now >= slot.restart_at:
+                    self._start(slot)
+                continue
+            if not slot.process.is_alive():
+                self._schedule_restart(slot, f"exited with code {slot.process.exitcode}")
+            elif now - slot.heartbeat.value > self.health_timeout_seconds:
+                self._stop_processes([slot])
+                self._schedule_restart(
+                    slot, f"missed heartbeats for {now - slot.heartbeat.value:.0f}s"
+                )
+
+    def health(self) -> Dict[str, Dict]:
+        """Per-worker status snapshot"""
+        now = time.time()
+        return {
+            slot.name: {
+                "alive": slot.process is not None and slot.process.is_alive(),
+                "pid": slot.process.pid if slot.process is not None else None,
+                "heartbeat_age": now - slot.heartbeat.value if slot.heartbeat.value else None,
+                "consecutive_failures": slot.failures,
+                "metrics_port": slot.metrics_port,
+            }
+            for slot in self.slots
+        }
+
+    def _request_stop(self, signum, frame):
+        self.logger.info(f"Received signal {signum}, shutting down the pipeline")
+        self.stopping = True
+
+    def _forward_profile_request(self, signum, frame):
+        """Pass SIGUSR1 on so every worker profiles itself (see ``profiling``)"""
+        for slot in self.slots:
+            if slot.process is not None and slot.process.is_alive():
+                os.kill(slot.process.pid, signum)
+
+    def run(self, interval: float = 1.0):
+        """Supervise until SIGTERM/SIGINT, then stop stages upstream first.
+
+        SIGUSR1 is forwarded to the workers to profile the whole pipeline.
+        """
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self._forward_profile_request)
+        try:
+            while not self.stopping:
+                self.check()
+                time.sleep(interval)
+        finally:
+            self.stop()
+
+    def stop(self):
+        for stage in STAGE_ORDER:
+            slots = [slot for slot in self.slots if slot.stage == stage]
+            if slots:
+                self.logger.info(f"Stopping {stage}")
+                self._stop_processes(slots)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=os.getenv("PIPELINE_CONFIG", "pipeline.json"))
+    parser.add_argument("--stages", nargs="+", choices=STAGE_ORDER)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    topology = load_topology(args.config)
+    supervisor = PipelineSupervisor(
+        topology, stages=args.stages, **topology.get("supervisor", {})
+    )
+    supervisor.run()
+    return 0
@@ -0,0 +1,82 @@
+"""On-demand sampling profiler for live workers.
+
+``install_profiler_hook`` makes SIGUSR1 profile the process for
+``PIPELINE_PROFILE_SECONDS`` (default 30). A background thread samples every
+thread's stack and writes them in the folded-stack format read by
+flamegraph.pl and speedscope, to ``PIPELINE_PROFILE_DIR`` (default ``.``).
+``PIPELINE_PROFILE_ON_START=<seconds>`` profiles from startup instead, with
+no signal needed.
+"""
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+_active = threading.Lock()
+
+
+def _folded_stack(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def sample_profile(seconds: float, interval: float = 0.01,
+                   output_dir: Optional[str] = None) -> Optional[str]:
+    """Sample all threads' stacks for ``seconds``; returns the output path.
+
+    Only one profile runs at a time; overlapping requests are ignored.
+    """
+    if not _active.acquire(blocking=False):
+        logging.info("Profile already in progress, ignoring request")
+        return None
+    try:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                thread_name = names.get(thread_id, str(thread_id))
+                samples[f"{thread_name};{_folded_stack(frame)}"] += 1
+            time.sleep(interval)
+
+        output_dir = output_dir or os.getenv("PIPELINE_PROFILE_DIR", ".")
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"profile-{os.getpid()}-{int(time.time())}.folded")
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logging.info(f"Wrote {sum(samples.values())} stack samples to {path}")
+        return path
+    finally:
+        _active.release()
+
+
+def start_profile(seconds: Optional[float] = None):
+    """Profile in a background thread so the caller (or signal handler) returns at once"""
+    seconds = seconds or float(os.getenv("PIPELINE_PROFILE_SECONDS", "30"))
+    logging.info(f"Profiling pid {os.getpid()} for {seconds:.0f}s")
+    threading.Thread(target=sample_profile, args=(seconds,), daemon=True,
+                     name="sampling-profiler").start()
+
+
+def install_profiler_hook():
+    """Profile on SIGUSR1, and from startup if ``PIPELINE_PROFILE_ON_START`` is set.
+
+    Must be called from the main thread.
+    """
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: start_profile())
+    on_start = os.getenv("PIPELINE_PROFILE_ON_START")
+    if on_start:
+        start_profile(float(on_start))
@@ -1,30 +1,45 @@
+import json
 import logging
-import praw
-from typing import List, Dict, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Dict, Optional
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from metrics import FETCH_SECONDS, ITEMS
 load_dotenv()
 
 
 class RedditClient:
-    def __init__(self, client_id: str, client_secret: str, user_agent: str, prompt: str):
-        if not client_id or not client_secret:
+    def __init__(self, client_id: str, client_secret: str, user_agent: str, prompt: str,
+                 comment_workers: int = 4, known_posts: Optional[Dict] = None,
+                 reddit=None):
+        if reddit is None and (not client_id or not client_secret):
             raise ValueError("Reddit API credentials are required")
+        
+        # Heavy clients are imported on first use to keep module import cheap
+        from sklearn.feature_extraction.text import HashingVectorizer
             
-        try:
-            self.reddit = praw.Reddit(
-                client_id=client_id,
-                client_secret=client_secret,
-                user_agent=user_agent
-            )
-            # Verify authentication
-            self.reddit.user.me()
-            logging.info("Successfully authenticated with Reddit API")
-        except Exception as e:
-            logging.error(f"Failed to initialize Reddit client: {e}")
-            raise
+        self._credentials = {
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'user_agent': user_agent
+        }
+        # A pre-built, thread-safe praw stand-in (benchmarks) is shared by
+        # every worker thread instead of creating per-thread instances
+        self._shared_reddit = reddit
+        if reddit is not None:
+            self.reddit = reddit
+        else:
+            import praw
+            try:
+                self.reddit = praw.Reddit(**self._credentials)
+                # Verify authentication
+                self.reddit.user.me()
+                logging.info("Successfully authenticated with Reddit API")
+            except Exception as e:
+                logging.error(f"Failed to initialize Reddit client: {e}")
+                raise
             
         self.llm_subreddits = [
             'MachineLearning',
@@ -40,15 +55,54 @@ class RedditClient:
             'MLOps'
         ]
         self.prompt = prompt
-        self.vectorizer = TfidfVectorizer(stop_words='english',ngram_range=(1, 2))
+        # Stateless hashing keeps a fixed feature space, so the context vector
+        # only has to be computed once per company context
+        self.vectorizer = HashingVectorizer(
+            stop_words='english',
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            n_features=2 ** 20
+        )
+        self._context_key = None
+        self._context_vector = None
+        
+        # Comment enrichment runs on a bounded pool; praw instances are not
+        # thread-safe, so each worker thread gets its own. The pool lives as
+        # long as the client so those instances stay authenticated across polls
+        self.comment_workers = comment_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread_local = threading.local()
+        self._rate_limit_lock = threading.Lock()
+        self._rate_limit_remaining = None
+        self._rate_limit_reset = None
+        
+        # Cross-poll seen-post index: ``known_posts`` is the caller's dedup state
+        # (ids already produced downstream, shared by reference) and
+        # ``scored_posts`` holds ids this client scored as irrelevant, with
+        # their creation time so they age out with the 48 hour cutoff
+        self.known_posts = known_posts if known_posts is not None else {}
+        self.scored_posts: Dict[str, float] = {}
         logging.info(f"Monitoring subreddits: {', '.join(self.llm_subreddits)}")
 
     def fetch_posts(self, company_context: Dict, time_filter: str = 'day', limit: int = 100) -> List[Dict]:
-        """Fetch posts from LLM-related subreddits from the past 48 hours"""
+        """Fetch posts from LLM-related subreddits from the past 48 hours, with comments"""
+        return list(self.iter_enriched_posts(self.fetch_candidates(company_context, time_filter, limit)))
+
+    def fetch_candidates(self, company_context: Dict, time_filter: str = 'day', limit: int = 100) -> List[Dict]:
+        """Fetch relevant posts from the past 48 hours without their comments
+        
+        Comments are added later by ``iter_enriched_posts``, once callers have
+        dropped posts they already processed.
+        """
         posts = []
         cutoff_time = datetime.now() - timedelta(hours=48)
+        started = time.perf_counter()
         total_fetched = 0
         relevant_count = 0
+        skipped_seen = 0
+        irrelevant = 0
+        seen_this_cycle = set()
+        self._expire_scored_posts(cutoff_time.timestamp())
         
         try:
             # Create a multireddit-style query
@@ -66,109 +120,243 @@ class RedditClient:
                 else:
                     submission_stream = subreddit.new(limit=limit)
                 
-                for post in submission_stream:
-                    total_fetched += 1
+                listing_had_known = False
+                for page in self._iter_pages(submission_stream):
+                    total_fetched += len(page)
                     
-                    try:
-                        # Skip if post is older than 48 hours
-                        post_time = datetime.fromtimestamp(post.created_utc)
-                        if post_time < cutoff_time:
+                    # Skip posts older than 48 hours and posts already seen in
+                    # this poll, already produced, or already scored irrelevant
+                    recent = []
+                    for post in page:
+                        if datetime.fromtimestamp(post.created_utc) < cutoff_time:
+                            continue
+                        if post.id in self.known_posts:
+                            listing_had_known = True
+                        if (post.id in seen_this_cycle or post.id in self.known_posts
+                                or post.id in self.scored_posts):
+                            skipped_seen += 1
                             continue
-                        
-                        # Calculate relevance score using company context
-                        combined_text = f"{post.title} {post.selftext}"
-                        relevance_score = self.calculate_relevance(combined_text, company_context)
-                        
+                        seen_this_cycle.add(post.id)
+                        recent.append(post)
+                    
+                    # Score the whole page against the company context at once
+                    scores = self.score_batch(
+                        [f"{post.title} {post.selftext}" for post in recent],
+                        company_context
+                    )
+                    
+                    for post, relevance_score in zip(recent, scores):
                         # Only include posts with relevance score above threshold
-                        if relevance_score >= 0.01:  # Adjust threshold as needed
-                            relevance_score*=82
+                        if relevance_score < 0.01:  # Adjust threshold as needed
+                            self.scored_posts[post.id] = post.created_utc
+                            irrelevant += 1
+                            continue
+                        try:
+                            relevance_score *= 82
                             relevant_count += 1
-                            
-                            # Get top comments
-                            post.comments.replace_more(limit=0)
-                            comments = []
-                            for comment in post.comments.list()[:10]:
-                                try:
-                                    comments.append({
-                                        'id': comment.id,
-                                        'body': comment.body,
-                                        'score': comment.score,
-                                        'created_utc': comment.created_utc
-                                    })
-                                except Exception as e:
-                                    logging.warning(f"Error processing comment {comment.id}: {e}")
-                            
-                            post_data = {
-                                'metadata': {
-                                    'id': post.id,
-                                    'subreddit': post.subreddit.display_name,
-                                    'created_utc': post.created_utc,
-                                    'processed_at': datetime.now().isoformat(),
-                                    'url': f"https://reddit.com{post.permalink}",
-                                    'relevance_score': relevance_score,
-                                    'company_context': {
-                                        'industry': company_context['industry'],
-                                        'research_focus': company_context['research_focus']
-                                    }
-                                },
-                                'content': {
-                                    'title': post.title,
-                                    'selftext': post.selftext,
-                                    'score': post.score,
-                                    'upvote_ratio': post.upvote_ratio,
-                                    'num_comments': post.num_comments,
-                                    'comments': comments
-                                }
-                            }
-                            posts.append(post_data)
-                            
+                            posts.append(self._build_post_data(post, relevance_score, company_context))
                             logging.debug(f"Added relevant post: '{post.title[:50]}...' (score: {relevance_score:.2f})")
+                        except Exception as e:
+                            logging.warning(f"Error processing post {post.id}: {e}")
+                            continue
                     
-                    except Exception as e:
-                        logging.warning(f"Error processing post {post.id}: {e}")
-                        continue
+                    # Nothing new on this page: the rest of the listing is stale
+                    if not recent:
+                        break
                 
-                if posts:  # If we have enough posts, no need to try other sorting methods
+                # If this listing produced (or previously produced) relevant
+                # posts, no need to try other sorting methods
+                if posts or listing_had_known:
                     break
         
         except Exception as e:
             logging.error(f"Error fetching posts: {e}")
         
         finally:
-            logging.info(f"Fetched {total_fetched} total posts, found {relevant_count} relevant posts")
+            FETCH_SECONDS.labels("reddit").observe(time.perf_counter() - started)
+            ITEMS.labels("reddit_fetch", "fetched").inc(total_fetched)
+            ITEMS.labels("reddit_fetch", "deduped").inc(skipped_seen)
+            ITEMS.labels("reddit_fetch", "filtered").inc(irrelevant)
+            logging.info(
+                f"Fetched {total_fetched} total posts, skipped {skipped_seen} already seen, "
+                f"found {relevant_count} relevant posts"
+            )
         
         return posts
 
-    def calculate_relevance(self, text: str, company_context: Dict) -> float:
-        """Calculate relevance score between post and company context"""
+    def _expire_scored_posts(self, cutoff_timestamp: float):
+        """Forget scored posts that have fallen behind the fetch cutoff"""
+        self.scored_posts = {
+            post_id: created_utc
+            for post_id, created_utc in self.scored_posts.items()
+            if created_utc >= cutoff_timestamp
+        }
+
+    @staticmethod
+    def _iter_pages(submission_stream, page_size: int = 100):
+        """Group a listing into pages (praw fetches listings 100 at a time)"""
+        page = []
+        for post in submission_stream:
+            page.append(post)
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _build_post_data(self, post, relevance_score: float, company_context: Dict) -> Dict:
+        """Build the output record for a post; comments are filled in by enrichment"""
+        return {
+            'metadata': {
+                'id': post.id,
+                'subreddit': post.subreddit.display_name,
+                'created_utc': post.created_utc,
+                'processed_at': datetime.now().isoformat(),
+                'url': f"https://reddit.com{post.permalink}",
+                'relevance_score': relevance_score,
+                'company_context': {
+                    'industry': company_context['industry'],
+                    'research_focus': company_context['research_focus']
+                }
+            },
+            'content': {
+                'title': post.title,
+                'selftext': post.selftext,
+                'link': post.url,
+                'score': post.score,
+                'upvote_ratio': post.upvote_ratio,
+                'num_comments': post.num_comments,
+                'comments': []
+            }
+        }
+
+    def _worker_reddit(self):
+        """praw instance owned by the current thread"""
+        if self._shared_reddit is not None:
+            return self._shared_reddit
+        reddit = getattr(self._thread_local, 'reddit', None)
+        if reddit is None:
+            import praw
+            reddit = praw.Reddit(**self._credentials)
+            self._thread_local.reddit = reddit
+        return reddit
+
+    def _wait_for_rate_limit(self, reserve: int = 0):
+        """Sleep until the rate-limit window resets if too few requests remain"""
+        with self._rate_limit_lock:
+            remaining, reset = self._rate_limit_remaining, self._rate_limit_reset
+            if remaining is not None:
+                # Claim a request so concurrent workers don't all spend the last one
+                self._rate_limit_remaining = remaining - 1
+        if remaining is not None and reset is not None and remaining <= reserve + self.comment_workers:
+            delay = reset - time.time()
+            if delay > 0:
+                logging.info(f"Reddit rate limit nearly exhausted ({remaining:.0f} left), waiting {delay:.1f}s")
+                time.sleep(delay)
+
+    def _record_rate_limit(self, reddit):
+        """Update the shared rate-limit view from a praw instance's response headers"""
+        limits = getattr(reddit.auth, 'limits', None) or {}
+        if limits.get('remaining') is None:
+            return
+        with self._rate_limit_lock:
+            self._rate_limit_remaining = limits['remaining']
+            self._rate_limit_reset = limits.get('reset_timestamp')
+
+    def _fetch_comments(self, post_id: str, limit: int = 10) -> List[Dict]:
+        """Fetch a post's top comments with one API round trip"""
+        self._wait_for_rate_limit()
+        reddit = self._worker_reddit()
+        submission = reddit.submission(id=post_id)
+        submission.comments.replace_more(limit=0)
+        self._record_rate_limit(reddit)
+        comments = []
+        for comment in submission.comments.list()[:limit]:
+            try:
+                comments.append({
+                    'id': comment.id,
+                    'body': comment.body,
+                    'score': comment.score,
+                    'created_utc': comment.created_utc
+                })
+            except Exception as e:
+                logging.warning(f"Error processing comment {comment.id}: {e}")
+        return comments
+
+    def iter_enriched_posts(self, posts: List[Dict]) -> Iterator[Dict]:
+        """Fetch comments for ``posts`` in parallel, yielding each post as it completes"""
+        if not posts:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.comment_workers, thread_name_prefix='reddit-comments'
+            )
+        futures = {
+            self._executor.submit(self._fetch_comments, post['metadata']['id']): post
+            for post in posts
+        }
         try:
-            # Create a comprehensive context string
-            context_terms = [
-                company_context['industry'],
-                *company_context['research_focus'],
-                *company_context['current_projects'],
-                *company_context.get('core_technologies', []),
-                *company_context.get('available_resources', [])
-            ]
-            
-            # Add related terms for each context term
-            expanded_terms = []
-            for term in context_terms:
-                expanded_terms.extend([
-                    term,
-                    term.lower(),
-                    term.replace(' ', ''),
-                    term.replace('-', ' ')
-                ])
-            
-            context_string = ' '.join(expanded_terms)
-            
-            # Calculate similarity
-            tfidf_matrix = self.vectorizer.fit_transform([context_string, text])
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            
-            return float(similarity)
-            
+            for future in as_completed(futures):
+                post = futures[future]
+                try:
+                    post['content']['comments'] = future.result()
+                except Exception as e:
+                    logging.warning(f"Error fetching comments for post {post['metadata']['id']}: {e}")
+                yield post
+        finally:
+            # The caller stopped early: don't leave its fetches queued on the pool
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        """Shut down the comment-fetching pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_context_vector(self, company_context: Dict):
+        """Expand and vectorize the company context, cached until the context changes"""
+        context_key = json.dumps(company_context, sort_keys=True, default=str)
+        if context_key == self._context_key:
+            return self._context_vector
+        
+        # Create a comprehensive context string
+        context_terms = [
+            company_context['industry'],
+            *company_context['research_focus'],
+            *company_context['current_projects'],
+            *company_context.get('core_technologies', []),
+            *company_context.get('available_resources', [])
+        ]
+        
+        # Add related terms for each context term
+        expanded_terms = []
+        for term in context_terms:
+            expanded_terms.extend([
+                term,
+                term.lower(),
+                term.replace(' ', ''),
+                term.replace('-', ' ')
+            ])
+        
+        context_string = ' '.join(expanded_terms)
+        self._context_vector = self.vectorizer.transform([context_string]).T.tocsc()
+        self._context_key = context_key
+        return self._context_vector
+
+    def score_batch(self, texts: List[str], company_context: Dict) -> List[float]:
+        """Cosine similarity of each text to the company context"""
+        if not texts:
+            return []
+        try:
+            context_vector = self._get_context_vector(company_context)
+            # Rows are L2-normalised, so the dot product is the cosine similarity
+            scores = (self.vectorizer.transform(texts) @ context_vector).toarray().ravel()
+            return [float(score) for score in scores]
         except Exception as e:
             logging.error(f"Error calculating relevance: {e}")
-            return 0.0
\ No newline at end of file
+            return [0.0] * len(texts)
+
+    def calculate_relevance(self, text: str, company_context: Dict) -> float:
+        """Calculate relevance score between post and company context"""
+        return self.score_batch([text], company_context)[0]
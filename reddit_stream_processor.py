@@ -1,20 +1,31 @@
-from confluent_kafka import Consumer, Producer, KafkaError
-import json
+from confluent_kafka import Consumer, KafkaError, TopicPartition
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 import time
 from datetime import timedelta
+from functools import partial
 import logging
 import os
 from dotenv import load_dotenv
-from confluent_kafka.admin import AdminClient, NewTopic
+import heartbeat
+from confluent_kafka.admin import AdminClient, NewPartitions, NewTopic
+from kafka_output import BatchingProducer
+from metrics import COMMIT_SECONDS, ITEMS, record_consumer_stats
+from near_duplicates import NearDuplicateIndex
 from reddit_client import RedditClient
+from relevance_engine import RelevanceEngine
+from serialization import TopicCodecs
+from tracing import TRACER, SpanContext
 from sentiment_analyzer import SentimentAnalyzer
 load_dotenv()
 
 class RedditStreamProcessor:
-    def __init__(self, bootstrap_servers: str, api_key: str, api_secret: str):
+    def __init__(self, bootstrap_servers: str, api_key: str, api_secret: str,
+                 producer_options: Optional[Dict] = None, num_partitions: int = 1,
+                 serialization: Optional[Dict] = None, clients: Optional[Dict] = None,
+                 debug: bool = False,
+                 near_duplicate_path: Optional[str] = "reddit_near_duplicates.db"):
         self.producer_config = {
             'bootstrap.servers': bootstrap_servers,
             'security.protocol': 'SASL_SSL',
@@ -26,13 +37,36 @@ class RedditStreamProcessor:
         self.consumer_config = {
             **self.producer_config,
             'group.id': 'reddit_processor',
-            'auto.offset.reset': 'earliest'
+            'auto.offset.reset': 'earliest',
+            'enable.auto.commit': False,
+            # Per-partition consumer lag for the metrics endpoint
+            'statistics.interval.ms': 15000,
+            'stats_cb': partial(record_consumer_stats, 'reddit_processor')
         }
         
-        self.producer = Producer(self.producer_config)
-        self.consumer = Consumer(self.consumer_config)
-        self.admin_client = AdminClient(self.producer_config)
+        # ``clients`` may supply pre-built "producer", "consumer" and "admin"
+        # clients in place of the real ones (see benchmarks/)
+        clients = clients or {}
+        # Wire format per topic (see serialization.TopicCodecs); JSON by default
+        self.codecs = TopicCodecs(serialization)
+        self.producer = BatchingProducer(self.producer_config, producer=clients.get("producer"),
+                                         precompressed=self.codecs.compresses,
+                                         **(producer_options or {}))
+        self.consumer = clients.get("consumer") or Consumer(self.consumer_config)
+        self.admin_client = clients.get("admin") or AdminClient(self.producer_config)
+        # Default partition count for topics this processor creates or grows
+        self.num_partitions = num_partitions
         self.processed_posts = {}  # Changed to dict to store timestamps
+        # Keyword matchers compiled once per company context
+        self.relevance_engine = RelevanceEngine()
+        # Per-post logging and summaries are only worth their cost when debugging
+        self.debug = debug
+        # Sentiment of recently analysed posts by text, reused for cross-posts
+        self.near_duplicates = NearDuplicateIndex(near_duplicate_path)
+        # Created by process_sentiment; owns the analysis worker pool
+        self.sentiment_analyzer: Optional[SentimentAnalyzer] = None
+        # Created by stream_reddit_data; owns the comment-fetching pool
+        self.reddit_client: Optional[RedditClient] = None
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
@@ -43,12 +77,15 @@ class RedditStreamProcessor:
             current_time = datetime.now()
             cutoff_time = current_time - timedelta(hours=48)
             
-            # Create a new dict with only recent posts
-            self.processed_posts = {
-                post_id: timestamp 
+            # Drop old posts in place: the dict is shared with the RedditClient
+            # as its seen-post index
+            expired = [
+                post_id
                 for post_id, timestamp in self.processed_posts.items()
-                if timestamp > cutoff_time
-            }
+                if timestamp <= cutoff_time
+            ]
+            for post_id in expired:
+                del self.processed_posts[post_id]
             
             cleaned_count = len(self.processed_posts)
             self.logger.debug(f"Cleaned processed posts cache. Remaining entries: {cleaned_count}")
@@ -56,9 +93,10 @@ class RedditStreamProcessor:
         except Exception as e:
             self.logger.error(f"Error cleaning old post IDs: {e}")
 
-    def create_topic_if_not_exists(self, topic_name: str, num_partitions: int = 1, 
+    def create_topic_if_not_exists(self, topic_name: str, num_partitions: Optional[int] = None, 
                                  replication_factor: int = 3):
-        """Create a Kafka topic if it doesn't already exist"""
+        """Create a Kafka topic if it doesn't already exist, or grow its partitions"""
+        num_partitions = num_partitions or self.num_partitions
         try:
             # Get existing topics
             metadata = self.admin_client.list_topics(timeout=10)
@@ -92,7 +130,15 @@ class RedditStreamProcessor:
                 # Optionally verify topic configuration
                 topic_config = metadata.topics[topic_name]
                 current_partitions = len(topic_config.partitions)
-                if current_partitions != num_partitions:
+                if current_partitions < num_partitions:
+                    # Partitions can only be added, and this is safe online
+                    futures = self.admin_client.create_partitions(
+                        [NewPartitions(topic_name, num_partitions)]
+                    )
+                    for future in futures.values():
+                        future.result(timeout=30)
+                    self.logger.info(f"Expanded topic {topic_name} to {num_partitions} partitions")
+                elif current_partitions != num_partitions:
                     self.logger.warning(
                         f"Topic {topic_name} exists with {current_partitions} partitions "
                         f"(expected {num_partitions})"
@@ -109,154 +155,271 @@ class RedditStreamProcessor:
             os.getenv('REDDIT_CLIENT_ID'),
             os.getenv('REDDIT_CLIENT_SECRET'),
             'RedditAnalyzer/1.0',
-            ""  # Empty prompt as we're using company context instead
+            "",  # Empty prompt as we're using company context instead
+            known_posts=self.processed_posts
         )
+        self.reddit_client = reddit_client
         
         while True:
+            heartbeat.beat()
             try:
-                posts = reddit_client.fetch_posts(company_context)
+                with TRACER.span('reddit.fetch'):
+                    candidates = reddit_client.fetch_candidates(company_context)
                 processed = 0
                 current_time = datetime.now()
                 
-                for post in posts:
+                # Only fetch comments for posts we haven't produced yet
+                new_posts = [
+                    post for post in candidates
+                    if post['metadata']['id'] not in self.processed_posts
+                ]
+                
+                for post in reddit_client.iter_enriched_posts(new_posts):
                     post_id = post['metadata']['id']
                     if post_id not in self.processed_posts:
                         try:
-                            self.producer.produce(
-                                output_topic,
-                                key=post_id,
-                                value=json.dumps(post)
-                            )
+                            # Each post starts its own trace, followed downstream
+                            with TRACER.span('reddit.produce', post_id=post_id) as span:
+                                value, headers = self.codecs.encode(output_topic, post)
+                                self.producer.produce(
+                                    output_topic,
+                                    key=post_id,
+                                    value=value,
+                                    headers=TRACER.inject(headers, span.context)
+                                )
                             self.processed_posts[post_id] = current_time
                             processed += 1
                         except Exception as e:
                             self.logger.error(f"Error producing message for post {post_id}: {e}")
                 
-                self.producer.flush()
+                if self.producer.flush():
+                    ITEMS.labels('reddit_fetch', 'produced').inc(processed)
                 self.logger.info(f"Processed {processed} Reddit posts")
                 
                 # Clean up old post IDs from memory
                 self.clean_old_post_ids()
                 
-                time.sleep(300)  # 5 minutes
+                heartbeat.sleep(300)  # 5 minutes
                 
             except Exception as e:
                 self.logger.error(f"Error in Reddit streaming: {e}")
-                time.sleep(60)
+                heartbeat.sleep(60)
     
-    def calculate_industry_relevance(self, post: Dict, company_context: Dict) -> float:
-        """Calculate relevance to company industry"""
+    def _on_revoke(self, consumer, partitions):
+        """Deliver outputs and commit consumed offsets before giving up partitions"""
+        self.logger.info(f"Revoking partitions: {[p.partition for p in partitions]}")
         try:
-            # Create industry-specific keywords
-            industry = company_context['industry'].lower()
-            industry_keywords = {
-                'biotechnology': [
-                    'biotech', 'biological', 'drug', 'therapeutic', 'clinical',
-                    'pharmaceutical', 'molecule', 'protein', 'enzyme', 'antibody',
-                    'genomic', 'cell', 'tissue', 'assay', 'screening'
-                ],
-                'artificial intelligence': [
-                    'ai', 'machine learning', 'neural network', 'deep learning',
-                    'algorithm', 'model', 'prediction', 'classification',
-                    'training', 'inference', 'optimization'
-                ]
-            }
-            
-            # Get relevant keywords for the industry
-            keywords = industry_keywords.get(industry.lower(), [])
-            if not keywords:
-                keywords = [industry]  # Use industry name if no specific keywords
-            
-            # Combine post title and content
-            text = f"{post['content']['title']} {post['content']['selftext']}".lower()
-            
-            # Count keyword matches
-            matches = sum(1 for keyword in keywords if keyword in text)
-            
-            # Calculate normalized score
-            score = matches / len(keywords) if keywords else 0
-            
-            return min(1.0, score)  # Cap at 1.0
-            
+            if self.producer.flush():
+                consumer.commit(asynchronous=False)
         except Exception as e:
-            self.logger.error(f"Error calculating industry relevance: {e}")
-            return 0.0
+            # Nothing consumed since the last commit
+            self.logger.debug(f"No offsets committed on revoke: {e}")
+    
+    def _commit(self, **kwargs):
+        """Commit consumed offsets, timing the call"""
+        with TRACER.span('kafka.commit'), COMMIT_SECONDS.labels('reddit_processor').time():
+            self.consumer.commit(**kwargs)
 
-    def calculate_technology_relevance(self, post: Dict, company_context: Dict) -> float:
-        """Calculate relevance to company technologies"""
+    def _decode(self, msg) -> Tuple[Dict, Optional[SpanContext]]:
+        """Decode a consumed post and the trace context it was produced under"""
+        trace_context = TRACER.extract(msg.headers())
+        with TRACER.span('sentiment.decode', parent=trace_context):
+            return self.codecs.decode(msg), trace_context
+
+    def close(self):
+        """Leave the consumer group, committing delivered work via ``_on_revoke``"""
         try:
-            # Get company technologies and create related terms
-            tech_terms = []
-            for tech in company_context.get('core_technologies', []):
-                tech_lower = tech.lower()
-                tech_terms.extend([
-                    tech_lower,
-                    tech_lower.replace(' ', ''),
-                    tech_lower.replace('-', ' ')
-                ])
-            
-            # Add common variations and related terms
-            tech_related = {
-                'machine learning': ['ml', 'deep learning', 'neural network', 'ai model'],
-                'molecular dynamics': ['md simulation', 'molecular simulation', 'atomistic'],
-                'high-throughput screening': ['hts', 'screening', 'automated testing']
-            }
-            
-            for tech in company_context.get('core_technologies', []):
-                if tech.lower() in tech_related:
-                    tech_terms.extend(tech_related[tech.lower()])
-            
-            # Combine post title and content
-            text = f"{post['content']['title']} {post['content']['selftext']}".lower()
-            
-            # Calculate matches
-            matches = sum(1 for term in tech_terms if term in text)
-            
-            # Normalize score
-            score = matches / (len(tech_terms) * 0.5) if tech_terms else 0  # Adjust threshold
-            
-            return min(1.0, score)  # Cap at 1.0
-            
+            self.consumer.close()
         except Exception as e:
-            self.logger.error(f"Error calculating technology relevance: {e}")
-            return 0.0
+            self.logger.error(f"Error closing consumer: {e}")
+        self.producer.flush()
+        if self.sentiment_analyzer is not None:
+            self.sentiment_analyzer.close()
+        if self.reddit_client is not None:
+            self.reddit_client.close()
+        self.near_duplicates.close()
+
+    def _post_signature(self, post: Dict):
+        """Near-duplicate signature over a post's title, body and link"""
+        content = post['content']
+        return self.near_duplicates.signature(
+            NearDuplicateIndex.text_of(content['title'], content['selftext'], content.get('link'))
+        )
+
+    def _adapt_sentiment(self, post: Dict, prior_id: str, prior: Dict) -> Dict:
+        """Sentiment of a near-duplicate post for this one: the text-derived
+        analysis carries over, engagement is the post's own"""
+        ITEMS.labels('sentiment', 'near_duplicate').inc()
+        return {
+            **prior,
+            'engagement_metrics': SentimentAnalyzer.engagement_metrics(post['content']),
+            'duplicate_of': prior_id
+        }
+
+    def _reuse_sentiment(self, post: Dict, signature) -> Optional[Dict]:
+        """Sentiment of a recently analysed near-duplicate (e.g. a cross-post), if any"""
+        post_id = post['metadata']['id']
+        match = self.near_duplicates.query(signature, exclude=post_id)
+        if match is None or not match[2]:
+            return None
+        prior_id, similarity, prior = match
+        self.logger.debug(
+            f"Reusing sentiment of {prior_id} for near-duplicate post {post_id} "
+            f"(similarity {similarity:.2f})"
+        )
+        return self._adapt_sentiment(post, prior_id, prior)
+
+    def _analyze_posts(self, sentiment_analyzer: SentimentAnalyzer, posts: List[Dict]) -> List[Dict]:
+        """Sentiment for each post, analysing only one of each group of near-duplicates"""
+        signatures = [self._post_signature(post) for post in posts]
+        sentiments = [self._reuse_sentiment(post, signature)
+                      for post, signature in zip(posts, signatures)]
+        
+        # Cross-posts are usually fetched together, so also match within the batch
+        fresh = []
+        followers = {}
+        for i, signature in enumerate(signatures):
+            if sentiments[i] is not None:
+                continue
+            leader = None
+            if signature is not None:
+                leader = next((j for j in fresh if signatures[j] is not None
+                               and NearDuplicateIndex.similarity(signature, signatures[j])
+                               >= self.near_duplicates.threshold), None)
+            if leader is None:
+                fresh.append(i)
+            else:
+                followers[i] = leader
+        
+        if len(fresh) > 1:
+            analysed = sentiment_analyzer.analyze_batch([posts[i]['content'] for i in fresh])
+        else:
+            analysed = [sentiment_analyzer.analyze_sentiment(posts[i]['content']) for i in fresh]
+        for i, sentiment in zip(fresh, analysed):
+            sentiments[i] = sentiment
+            self.near_duplicates.add(posts[i]['metadata']['id'], signatures[i], sentiment)
+        for i, leader in followers.items():
+            sentiments[i] = self._adapt_sentiment(
+                posts[i], posts[leader]['metadata']['id'], sentiments[leader]
+            )
+        return sentiments
+
+    def calculate_industry_relevance(self, post: Dict, company_context: Dict) -> float:
+        """Calculate relevance to company industry"""
+        return self.calculate_combined_relevance(post, company_context)['industry_match']
+
+    def calculate_technology_relevance(self, post: Dict, company_context: Dict) -> float:
+        """Calculate relevance to company technologies"""
+        return self.calculate_combined_relevance(post, company_context)['technology_match']
 
     def calculate_combined_relevance(self, post: Dict, company_context: Dict) -> Dict:
         """Calculate combined relevance metrics"""
-        try:
-            industry_score = self.calculate_industry_relevance(post, company_context)
-            tech_score = self.calculate_technology_relevance(post, company_context)
-            
-            # Calculate combined score with weights
-            combined_score = (0.6 * industry_score) + (0.4 * tech_score)
-            
-            return {
-                'industry_match': float(industry_score),
-                'technology_match': float(tech_score),
-                'combined_score': float(combined_score)
+        return self.relevance_engine.score_batch([post], company_context)[0]
+
+    def calculate_combined_relevance_batch(self, posts: List[Dict], company_context: Dict) -> List[Dict]:
+        """Calculate combined relevance metrics for a batch of posts"""
+        return self.relevance_engine.score_batch(posts, company_context)
+
+    def _emit_analysis(self, post: Dict, sentiment_analysis: Dict, relevance_scores: Dict,
+                       output_topic: str, company_context: Dict,
+                       reference_payloads: bool = False,
+                       trace_context: Optional[SpanContext] = None):
+        """Build the analysis record for a post and produce it to the output topic
+
+        With ``reference_payloads`` the record carries the post metadata (with
+        its id) and the computed analysis but not the post content, which
+        readers can look up by id on the input topic.
+        """
+        analysis = {
+            'metadata': post['metadata'],
+            'content': post['content'],
+            'analysis': {
+                'sentiment': sentiment_analysis,
+                'timestamp': datetime.now().isoformat(),
+                'relevance': relevance_scores
             }
+        }
+        
+        # Log relevance scores for debugging
+        if self.debug:
+            self.logger.info(f"\nRelevance Scores for post '{post['content']['title'][:50]}...':")
+            self.logger.info(f"Industry Match: {relevance_scores['industry_match']:.3f}")
+            self.logger.info(f"Technology Match: {relevance_scores['technology_match']:.3f}")
+            self.logger.info(f"Combined Score: {relevance_scores['combined_score']:.3f}")
+        
+        try:
+            record = analysis
+            if reference_payloads:
+                record = {key: value for key, value in analysis.items() if key != 'content'}
+            with TRACER.span('sentiment.produce', parent=trace_context) as span:
+                value, headers = self.codecs.encode(output_topic, record)
+                self.producer.produce(
+                    output_topic,
+                    key=post['metadata']['id'],
+                    value=value,
+                    headers=TRACER.inject(headers, span.context)
+                )
+            ITEMS.labels('sentiment', 'processed').inc()
+            if self.debug:
+                self.print_analysis_summary(analysis, company_context)
             
-        except Exception as e:
-            self.logger.error(f"Error calculating combined relevance: {e}")
-            return {
-                'industry_match': 0.0,
-                'technology_match': 0.0,
-                'combined_score': 0.0
-            }
+        except TypeError as e:
+            self.logger.error(f"Serialization error: {e}")
 
-    def process_sentiment(self, input_topic: str, output_topic: str, company_context: Dict):
-        """Process posts and generate sentiment analysis"""
+    def process_sentiment(self, input_topic: str, output_topic: str, company_context: Dict,
+                          commit_interval_messages: int = 100,
+                          commit_interval_seconds: float = 5.0,
+                          batch_size: int = 1,
+                          batch_timeout: float = 1.0,
+                          sentiment_workers: int = 1,
+                          reference_payloads: bool = False):
+        """Process posts and generate sentiment analysis
+        
+        Outputs are produced asynchronously; every ``commit_interval_messages``
+        messages or ``commit_interval_seconds`` the producer is flushed and the
+        consumed offsets are committed once all deliveries are confirmed.
+        With ``batch_size`` > 1, up to that many messages are consumed at once
+        (waiting at most ``batch_timeout`` seconds), analysed as a batch and
+        committed with one asynchronous commit per batch, and
+        ``sentiment_workers`` > 1 spreads each batch's analysis over that many
+        processes. ``reference_payloads`` leaves the post content out of the
+        output records (see ``_emit_analysis``). A near-duplicate of a recently
+        analysed post, such as a cross-post, reuses that post's sentiment and
+        names it in ``duplicate_of``.
+        """
         try:
             # Ensure both topics exist
             self.create_topic_if_not_exists(input_topic)
             self.create_topic_if_not_exists(output_topic)
             
             # Subscribe to input topic
-            self.consumer.subscribe([input_topic])
-            sentiment_analyzer = SentimentAnalyzer()
+            self.consumer.subscribe([input_topic], on_revoke=self._on_revoke)
+            self.sentiment_analyzer = SentimentAnalyzer(workers=sentiment_workers)
+            sentiment_analyzer = self.sentiment_analyzer
+            
+            if batch_size > 1:
+                self._process_sentiment_batches(
+                    sentiment_analyzer, output_topic, company_context, batch_size, batch_timeout,
+                    reference_payloads
+                )
+                return
+            
+            uncommitted = 0
+            last_commit = time.monotonic()
             
             while True:
+                heartbeat.beat()
                 try:
+                    if uncommitted and (
+                        uncommitted >= commit_interval_messages
+                        or time.monotonic() - last_commit >= commit_interval_seconds
+                    ):
+                        if self.producer.flush():
+                            self._commit(asynchronous=False)
+                            uncommitted = 0
+                        last_commit = time.monotonic()
+                    
+                    poll_started = time.time()
                     msg = self.consumer.poll(1.0)
                     
                     if msg is None:
@@ -268,48 +431,98 @@ class RedditStreamProcessor:
                             self.logger.error(f"Consumer error: {msg.error()}")
                             break
                     
-                    post = json.loads(msg.value())
-                    sentiment_analysis = sentiment_analyzer.analyze_sentiment(post['content'])
-                    relevance_scores = self.calculate_combined_relevance(post, company_context)
-                    
-                    analysis = {
-                        'metadata': post['metadata'],
-                        'content': post['content'],
-                        'analysis': {
-                            'sentiment': sentiment_analysis,
-                            'timestamp': datetime.now().isoformat(),
-                            'relevance': relevance_scores
-                        }
-                    }
-                    
-                    # Log relevance scores for debugging
-                    self.logger.info(f"\nRelevance Scores for post '{post['content']['title'][:50]}...':")
-                    self.logger.info(f"Industry Match: {relevance_scores['industry_match']:.3f}")
-                    self.logger.info(f"Technology Match: {relevance_scores['technology_match']:.3f}")
-                    self.logger.info(f"Combined Score: {relevance_scores['combined_score']:.3f}")
-                    
-                    try:
-                        json_str = json.dumps(analysis)
-                        self.producer.produce(
-                            output_topic,
-                            key=post['metadata']['id'],
-                            value=json_str
-                        )
-                        
-                        self.producer.flush()
-                        self.print_analysis_summary(analysis, company_context)
-                        
-                    except TypeError as e:
-                        self.logger.error(f"JSON serialization error: {e}")
-                        continue
+                    post, trace_context = self._decode(msg)
+                    TRACER.record_child('kafka.poll', trace_context, poll_started, time.time())
+                    with TRACER.span('sentiment.analyze', parent=trace_context):
+                        sentiment_analysis = self._analyze_posts(sentiment_analyzer, [post])[0]
+                        relevance_scores = self.calculate_combined_relevance(post, company_context)
+                    self._emit_analysis(post, sentiment_analysis, relevance_scores,
+                                        output_topic, company_context, reference_payloads,
+                                        trace_context)
+                    uncommitted += 1
                         
                 except Exception as e:
                     self.logger.error(f"Error processing message: {e}")
-                    time.sleep(60)
+                    heartbeat.sleep(60)
                     
         except Exception as e:
             self.logger.error(f"Fatal error in process_sentiment: {e}")
             raise
+
+    def _process_sentiment_batches(self, sentiment_analyzer: SentimentAnalyzer, output_topic: str,
+                                   company_context: Dict, batch_size: int, batch_timeout: float,
+                                   reference_payloads: bool = False):
+        """Consume, analyse and commit posts a batch at a time
+
+        The commit names the batch's offsets explicitly and is only made once
+        its outputs are delivered; otherwise the consumer seeks back so the
+        batch is consumed again.
+        """
+        while True:
+            heartbeat.beat()
+            # First offset of the current batch per partition, to rewind to on failure
+            batch_start: Dict[Tuple[str, int], int] = {}
+            try:
+                consume_started = time.time()
+                messages = self.consumer.consume(num_messages=batch_size, timeout=batch_timeout)
+                if not messages:
+                    continue
+                consumed = time.time()
+                
+                posts = []
+                contexts = []
+                commit_offsets = {}
+                for msg in messages:
+                    if msg.error():
+                        if msg.error().code() != KafkaError._PARTITION_EOF:
+                            self.logger.error(f"Consumer error: {msg.error()}")
+                        continue
+                    source = (msg.topic(), msg.partition())
+                    batch_start.setdefault(source, msg.offset())
+                    commit_offsets[source] = msg.offset() + 1
+                    try:
+                        post, trace_context = self._decode(msg)
+                        TRACER.record_child('kafka.consume', trace_context, consume_started, consumed)
+                        posts.append(post)
+                        contexts.append(trace_context)
+                    except ValueError as e:
+                        self.logger.error(f"Invalid message at offset {msg.offset()}: {e}")
+                
+                if posts:
+                    # One span for the whole batch; it is shared work, not any one post's
+                    with TRACER.span('sentiment.analyze_batch', size=len(posts)):
+                        sentiments = self._analyze_posts(sentiment_analyzer, posts)
+                        relevances = self.calculate_combined_relevance_batch(posts, company_context)
+                    for post, trace_context, sentiment_analysis, relevance_scores in zip(
+                        posts, contexts, sentiments, relevances
+                    ):
+                        self._emit_analysis(post, sentiment_analysis, relevance_scores,
+                                            output_topic, company_context, reference_payloads,
+                                            trace_context)
+                
+                # One commit per batch, once its outputs are delivered
+                if not self.producer.flush():
+                    raise RuntimeError("batch outputs were not delivered")
+                if commit_offsets:
+                    self._commit(
+                        offsets=[TopicPartition(topic, partition, offset)
+                                 for (topic, partition), offset in commit_offsets.items()],
+                        asynchronous=True
+                    )
+                    
+            except Exception as e:
+                self.logger.error(f"Error processing batch: {e}")
+                self._rewind(batch_start)
+                heartbeat.sleep(60)
+
+    def _rewind(self, offsets: Dict[Tuple[str, int], int]):
+        """Seek back to these offsets so an unfinished batch is consumed again"""
+        for (topic, partition), offset in offsets.items():
+            try:
+                self.consumer.seek(TopicPartition(topic, partition, offset))
+            except Exception as e:
+                # Partition no longer assigned: its new owner resumes from the commit
+                self.logger.warning(f"Could not rewind partition {partition}: {e}")
     
     def print_analysis_summary(self, analysis: Dict, company_context: Dict):
         """Print detailed analysis summary with company context relevance"""
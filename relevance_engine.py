@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, List, Set
+
+# Industry-specific keywords
+INDUSTRY_KEYWORDS = {
+    'biotechnology': [
+        'biotech', 'biological', 'drug', 'therapeutic', 'clinical',
+        'pharmaceutical', 'molecule', 'protein', 'enzyme', 'antibody',
+        'genomic', 'cell', 'tissue', 'assay', 'screening'
+    ],
+    'artificial intelligence': [
+        'ai', 'machine learning', 'neural network', 'deep learning',
+        'algorithm', 'model', 'prediction', 'classification',
+        'training', 'inference', 'optimization'
+    ]
+}
+
+# Common variations and related terms for core technologies
+TECH_RELATED = {
+    'machine learning': ['ml', 'deep learning', 'neural network', 'ai model'],
+    'molecular dynamics': ['md simulation', 'molecular simulation', 'atomistic'],
+    'high-throughput screening': ['hts', 'screening', 'automated testing']
+}
+
+
+def _weighted_terms(terms: List[str]) -> Dict[str, float]:
+    """Collapse a term list into term -> weight, so repeated variants keep their weight"""
+    weights: Dict[str, float] = {}
+    for term in terms:
+        if term:
+            weights[term] = weights.get(term, 0.0) + 1.0
+    return weights
+
+
+class RelevanceMatcher:
+    """Word-boundary-aware keyword matcher compiled from one company context.
+
+    Scores keep the original normalisation (matched weight over total
+    weight, with the technology score over half the total) but terms only
+    match as whole words, optionally pluralised, so 'ai' no longer matches
+    inside 'maintain' or 'cell' inside 'excellent'.
+    """
+
+    def __init__(self, company_context: Dict):
+        industry = company_context['industry'].lower()
+        # Use industry name if no specific keywords
+        self.industry_weights = _weighted_terms(INDUSTRY_KEYWORDS.get(industry, [industry]))
+
+        tech_terms = []
+        for tech in company_context.get('core_technologies', []):
+            tech_lower = tech.lower()
+            tech_terms.extend([
+                tech_lower,
+                tech_lower.replace(' ', ''),
+                tech_lower.replace('-', ' ')
+            ])
+        for tech in company_context.get('core_technologies', []):
+            tech_terms.extend(TECH_RELATED.get(tech.lower(), []))
+        self.tech_weights = _weighted_terms(tech_terms)
+
+        self.industry_total = sum(self.industry_weights.values())
+        self.tech_total = sum(self.tech_weights.values())
+
+        terms = sorted(set(self.industry_weights) | set(self.tech_weights), key=len, reverse=True)
+        self.pattern = None
+        if terms:
+            alternation = '|'.join(re.escape(term) for term in terms)
+            # Zero-width lookahead so overlapping matches at every position are found
+            self.pattern = re.compile(rf'(?=\b({alternation})(?:s|es)?\b)')
+
+        # Shorter terms that occur as whole words inside longer ones, e.g.
+        # 'learning' inside 'machine learning', are implied by the longer match
+        self.implied: Dict[str, Set[str]] = {
+            term: {
+                other for other in terms
+                if other != term and re.search(rf'\b{re.escape(other)}\b', term)
+            }
+            for term in terms
+        }
+
+    def matched_terms(self, text: str) -> Set[str]:
+        if self.pattern is None:
+            return set()
+        matched = set(self.pattern.findall(text.lower()))
+        for term in list(matched):
+            matched |= self.implied[term]
+        return matched
+
+    def score_text(self, text: str) -> Dict:
+        matched = self.matched_terms(text)
+        industry_score = (
+            sum(w for t, w in self.industry_weights.items() if t in matched) / self.industry_total
+            if self.industry_total else 0
+        )
+        tech_score = (
+            sum(w for t, w in self.tech_weights.items() if t in matched) / (self.tech_total * 0.5)
+            if self.tech_total else 0
+        )
+        industry_score = min(1.0, industry_score)
+        tech_score = min(1.0, tech_score)
+
+        # Calculate combined score with weights
+        combined_score = (0.6 * industry_score) + (0.4 * tech_score)
+        return {
+            'industry_match': float(industry_score),
+            'technology_match': float(tech_score),
+            'combined_score': float(combined_score)
+        }
+
+
+class RelevanceEngine:
+    """Caches a compiled RelevanceMatcher per company context hash"""
+
+    def __init__(self, max_contexts: int = 32):
+        self.max_contexts = max_contexts
+        self.matchers: "OrderedDict[str, RelevanceMatcher]" = OrderedDict()
+
+    @staticmethod
+    def context_hash(company_context: Dict) -> str:
+        payload = json.dumps(company_context, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_matcher(self, company_context: Dict) -> RelevanceMatcher:
+        key = self.context_hash(company_context)
+        matcher = self.matchers.get(key)
+        if matcher is None:
+            matcher = RelevanceMatcher(company_context)
+            self.matchers[key] = matcher
+            if len(self.matchers) > self.max_contexts:
+                self.matchers.popitem(last=False)
+        else:
+            self.matchers.move_to_end(key)
+        return matcher
+
+    @staticmethod
+    def post_text(post: Dict) -> str:
+        return f"{post['content']['title']} {post['content']['selftext']}"
+
+    def score_batch(self, posts: List[Dict], company_context: Dict) -> List[Dict]:
+        """Score posts in one pass with the context's compiled matcher"""
+        try:
+            matcher = self.get_matcher(company_context)
+        except Exception as e:
+            logging.error(f"Error compiling relevance matcher: {e}")
+            matcher = None
+        results = []
+        for post in posts:
+            try:
+                results.append(matcher.score_text(self.post_text(post)))
+            except Exception as e:
+                logging.error(f"Error calculating combined relevance: {e}")
+                results.append({
+                    'industry_match': 0.0,
+                    'technology_match': 0.0,
+                    'combined_score': 0.0
+                })
+        return results
@@ -0,0 +1,250 @@
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dedup_store import DedupStore
+from llm_cache import LLMResponseCache
+from metrics import PREFILTER_CONTEXTS, PREFILTER_THRESHOLD
+from paper_filter import PaperFilter
+
+
+class ScoringCascade:
+    """TF-IDF prefilter that decides which contexts a paper is sent to the LLM for.
+
+    Each paper is compared with every context in one sparse product. A
+    context is scored by the LLM only if its similarity reaches that
+    context's threshold. The thresholds are calibrated from past LLM scores
+    so that ``target_recall`` of the papers the LLM rated at least
+    ``relevant_score`` would still have been sent.
+
+    A random ``explore_rate`` of below-threshold pairs are scored anyway.
+    Their samples are weighted by the inverse of that rate, so the recall
+    estimate stays unbiased once gating starts.
+
+    The TF-IDF vocabulary is fitted once on the first ``min_reference_papers``
+    papers; until then every context is scored. Reference papers and
+    samples are kept in SQLite, so restarts and other scoring workers share
+    one calibration.
+    """
+
+    def __init__(
+        self,
+        company_context: Dict,
+        contexts: Dict[str, Dict],
+        path: Optional[str] = "arxiv_prefilter.db",
+        target_recall: float = 0.95,
+        relevant_score: int = 50,
+        explore_rate: float = 0.05,
+        min_reference_papers: int = 500,
+        min_relevant_samples: int = 30,
+        max_samples: int = 2000,
+        recalibrate_every: int = 50,
+        sample_ttl_seconds: float = 90 * 24 * 3600,
+    ):
+        self.company_context = company_context
+        self.contexts = contexts
+        self.target_recall = target_recall
+        self.relevant_score = relevant_score
+        self.explore_rate = explore_rate
+        self.min_reference_papers = min_reference_papers
+        self.min_relevant_samples = min_relevant_samples
+        self.max_samples = max_samples
+        self.recalibrate_every = recalibrate_every
+        self.sample_ttl_seconds = sample_ttl_seconds
+        # Samples only count for the context text they were scored against
+        self.context_hashes = {
+            key: LLMResponseCache.hash_context(context) for key, context in contexts.items()
+        }
+        # No threshold until calibrated: every context is scored
+        self.thresholds: Dict[str, float] = dict.fromkeys(contexts, 0.0)
+        self.paper_filter: Optional[PaperFilter] = None
+        self.lock = threading.Lock()
+        self.stats = {"called": 0, "skipped": 0}
+        self._records_since_calibration = 0
+        self._random = random.Random()
+        self.logger = logging.getLogger(__name__)
+
+        self.conn = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        if path:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS prefilter_reference ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS prefilter_samples ("
+            "context TEXT NOT NULL, context_hash TEXT NOT NULL, similarity REAL NOT NULL, "
+            "score INTEGER NOT NULL, weight REAL NOT NULL, recorded_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS prefilter_samples_context "
+            "ON prefilter_samples (context, context_hash)"
+        )
+        self.conn.commit()
+        self._maybe_fit()
+        if self.paper_filter is not None:
+            self.calibrate()
+
+    def _maybe_fit(self):
+        """Fit the vectorizer once enough reference papers are stored.
+
+        Every worker fits on the same first rows, so similarities (and the
+        samples recorded from them) are comparable across workers and restarts.
+        """
+        count = self.conn.execute("SELECT COUNT(*) FROM prefilter_reference").fetchone()[0]
+        if count < self.min_reference_papers:
+            return
+        rows = self.conn.execute(
+            "SELECT text FROM prefilter_reference ORDER BY rowid LIMIT ?",
+            (self.min_reference_papers,),
+        ).fetchall()
+        paper_filter = PaperFilter(
+            self.company_context,
+            max_reference_papers=self.min_reference_papers,
+            contexts=self.contexts,
+        )
+        paper_filter.reference_texts.extend(text for text, in rows)
+        paper_filter.fit()
+        if paper_filter.context_matrix is not None:
+            self.paper_filter = paper_filter
+            self.logger.info(f"Prefilter fitted on {len(rows)} reference papers")
+
+    def select(self, paper: Dict) -> Tuple[Dict[str, Dict], Dict[str, Tuple[float, float]]]:
+        """Contexts to score ``paper`` against with the LLM.
+
+        Returns the selected contexts and, for each, the ``(similarity,
+        sample weight)`` to pass back to ``record``.
+        """
+        if self.paper_filter is None:
+            with self.lock:
+                self._add_reference(paper)
+                if self.paper_filter is None:
+                    for key in self.contexts:
+                        PREFILTER_CONTEXTS.labels(key, "warmup").inc()
+                    return dict(self.contexts), {}
+
+        similarities = self.paper_filter.score_contexts([paper])[0]
+        selected = {}
+        samples = {}
+        skipped = 0
+        for key, context in self.contexts.items():
+            similarity = similarities[key]
+            if similarity >= self.thresholds[key]:
+                decision, weight = "called", 1.0
+            elif self._random.random() < self.explore_rate:
+                decision, weight = "explored", 1.0 / self.explore_rate
+            else:
+                PREFILTER_CONTEXTS.labels(key, "skipped").inc()
+                skipped += 1
+                continue
+            PREFILTER_CONTEXTS.labels(key, decision).inc()
+            selected[key] = context
+            samples[key] = (similarity, weight)
+        with self.lock:
+            self.stats["called"] += len(selected)
+            self.stats["skipped"] += skipped
+        return selected, samples
+
+    def _add_reference(self, paper: Dict):
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO prefilter_reference (key, text) VALUES (?, ?)",
+                (DedupStore.paper_key(paper["id"]), PaperFilter.paper_text(paper)),
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Prefilter reference write error: {e}")
+            return
+        self._maybe_fit()
+        if self.paper_filter is not None:
+            self._calibrate_locked()
+
+    def record(self, samples: Dict[str, Tuple[float, float]], ideas: List[Tuple[str, Dict]]):
+        """Store the LLM scores of the contexts ``select`` chose"""
+        if not samples:
+            return
+        now = time.time()
+        rows = [
+            (
+                key,
+                self.context_hashes[key],
+                samples[key][0],
+                idea["relevance_score"],
+                samples[key][1],
+                now,
+            )
+            for key, idea in ideas
+            if key in samples
+        ]
+        with self.lock:
+            try:
+                self.conn.executemany(
+                    "INSERT INTO prefilter_samples (context, context_hash, similarity, "
+                    "score, weight, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.logger.error(f"Prefilter sample write error: {e}")
+                return
+            self._records_since_calibration += 1
+            if self._records_since_calibration >= self.recalibrate_every:
+                self._calibrate_locked()
+
+    def calibrate(self):
+        """Recompute every context's threshold from the stored samples"""
+        with self.lock:
+            self._calibrate_locked()
+
+    def _calibrate_locked(self):
+        self._records_since_calibration = 0
+        try:
+            self.conn.execute(
+                "DELETE FROM prefilter_samples WHERE recorded_at < ?",
+                (time.time() - self.sample_ttl_seconds,),
+            )
+            self.conn.commit()
+            for key in self.contexts:
+                rows = self.conn.execute(
+                    "SELECT similarity, weight FROM prefilter_samples "
+                    "WHERE context = ? AND context_hash = ? AND score >= ? "
+                    "ORDER BY rowid DESC LIMIT ?",
+                    (key, self.context_hashes[key], self.relevant_score, self.max_samples),
+                ).fetchall()
+                self.thresholds[key] = self._recall_threshold(rows)
+                PREFILTER_THRESHOLD.labels(key).set(self.thresholds[key])
+        except sqlite3.Error as e:
+            self.logger.error(f"Prefilter calibration error: {e}")
+            return
+
+        total = self.stats["called"] + self.stats["skipped"]
+        skipped_share = self.stats["skipped"] / total if total else 0.0
+        self.logger.info(
+            f"Prefilter thresholds {({k: round(v, 4) for k, v in self.thresholds.items()})}; "
+            f"skipped {self.stats['skipped']} of {total} context scorings "
+            f"({skipped_share:.0%}) since start"
+        )
+
+    def _recall_threshold(self, rows: List[Tuple[float, float]]) -> float:
+        """Highest similarity threshold keeping ``target_recall`` of the
+        (weighted) relevant samples; 0 (score everything) without enough samples"""
+        if len(rows) < self.min_relevant_samples:
+            return 0.0
+        rows = sorted(rows, reverse=True)
+        total = sum(weight for _, weight in rows)
+        kept = 0.0
+        for similarity, weight in rows:
+            kept += weight
+            if kept >= self.target_recall * total:
+                return similarity
+        return 0.0
+
+    def close(self):
+        if self.conn is None:
+            return
+        with self.lock:
+            self.conn.close()
+            self.conn = None
@@ -1,42 +1,122 @@
 import json
-from anthropic import Anthropic
-from textblob import TextBlob
-import xml.etree.ElementTree as ET
+import multiprocessing
+import os
 from typing import Dict, List, Optional
 import logging
 from dotenv import load_dotenv
-import nltk
 import re
-from collections import Counter
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 load_dotenv()
 
-# Download required NLTK data
-def ensure_nltk_resources():
-    """Ensure all required NLTK resources are downloaded"""
-    required_resources = [
-        'punkt',
-        'stopwords',
-        'wordnet',
-        'averaged_perceptron_tagger',
-        'punkt_tab'
-    ]
+# Heavy NLP dependencies (NLTK, TextBlob) are bound by _load_nlp() on first
+# use so that importing this module stays cheap
+nltk = None
+TextBlob = None
+word_tokenize = None
+sent_tokenize = None
+stopwords = None
+WordNetLemmatizer = None
+
+def _load_nlp():
+    """Import NLTK and TextBlob once, on first use"""
+    global nltk, TextBlob, word_tokenize, sent_tokenize, stopwords, WordNetLemmatizer
+    if nltk is not None:
+        return
+    import nltk as _nltk
+    from textblob import TextBlob as _TextBlob
+    from nltk.tokenize import word_tokenize as _word_tokenize, sent_tokenize as _sent_tokenize
+    from nltk.corpus import stopwords as _stopwords
+    from nltk.stem import WordNetLemmatizer as _WordNetLemmatizer
+    TextBlob = _TextBlob
+    word_tokenize, sent_tokenize = _word_tokenize, _sent_tokenize
+    stopwords, WordNetLemmatizer = _stopwords, _WordNetLemmatizer
+    nltk = _nltk
+
+# Required NLTK resources and the data category each one lives under
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+}
+NLTK_MANIFEST = 'resync_manifest.json'
+
+def ensure_nltk_resources(data_dir: Optional[str] = None, offline: Optional[bool] = None):
+    """Ensure all required NLTK resources are available locally
+    
+    Resources are looked up under their real category paths in ``data_dir``
+    (default ``$NLTK_DATA``) and the standard NLTK locations. Verified paths
+    are recorded in a manifest in ``data_dir`` so later starts only stat
+    files. Missing resources are downloaded into ``data_dir`` unless
+    ``offline`` (default ``$NLTK_OFFLINE``) is set, in which case the network
+    is never touched and an error is raised instead.
+    """
+    _load_nlp()
+    data_dir = data_dir or os.getenv('NLTK_DATA')
+    if offline is None:
+        offline = os.getenv('NLTK_OFFLINE', '').lower() in ('1', 'true', 'yes')
+    if data_dir and data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    
+    manifest_path = os.path.join(data_dir, NLTK_MANIFEST) if data_dir else None
+    manifest = {}
+    if manifest_path and os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable NLTK manifest {manifest_path}: {e}")
     
-    for resource in required_resources:
+    found = {}
+    for resource, category_path in NLTK_RESOURCES.items():
+        cached = manifest.get(resource)
+        if cached and os.path.exists(cached):
+            found[resource] = cached
+            continue
         try:
-            nltk.data.find(f'tokenizers/{resource}')
+            found[resource] = str(nltk.data.find(category_path))
+            continue
         except LookupError:
-            try:
-                nltk.download(resource, quiet=True)
-                logging.info(f"Successfully downloaded NLTK resource: {resource}")
-            except Exception as e:
-                logging.error(f"Error downloading NLTK resource {resource}: {e}")
-                raise RuntimeError(f"Failed to download required NLTK resource: {resource}")
+            pass
+        if offline:
+            raise RuntimeError(
+                f"NLTK resource {resource} ({category_path}) not found and offline mode is on"
+            )
+        try:
+            if not nltk.download(resource, download_dir=data_dir, quiet=True):
+                raise RuntimeError("download reported failure")
+            found[resource] = str(nltk.data.find(category_path))
+            logging.info(f"Successfully downloaded NLTK resource: {resource}")
+        except Exception as e:
+            logging.error(f"Error downloading NLTK resource {resource}: {e}")
+            raise RuntimeError(f"Failed to download required NLTK resource: {resource}")
+    
+    if manifest_path and found != manifest:
+        try:
+            with open(manifest_path, 'w') as f:
+                json.dump(found, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not write NLTK manifest {manifest_path}: {e}")
+
+# Per-process analyzer used by the worker pool in SentimentAnalyzer.analyze_batch
+_worker_analyzer = None
+
+def _init_worker():
+    """Load NLTK resources and build the analyzer once per worker process"""
+    global _worker_analyzer
+    _worker_analyzer = SentimentAnalyzer()
+
+def _analyze_in_worker(content: Dict) -> Dict:
+    return _worker_analyzer.analyze_sentiment(content)
 
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, workers: int = 1):
+        """``workers`` > 1 runs ``analyze_batch`` on a pool of that many processes"""
+        self.workers = workers
+        self._pool = None
+        
         # Ensure NLTK resources are available before initializing
         try:
             ensure_nltk_resources()
@@ -65,6 +145,28 @@ class SentimentAnalyzer:
             'negative': ['bad', 'terrible', 'poor', 'horrible', 'awful', 'useless', 'waste', 'disappointing'],
             'neutral': ['okay', 'average', 'moderate', 'fair', 'decent']
         }
+        
+        # Precompiled matchers, built once. Keywords are anchored at a leading
+        # word boundary so 'bug' no longer matches inside 'debug' while
+        # inflections like 'errors' or 'features' still match.
+        self.aspect_pattern = re.compile(
+            '|'.join(
+                f"(?P<{aspect}>{self._keyword_regex(keywords)})"
+                for aspect, keywords in self.aspect_keywords.items()
+            )
+        )
+        self.request_intent_pattern = re.compile(
+            self._keyword_regex(['should', 'could', 'wish', 'hope', 'need', 'want'])
+        )
+        self.request_feature_pattern = re.compile(
+            self._keyword_regex(['feature', 'add', 'implement', 'include', 'support'])
+        )
+
+    @staticmethod
+    def _keyword_regex(keywords: List[str]) -> str:
+        """Alternation of keywords (longest first) with a leading word boundary"""
+        alternatives = sorted((re.escape(k) for k in keywords), key=len, reverse=True)
+        return r'\b(?:' + '|'.join(alternatives) + ')'
 
     def preprocess_text(self, text: str) -> str:
         """Preprocess text for analysis"""
@@ -81,18 +183,21 @@ class SentimentAnalyzer:
             # Return cleaned text even if tokenization fails
             return text
 
-    def extract_key_phrases(self, text: str) -> Dict[str, List[str]]:
-        """Extract key phrases related to different aspects"""
+    def extract_key_phrases(self, text: str, sentences: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Extract key phrases related to different aspects
+        
+        ``sentences`` lets callers pass an already tokenized sentence list.
+        """
         try:
-            preprocessed_text = self.preprocess_text(text)
-            sentences = sent_tokenize(text)
+            if sentences is None:
+                sentences = sent_tokenize(text)
             
             aspects = {aspect: [] for aspect in self.aspect_keywords.keys()}
             
             for sentence in sentences:
-                sentence_lower = sentence.lower()
-                for aspect, keywords in self.aspect_keywords.items():
-                    if any(keyword in sentence_lower for keyword in keywords):
+                matched = {m.lastgroup for m in self.aspect_pattern.finditer(sentence.lower())}
+                for aspect in self.aspect_keywords:
+                    if aspect in matched:
                         aspects[aspect].append(sentence.strip())
             
             return aspects
@@ -100,6 +205,17 @@ class SentimentAnalyzer:
             logging.error(f"Error in key phrase extraction: {e}")
             return {aspect: [] for aspect in self.aspect_keywords.keys()}
 
+    @staticmethod
+    def engagement_metrics(content: Dict) -> Dict:
+        """Engagement metrics of a post (per post, unlike its text-derived sentiment)"""
+        engagement_score = (content['score'] + content['num_comments']) / (content['upvote_ratio'] if content['upvote_ratio'] > 0 else 1)
+        return {
+            'score': content['score'],
+            'comments': content['num_comments'],
+            'upvote_ratio': content['upvote_ratio'],
+            'engagement_score': float(engagement_score)
+        }
+
     def analyze_sentiment(self, content: Dict) -> Dict:
         """Perform comprehensive sentiment analysis with error handling"""
         try:
@@ -115,44 +231,46 @@ class SentimentAnalyzer:
                 'subjectivity': float(blob.sentiment.subjectivity)
             }
             
+            # Tokenize sentences once and share them across all stages
+            try:
+                sentences = sent_tokenize(full_text)
+            except Exception as e:
+                logging.error(f"Error in sentence tokenization: {e}")
+                sentences = []
+            
             # Extract aspects and their sentiments
-            aspects = self.extract_key_phrases(full_text)
+            aspects = self.extract_key_phrases(full_text, sentences)
             aspect_sentiments = {}
+            sentence_polarity = {}
             
-            for aspect, sentences in aspects.items():
-                if sentences:
-                    aspect_sentiment = sum(TextBlob(sent).sentiment.polarity for sent in sentences) / len(sentences)
+            for aspect, aspect_sentences in aspects.items():
+                if aspect_sentences:
+                    for sent in aspect_sentences:
+                        if sent not in sentence_polarity:
+                            sentence_polarity[sent] = TextBlob(sent).sentiment.polarity
+                    aspect_sentiment = sum(sentence_polarity[sent] for sent in aspect_sentences) / len(aspect_sentences)
                     aspect_sentiments[aspect] = {
                         'sentiment_score': float(aspect_sentiment),
-                        'example_quotes': sentences[:2]  # Include up to 2 example quotes
+                        'example_quotes': aspect_sentences[:2]  # Include up to 2 example quotes
                     }
             
             # Extract feature requests using simple pattern matching
             feature_requests = []
             try:
-                sentences = sent_tokenize(full_text)
-                feature_requests = [
-                    sent.strip() for sent in sentences
-                    if any(word in sent.lower() for word in ['should', 'could', 'wish', 'hope', 'need', 'want'])
-                    and any(word in sent.lower() for word in ['feature', 'add', 'implement', 'include', 'support'])
-                ]
+                for sent in sentences:
+                    sent_lower = sent.lower()
+                    if (self.request_intent_pattern.search(sent_lower)
+                            and self.request_feature_pattern.search(sent_lower)):
+                        feature_requests.append(sent.strip())
             except Exception as e:
                 logging.error(f"Error extracting feature requests: {e}")
             
-            # Calculate engagement metrics
-            engagement_score = (content['score'] + content['num_comments']) / (content['upvote_ratio'] if content['upvote_ratio'] > 0 else 1)
-            
             # Prepare final analysis
             analysis = {
                 'basic_sentiment': basic_sentiment,
                 'aspect_sentiments': aspect_sentiments,
                 'feature_requests': feature_requests[:3],  # Top 3 feature requests
-                'engagement_metrics': {
-                    'score': content['score'],
-                    'comments': content['num_comments'],
-                    'upvote_ratio': content['upvote_ratio'],
-                    'engagement_score': float(engagement_score)
-                },
+                'engagement_metrics': self.engagement_metrics(content),
                 'summary_stats': {
                     'total_aspects_mentioned': len([asp for asp, sent in aspects.items() if sent]),
                     'dominant_aspect': max(aspects.items(), key=lambda x: len(x[1]))[0] if any(aspects.values()) else None,
@@ -181,4 +299,38 @@ class SentimentAnalyzer:
                     'dominant_aspect': None,
                     'overall_sentiment': 'neutral'
                 }
-            }
\ No newline at end of file
+            }
+
+    def analyze_batch(self, contents: List[Dict]) -> List[Dict]:
+        """Analyze a batch of posts, returning results in input order
+        
+        With ``workers`` > 1 the batch is split into chunks and spread over a
+        pool of warm worker processes, each holding its own analyzer.
+        """
+        if self.workers <= 1 or len(contents) < 2:
+            return [self.analyze_sentiment(content) for content in contents]
+        
+        if self._pool is None:
+            # spawn, not fork: the parent runs librdkafka, metrics and
+            # heartbeat threads and holds SQLite handles
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        # A few chunks per worker balances load without per-item IPC overhead
+        chunksize = max(1, len(contents) // (self.workers * 4))
+        try:
+            return list(self._pool.map(_analyze_in_worker, contents, chunksize=chunksize))
+        except BrokenProcessPool as e:
+            logging.error(f"Sentiment worker pool failed, analyzing in-process: {e}")
+            # Reap the broken pool's processes; the next batch starts a fresh pool
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            return [self.analyze_sentiment(content) for content in contents]
+
+    def close(self):
+        """Shut down the worker pool, if one was started"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
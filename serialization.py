@@ -0,0 +1,137 @@
+"""Wire formats for pipeline topics.
+
+Every message carries its format in Kafka headers, so consumers decode
+whatever a producer wrote and topics can switch format without draining.
+Messages without headers are plain JSON, which is also the default, since
+the dashboard reads ``research_ideas``/``sentiment_analysis`` as JSON text.
+"""
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+CONTENT_TYPE_HEADER = "content-type"
+CONTENT_ENCODING_HEADER = "content-encoding"
+SCHEMA_VERSION_HEADER = "schema-version"
+# Bump when the shape of pipeline records changes incompatibly
+SCHEMA_VERSION = 1
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+}
+FORMATS = {content_type: name for name, content_type in CONTENT_TYPES.items()}
+COMPRESSIONS = (None, "zstd")
+
+try:
+    import orjson
+except ImportError:  # stdlib json produces the same wire format, just slower
+    orjson = None
+
+_modules: Dict[str, Any] = {}
+
+
+def _optional_module(name: str):
+    """Import an optional codec dependency once, with a useful error if missing"""
+    if name not in _modules:
+        try:
+            _modules[name] = __import__(name)
+        except ImportError as e:
+            raise ImportError(f"The '{name}' package is required for this wire format") from e
+    return _modules[name]
+
+
+def _json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class MessageCodec:
+    """Encodes records in one wire format, with optional zstd compression"""
+
+    def __init__(self, format: str = "json", compression: Optional[str] = None,
+                 compression_level: int = 3):
+        if format not in CONTENT_TYPES:
+            raise ValueError(f"Unknown wire format: {format}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.format = format
+        self.compression = compression
+        self.compression_level = compression_level
+        # zstd contexts are reusable but not thread-safe
+        self._local = threading.local()
+        # Fail at startup rather than on the first message
+        if format == "msgpack":
+            _optional_module("msgpack")
+        if compression == "zstd":
+            _optional_module("zstandard")
+        self.headers = [
+            (CONTENT_TYPE_HEADER, CONTENT_TYPES[format].encode()),
+            (SCHEMA_VERSION_HEADER, str(SCHEMA_VERSION).encode()),
+        ]
+        if compression:
+            self.headers.append((CONTENT_ENCODING_HEADER, compression.encode()))
+
+    def encode(self, obj) -> Tuple[bytes, List[Tuple[str, bytes]]]:
+        """Serialize ``obj``; returns the message value and its headers"""
+        if self.format == "msgpack":
+            data = _modules["msgpack"].packb(obj, use_bin_type=True)
+        else:
+            data = _json_dumps(obj)
+        if self.compression == "zstd":
+            compressor = getattr(self._local, "compressor", None)
+            if compressor is None:
+                compressor = _modules["zstandard"].ZstdCompressor(level=self.compression_level)
+                self._local.compressor = compressor
+            data = compressor.compress(data)
+        return data, list(self.headers)
+
+    @staticmethod
+    def decode(value: bytes, headers: Optional[List] = None):
+        """Deserialize a message value written by any ``MessageCodec``"""
+        meta = {key: val.decode() if isinstance(val, bytes) else val for key, val in headers or []}
+        version = int(meta.get(SCHEMA_VERSION_HEADER, SCHEMA_VERSION))
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Unsupported schema version {version}")
+        if meta.get(CONTENT_ENCODING_HEADER) == "zstd":
+            value = _optional_module("zstandard").ZstdDecompressor().decompress(value)
+        if FORMATS.get(meta.get(CONTENT_TYPE_HEADER)) == "msgpack":
+            return _optional_module("msgpack").unpackb(value, raw=False)
+        return _json_loads(value)
+
+
+class TopicCodecs:
+    """Per-topic codecs built from ``{"default": {...}, "topics": {name: {...}}}``.
+
+    Each entry holds ``MessageCodec`` arguments; topics without an entry use
+    the default, which is plain JSON unless configured otherwise.
+    """
+
+    def __init__(self, options: Optional[Dict] = None):
+        options = options or {}
+        self.default = MessageCodec(**options.get("default", {}))
+        self.codecs = {
+            topic: MessageCodec(**codec_options)
+            for topic, codec_options in options.get("topics", {}).items()
+        }
+
+    def for_topic(self, topic: str) -> MessageCodec:
+        return self.codecs.get(topic, self.default)
+
+    def compresses(self, topic: str) -> bool:
+        """Whether values for ``topic`` are already compressed by the codec"""
+        return self.for_topic(topic).compression is not None
+
+    def encode(self, topic: str, obj) -> Tuple[bytes, List[Tuple[str, bytes]]]:
+        return self.for_topic(topic).encode(obj)
+
+    @staticmethod
+    def decode(msg):
+        """Decode a consumed Kafka message"""
+        return MessageCodec.decode(msg.value(), msg.headers())
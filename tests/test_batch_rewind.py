@@ -0,0 +1,120 @@
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("confluent_kafka")
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+
+import heartbeat
+from arxiv_feed import ArxivFeedClient
+from arxiv_stream_processor import ArxivStreamProcessor
+from reddit_stream_processor import RedditStreamProcessor
+from fakes import (
+    BenchmarkDone,
+    FakeAdminClient,
+    FakeAnthropic,
+    FakeArxivSession,
+    FakeBroker,
+    FakeConsumer,
+    FakeProducer,
+)
+from pipeline_bench import COMPANY_CONTEXT, PROJECTS
+
+
+class FlakyFlush:
+    """Makes the ``fail_on``-th flush of a BatchingProducer report failure"""
+
+    def __init__(self, producer, fail_on: int):
+        self.flush = producer.flush
+        self.fail_on = fail_on
+        self.calls = 0
+        producer.flush = self
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            return False
+        return self.flush(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    monkeypatch.setattr(heartbeat, "sleep", lambda seconds: None)
+
+
+def test_arxiv_batch_is_consumed_again_after_a_failed_flush(tmp_path):
+    broker = FakeBroker(num_partitions=2)
+    processor = ArxivStreamProcessor(
+        "localhost:9092", "test", "test", "test",
+        llm_cache_path=None,
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+        dedup_path=None,
+        near_duplicate_path=None,
+        clients={
+            "producer": FakeProducer(broker),
+            "consumer": FakeConsumer(broker),
+            "admin": FakeAdminClient(broker),
+            "llm": FakeAnthropic(latency_ms=0, jitter_ms=0),
+        },
+    )
+    feed = ArxivFeedClient(session=FakeArxivSession(20))
+    papers = list(feed.iter_papers("http://export.arxiv.org/api/query?start=0&max_results=20"))
+    for paper in papers:
+        value, headers = processor.codecs.encode("papers", paper)
+        broker.append("papers", processor.paper_partition_key(paper), value, headers)
+    scored = Counter()
+    score_paper = processor._score_paper
+
+    def counting_score_paper(paper, *args):
+        scored[paper["id"]] += 1
+        return score_paper(paper, *args)
+
+    processor._score_paper = counting_score_paper
+    flaky = FlakyFlush(processor.producer, fail_on=2)
+
+    with pytest.raises(BenchmarkDone):
+        processor.process_ideas("papers", "test", COMPANY_CONTEXT, PROJECTS, batch_size=4)
+
+    assert flaky.calls > 2
+    # Only the batch whose outputs were not delivered is scored twice
+    assert set(scored) == {paper["id"] for paper in papers}
+    assert sorted(scored.values()) == [1] * 16 + [2] * 4
+    assert processor.consumer.committed == processor.consumer.end_offsets
+
+
+def test_reddit_batch_is_consumed_again_after_a_failed_flush(tmp_path):
+    broker = FakeBroker(num_partitions=2)
+    processor = RedditStreamProcessor(
+        "localhost:9092", "test", "test",
+        near_duplicate_path=None,
+        clients={
+            "producer": FakeProducer(broker),
+            "consumer": FakeConsumer(broker),
+            "admin": FakeAdminClient(broker),
+        },
+    )
+    analysed = Counter()
+
+    def analyze_posts(analyzer, posts):
+        analysed.update(post["metadata"]["id"] for post in posts)
+        return [{"polarity": 0.0} for _ in posts]
+
+    processor._analyze_posts = analyze_posts
+    processor.calculate_combined_relevance_batch = lambda posts, context: [{} for _ in posts]
+    post_ids = [f"post{i}" for i in range(12)]
+    for post_id in post_ids:
+        value, headers = processor.codecs.encode(
+            "posts", {"metadata": {"id": post_id}, "content": {"title": post_id}}
+        )
+        broker.append("posts", post_id, value, headers)
+    flaky = FlakyFlush(processor.producer, fail_on=1)
+    processor.consumer.subscribe(["posts"])
+
+    with pytest.raises(BenchmarkDone):
+        processor._process_sentiment_batches(None, "analysis", COMPANY_CONTEXT, 4, 0.1)
+
+    assert flaky.calls > 1
+    assert set(analysed) == set(post_ids)
+    assert sorted(analysed.values()) == [1] * 8 + [2] * 4
+    assert processor.consumer.committed == processor.consumer.end_offsets
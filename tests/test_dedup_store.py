@@ -0,0 +1,119 @@
+import json
+import os
+import time
+
+from dedup_store import DedupStore, DedupView
+
+DAY = 24 * 3600
+
+
+def make_store(path=None, **options):
+    options = {
+        "window_seconds": 8 * DAY,
+        "exact_window_seconds": 1 * DAY,
+        "generations": 4,
+        "items_per_generation": 1000,
+        **options,
+    }
+    return DedupStore(path, **options)
+
+
+def test_keys_are_normalised_arxiv_ids():
+    store = make_store()
+    store.add("http://arxiv.org/abs/2410.01234v2")
+    assert "2410.01234v2" in store
+    assert "http://arxiv.org/abs/2410.01234v2" in store
+    assert "2410.01234v1" not in store
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    now = time.time()
+    store = make_store(path)
+    store.add("recent", seen_at=now)
+    store.add("older", seen_at=now - 2 * DAY)
+    store.save()
+    assert not store.dirty
+
+    loaded = make_store(path)
+    assert "recent" in loaded
+    # Past the exact window, still remembered by its Bloom generation
+    assert "older" in loaded
+    assert "missing" not in loaded
+    assert [created for created, _ in loaded.blooms] == [created for created, _ in store.blooms]
+
+
+def test_save_is_atomic_json(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    store = make_store(path)
+    store.add("a")
+    store.save()
+    with open(path) as f:
+        state = json.load(f)
+    assert [key for key, _ in state["exact"]] == ["a"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_exact_index_expires_but_bloom_remembers():
+    store = make_store()
+    start = time.time()
+    store.add("a", seen_at=start)
+    store.add("b", seen_at=start + 2 * DAY)
+    assert len(store) == 1
+    assert "a" in store
+
+
+def test_generations_rotate_and_expire_after_window():
+    store = make_store()
+    start = time.time()
+    store.blooms = [(start, store._new_bloom())]
+    store.add("first", seen_at=start)
+    # One generation is window / generations = 2 days
+    for day in range(1, 8):
+        store.add(f"day-{day}", seen_at=start + day * DAY)
+    assert len(store.blooms) <= store.generations
+    assert "first" in store
+
+    store.add("later", seen_at=start + 10 * DAY)
+    assert "first" not in store
+    assert "later" in store
+    assert all(created >= start + 10 * DAY - store.window_seconds for created, _ in store.blooms)
+
+
+def test_full_generation_rotates_early():
+    store = make_store(items_per_generation=10)
+    now = time.time()
+    for i in range(25):
+        store.add(f"item-{i}", seen_at=now)
+    assert len(store.blooms) == 3
+    assert all(f"item-{i}" in store for i in range(25))
+
+
+def test_snapshot_restores_into_another_store():
+    snapshots = []
+    store = make_store(sink=snapshots.append)
+    store.add("a")
+    store.save()
+    assert not store.dirty
+
+    restored = make_store()
+    restored.restore(snapshots[-1])
+    assert "a" in restored
+    assert "b" not in restored
+
+
+def test_view_reads_and_reloads_without_writing(tmp_path):
+    owned = make_store(str(tmp_path / "owned.json"))
+    owned.add("a")
+    owned.save()
+
+    other_path = str(tmp_path / "other.json")
+    view = DedupView([str(tmp_path / "owned.json"), other_path], reload_seconds=0)
+    assert "a" in view
+    assert "b" not in view
+
+    other = make_store(other_path)
+    other.add("b")
+    other.save()
+    assert "b" in view
+    assert not hasattr(view, "save")
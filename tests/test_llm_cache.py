@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from llm_cache import LLMResponseCache
+
+
+class ScriptedLLM:
+    """Anthropic-style client answering with queued responses"""
+
+    class _Text:
+        def __init__(self, text):
+            self.text = text
+
+    class _Message:
+        def __init__(self, text):
+            self.content = [ScriptedLLM._Text(text)]
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+        self.messages = self
+
+    def create(self, **request):
+        self.calls.append(request)
+        return self._Message(self.responses.pop(0))
+
+
+def make_client(llm, cache):
+    pytest.importorskip("dotenv")
+    from llm_client import LLMClient
+
+    return LLMClient("test", model="large", cache=cache, client=llm)
+
+
+def test_round_trip_through_memory_and_disk(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMResponseCache(path)
+    cache.set("key", "73")
+    assert cache.get("key") == "73"
+    assert cache.get("missing") is None
+    cache.close()
+
+    reopened = LLMResponseCache(path)
+    assert reopened.get("key") == "73"
+    assert reopened.get_stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_entries_expire_and_memory_is_bounded():
+    cache = LLMResponseCache(path=None, max_memory_entries=2, ttl_seconds=60)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert cache.get("a") is None
+    assert cache.get("c") == "c"
+
+    cache.memory["c"] = ("c", time.time() - 61)
+    assert cache.get("c") is None
+
+
+def test_settings_extend_the_key():
+    key = LLMResponseCache.make_key("2410.00001v1", "ctx", "large", "categorize_rank:v1")
+    settings = {"model": "large", "max_tokens": 8, "temperature": 0.0}
+    assert LLMResponseCache.with_settings(key, **settings) == LLMResponseCache.with_settings(
+        key, temperature=0.0, max_tokens=8, model="large"
+    )
+    assert LLMResponseCache.with_settings(key, **settings) != LLMResponseCache.with_settings(
+        key, **{**settings, "max_tokens": 16}
+    )
+    assert LLMResponseCache.with_settings(key, **settings) != key
+
+
+def test_invalid_responses_are_not_cached():
+    llm = ScriptedLLM("not a score", "42")
+    client = make_client(llm, LLMResponseCache(path=None))
+    valid = str.isdigit
+
+    assert client.generate("prompt", cache_key="paper", validate=valid) == "not a score"
+    # The malformed answer was not replayed from the cache
+    assert client.generate("prompt", cache_key="paper", validate=valid) == "42"
+    assert client.generate("prompt", cache_key="paper", validate=valid) == "42"
+    assert len(llm.calls) == 2
+
+
+def test_responses_are_cached_per_generation_settings():
+    llm = ScriptedLLM("small answer", "large answer", "short answer")
+    client = make_client(llm, LLMResponseCache(path=None))
+
+    assert client.generate("prompt", cache_key="paper", model="small") == "small answer"
+    assert client.generate("prompt", cache_key="paper") == "large answer"
+    assert client.generate("prompt", cache_key="paper", max_tokens=8) == "short answer"
+    assert client.generate("prompt", cache_key="paper", model="small") == "small answer"
+    assert client.generate("prompt", cache_key="paper", model="large") == "large answer"
+    assert [call["model"] for call in llm.calls] == ["small", "large", "large"]
@@ -0,0 +1,98 @@
+import pytest
+
+pytest.importorskip("confluent_kafka")
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+
+from arxiv_stream_processor import ArxivStreamProcessor
+from fakes import FakeAdminClient, FakeAnthropic, FakeBroker, FakeConsumer, FakeProducer
+
+CONTEXTS = {
+    "company": {"industry": "Artificial Intelligence"},
+    "vision": {"name": "Computer Vision"},
+    "language": {"name": "Language Models"},
+}
+
+
+class ScriptedScorer:
+    """``score(contexts, tier)`` answering from fixed per-tier scores"""
+
+    def __init__(self, small, large):
+        self.scores = {"small": small, "large": large}
+        self.calls = []
+
+    def __call__(self, contexts, tier):
+        self.calls.append((tier, sorted(contexts)))
+        return {
+            key: {"relevance_score": self.scores[tier][key], "model_tier": tier}
+            for key in contexts
+            if key in self.scores[tier]
+        }
+
+
+@pytest.fixture
+def processor(tmp_path):
+    broker = FakeBroker()
+    return ArxivStreamProcessor(
+        "localhost:9092", "test", "test", "test",
+        llm_cache_path=None,
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+        dedup_path=None,
+        near_duplicate_path=None,
+        clients={
+            "producer": FakeProducer(broker),
+            "consumer": FakeConsumer(broker),
+            "admin": FakeAdminClient(broker),
+            "llm": FakeAnthropic(latency_ms=0, jitter_ms=0),
+        },
+    )
+
+
+def test_without_tiers_only_the_large_model_scores(processor):
+    scorer = ScriptedScorer(small={}, large={"company": 40, "vision": 90, "language": 10})
+    results = processor._score_with_tiers(CONTEXTS, scorer)
+    assert scorer.calls == [("large", ["company", "language", "vision"])]
+    assert {key: idea["model_tier"] for key, idea in results.items()} == dict.fromkeys(
+        CONTEXTS, "large"
+    )
+
+
+def test_only_uncertain_or_missing_small_scores_escalate(processor):
+    processor.model_tiers = {"small_model": "small", "uncertainty_band": [35, 75]}
+    scorer = ScriptedScorer(
+        small={"company": 35, "vision": 90},
+        large={"company": 20, "language": 60},
+    )
+    results = processor._score_with_tiers(CONTEXTS, scorer)
+
+    # 35 is inside the (inclusive) band; "language" had no valid small score
+    assert scorer.calls == [
+        ("small", ["company", "language", "vision"]),
+        ("large", ["company", "language"]),
+    ]
+    assert results["company"] == {"relevance_score": 20, "model_tier": "large"}
+    assert results["vision"] == {"relevance_score": 90, "model_tier": "small"}
+    assert results["language"] == {"relevance_score": 60, "model_tier": "large"}
+    # Results keep the contexts' order
+    assert list(results) == list(CONTEXTS)
+
+
+def test_failed_escalation_keeps_the_small_score(processor):
+    processor.model_tiers = {"small_model": "small", "uncertainty_band": [35, 75]}
+    scorer = ScriptedScorer(small={"company": 50, "vision": 10}, large={})
+    results = processor._score_with_tiers(CONTEXTS, scorer)
+    assert results == {
+        "company": {"relevance_score": 50, "model_tier": "small"},
+        "vision": {"relevance_score": 10, "model_tier": "small"},
+    }
+
+
+def test_tier_settings_pick_the_model_and_answer_deterministically(processor):
+    assert processor._tier_settings("small", 8) == {}
+    processor.model_tiers = {"small_model": "small", "uncertainty_band": [35, 75]}
+    assert processor._tier_settings("small", 8) == {
+        "model": "small", "max_tokens": 8, "temperature": 0.0
+    }
+    assert processor._tier_settings("large", 8)["model"] == processor.llm_client.model
+    processor.model_tiers["large_model"] = "large"
+    assert processor._tier_settings("large", 8)["model"] == "large"
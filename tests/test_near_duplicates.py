@@ -0,0 +1,84 @@
+import pytest
+
+from near_duplicates import NearDuplicateIndex
+
+DAY = 24 * 3600
+
+ABSTRACT = (
+    "We propose a sparse mixture of experts transformer that routes each token to "
+    "two experts and matches the quality of a dense model at a third of the "
+    "training compute on language modelling and machine translation benchmarks "
+    "while keeping inference latency within ten percent of the dense baseline"
+)
+REVISED = ABSTRACT.replace("ten percent", "twelve percent") + " code is available"
+UNRELATED = (
+    "A graph neural network predicts protein ligand binding affinity from docked "
+    "complexes and outperforms physics based scoring functions on three held out "
+    "drug discovery benchmarks with far fewer labelled examples than prior work"
+)
+
+
+def test_revised_text_matches_and_returns_its_value():
+    index = NearDuplicateIndex()
+    index.add("2410.00001v1", index.signature(ABSTRACT), {"relevance_score": 73})
+
+    match = index.query(index.signature(REVISED))
+    assert match is not None
+    key, similarity, value = match
+    assert key == "2410.00001v1"
+    assert similarity >= index.threshold
+    assert value == {"relevance_score": 73}
+    assert index.query(index.signature(UNRELATED)) is None
+
+
+def test_best_match_wins_and_exclude_skips_the_item_itself():
+    index = NearDuplicateIndex()
+    index.add("revised", index.signature(REVISED), 1)
+    index.add("original", index.signature(ABSTRACT), 2)
+
+    assert index.query(index.signature(ABSTRACT))[0] == "original"
+    assert index.query(index.signature(ABSTRACT), exclude="original")[0] == "revised"
+
+
+def test_short_texts_are_never_compared():
+    index = NearDuplicateIndex()
+    assert index.signature("Attention is all you need") is None
+    index.add("short", None, 1)
+    assert len(index) == 0
+    assert index.query(None) is None
+
+
+def test_similarity_tracks_jaccard():
+    index = NearDuplicateIndex(num_perm=256, bands=32)
+    first = index.signature(ABSTRACT)
+    assert NearDuplicateIndex.similarity(first, first) == 1.0
+    assert NearDuplicateIndex.similarity(first, index.signature(UNRELATED)) < 0.2
+
+
+def test_entries_expire_after_the_window(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "near.db"), window_seconds=DAY, expire_every=2)
+    now = 1_700_000_000.0
+    index.add("old", index.signature(ABSTRACT), 1, seen_at=now)
+
+    assert index.query(index.signature(ABSTRACT), now=now + DAY - 1)[0] == "old"
+    assert index.query(index.signature(ABSTRACT), now=now + DAY + 1) is None
+
+    # Expired rows are deleted every ``expire_every`` adds
+    index.add("new", index.signature(UNRELATED), 2, seen_at=now + DAY + 1)
+    assert len(index) == 1
+    index.close()
+
+
+def test_workers_share_an_index_file(tmp_path):
+    path = str(tmp_path / "near.db")
+    writer = NearDuplicateIndex(path)
+    reader = NearDuplicateIndex(path)
+    writer.add("2410.00001v1", writer.signature(ABSTRACT), {"score": 1})
+    assert reader.query(reader.signature(REVISED))[2] == {"score": 1}
+    writer.close()
+    reader.close()
+
+
+def test_bands_must_divide_the_signature():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=64, bands=10)
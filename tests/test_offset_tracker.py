@@ -0,0 +1,59 @@
+from offset_tracker import PartitionOffsetTracker
+
+
+def drained_offsets(tracker, done):
+    return [(partition, offset) for _, partition, offset, _ in tracker.drain(done.__contains__)]
+
+
+def test_drain_stops_at_first_unfinished_offset():
+    tracker = PartitionOffsetTracker()
+    for offset in range(5):
+        tracker.add("papers", 0, offset, offset)
+
+    done = {0, 1, 3, 4}
+    assert drained_offsets(tracker, done) == [(0, 0), (0, 1)]
+    # 3 and 4 are finished but stay behind the unfinished 2
+    assert tracker.in_flight() == 3
+    assert drained_offsets(tracker, done) == []
+
+    done.add(2)
+    assert drained_offsets(tracker, done) == [(0, 2), (0, 3), (0, 4)]
+    assert tracker.in_flight() == 0
+
+
+def test_partitions_drain_independently():
+    tracker = PartitionOffsetTracker()
+    tracker.add("papers", 0, 10, "a")
+    tracker.add("papers", 0, 11, "b")
+    tracker.add("papers", 1, 20, "c")
+
+    assert drained_offsets(tracker, {"b", "c"}) == [(1, 20)]
+    assert drained_offsets(tracker, {"a", "b"}) == [(0, 10), (0, 11)]
+
+
+def test_commit_offset_never_passes_unfinished_work():
+    tracker = PartitionOffsetTracker()
+    for offset in range(100):
+        tracker.add("papers", 0, offset, offset)
+
+    committed = 0
+    finished = set()
+    # Finish in reverse order; the committable offset only moves at the end
+    for offset in reversed(range(100)):
+        finished.add(offset)
+        for _, _, drained, _ in tracker.drain(finished.__contains__):
+            committed = drained + 1
+        unfinished = set(range(100)) - finished
+        if unfinished:
+            assert committed <= min(unfinished)
+    assert committed == 100
+
+
+def test_forget_drops_a_revoked_partition():
+    tracker = PartitionOffsetTracker()
+    tracker.add("papers", 0, 0, "a")
+    tracker.add("papers", 1, 0, "b")
+
+    assert tracker.forget("papers", 0) == ["a"]
+    assert tracker.forget("papers", 0) == []
+    assert tracker.pending_items() == ["b"]
@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip("confluent_kafka")
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+
+from arxiv_stream_processor import ArxivStreamProcessor
+from fakes import (
+    FakeAdminClient,
+    FakeAnthropic,
+    FakeBroker,
+    FakeConsumer,
+    FakeLogReader,
+    FakeProducer,
+    FakeTopicPartition,
+)
+
+INPUT_TOPIC = "arxiv_papers"
+STATE_TOPIC = "arxiv_partition_state"
+
+
+def make_processor(broker, state_dir, **options):
+    state_dir.mkdir()
+    return ArxivStreamProcessor(
+        "localhost:9092", "test", "test", "test",
+        llm_cache_path=None,
+        checkpoint_path=str(state_dir / "checkpoint.json"),
+        dedup_path=None,
+        near_duplicate_path=None,
+        partition_state_topic=STATE_TOPIC,
+        clients={
+            "producer": FakeProducer(broker),
+            "consumer": FakeConsumer(broker),
+            "state_consumer": FakeLogReader(broker),
+            "admin": FakeAdminClient(broker),
+            "llm": FakeAnthropic(),
+        },
+        **options,
+    )
+
+
+def move(source, target, partitions):
+    source._on_revoke(source.consumer, partitions)
+    target._on_assign(target.consumer, partitions)
+
+
+def test_dedup_history_follows_a_partition_to_another_processor(tmp_path):
+    broker = FakeBroker(num_partitions=2)
+    first = make_processor(broker, tmp_path / "first")
+    second = make_processor(broker, tmp_path / "second")
+    papers = [FakeTopicPartition(INPUT_TOPIC, 0)]
+
+    first._on_assign(first.consumer, papers + [FakeTopicPartition(INPUT_TOPIC, 1)])
+    first._mark_processed(INPUT_TOPIC, 0, ["http://arxiv.org/abs/2410.00001v1"])
+    first._mark_processed(INPUT_TOPIC, 1, ["http://arxiv.org/abs/2410.00002v1"])
+
+    move(first, second, papers)
+    assert "2410.00001v1" in second._dedup_for(INPUT_TOPIC, 0)
+    # Only the moved partition's history comes along
+    assert "2410.00002v1" not in second._dedup_for(INPUT_TOPIC, 0)
+
+    second._mark_processed(INPUT_TOPIC, 0, ["http://arxiv.org/abs/2410.00003v1"])
+    move(second, first, papers)
+    assert "2410.00001v1" in first._dedup_for(INPUT_TOPIC, 0)
+    assert "2410.00003v1" in first._dedup_for(INPUT_TOPIC, 0)
+
+
+def test_fetch_stage_view_reads_published_snapshots(tmp_path):
+    broker = FakeBroker(num_partitions=2)
+    scorer = make_processor(broker, tmp_path / "scorer")
+    papers = [FakeTopicPartition(INPUT_TOPIC, 1)]
+    scorer._on_assign(scorer.consumer, papers)
+    scorer._mark_processed(INPUT_TOPIC, 1, ["http://arxiv.org/abs/2410.00004v1"])
+    scorer._on_revoke(scorer.consumer, papers)
+
+    fetcher = make_processor(broker, tmp_path / "fetcher", dedup_read_only=True)
+    assert "http://arxiv.org/abs/2410.00004v1" in fetcher.processed_paper_ids
+    assert "http://arxiv.org/abs/2410.00005v1" not in fetcher.processed_paper_ids
+    assert broker.size(STATE_TOPIC) == 1
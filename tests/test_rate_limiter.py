@@ -0,0 +1,47 @@
+import pytest
+
+import heartbeat
+from rate_limiter import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def waits(monkeypatch):
+    waits = []
+    monkeypatch.setattr(heartbeat, "sleep", waits.append)
+    return waits
+
+
+def test_bucket_starts_full_then_charges_waits():
+    bucket = TokenBucket(rate_per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    # Refilled at one token per second
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(2) == pytest.approx(3.0, abs=0.05)
+
+
+def test_oversized_requests_wait_for_a_full_bucket_only():
+    bucket = TokenBucket(rate_per_minute=60, capacity=10)
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(1000) == pytest.approx(10.0, abs=0.05)
+
+
+def test_limiter_waits_for_the_tighter_budget(waits):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    limiter.acquire(tokens=600)
+    assert waits == []
+
+    # One request is free again after a second; 300 tokens only after 30
+    limiter.acquire(tokens=300)
+    assert waits == [pytest.approx(30.0, abs=0.05)]
+
+
+def test_unlimited_budgets_never_wait(waits):
+    limiter = RateLimiter()
+    for _ in range(1000):
+        limiter.acquire(tokens=10000)
+    assert waits == []
+
+
+def test_token_estimate():
+    assert RateLimiter.estimate_tokens("") == 1
+    assert RateLimiter.estimate_tokens("x" * 400) == 100
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from scoring_cascade import ScoringCascade
+
+CONTEXTS = {
+    "company": {"industry": "Artificial Intelligence"},
+    "project": {"name": "Multi-modal AI Systems"},
+}
+
+
+class FixedSimilarity:
+    """Stands in for the fitted PaperFilter with one similarity per context"""
+
+    def __init__(self, similarities):
+        self.similarities = similarities
+
+    def score_contexts(self, papers):
+        return [dict(self.similarities) for _ in papers]
+
+
+def make_cascade(**options):
+    options = {"path": None, "target_recall": 0.9, "min_relevant_samples": 10, **options}
+    return ScoringCascade({}, CONTEXTS, **options)
+
+
+def test_threshold_keeps_target_recall_of_relevant_samples():
+    cascade = make_cascade()
+    rows = [(i / 100, 1.0) for i in range(1, 101)]
+    threshold = cascade._recall_threshold(rows)
+    assert threshold == 0.11
+    assert sum(1 for similarity, _ in rows if similarity >= threshold) == 90
+
+
+def test_no_threshold_until_enough_relevant_samples():
+    cascade = make_cascade()
+    assert cascade._recall_threshold([(0.5, 1.0)] * 9) == 0.0
+
+
+def test_explored_samples_count_with_inverse_rate_weight():
+    cascade = make_cascade()
+    relevant = [(0.5, 1.0)] * 50
+    # One relevant paper found by exploration stands for 20 unexplored ones
+    assert cascade._recall_threshold(relevant + [(0.01, 1.0)]) == 0.5
+    assert cascade._recall_threshold(relevant + [(0.01, 20.0)]) == 0.01
+
+
+def test_select_gates_and_explores_below_threshold():
+    cascade = make_cascade(explore_rate=0.25)
+    cascade.paper_filter = FixedSimilarity({"company": 0.6, "project": 0.1})
+    cascade.thresholds = {"company": 0.5, "project": 0.5}
+    cascade._random = random.Random(0)
+
+    explored = 0
+    for _ in range(400):
+        selected, samples = cascade.select({"id": "2410.00001v1"})
+        assert samples["company"] == (0.6, 1.0)
+        if "project" in selected:
+            assert samples["project"] == (0.1, 4.0)
+            explored += 1
+    assert 60 < explored < 140
+    assert cascade.stats == {"called": 400 + explored, "skipped": 400 - explored}
+
+
+def test_calibration_uses_relevant_samples_for_the_current_context(tmp_path):
+    path = str(tmp_path / "prefilter.db")
+    cascade = make_cascade(path=path, relevant_score=50)
+    for i in range(1, 21):
+        cascade.record({"company": (i / 20, 1.0)}, [("company", {"relevance_score": 80})])
+        # Irrelevant papers do not move the threshold
+        cascade.record({"company": (0.99, 1.0)}, [("company", {"relevance_score": 10})])
+    cascade.calibrate()
+    assert cascade.thresholds["company"] == 0.15
+    assert cascade.thresholds["project"] == 0.0
+    cascade.close()
+
+    # Another worker sharing the database calibrates from the same samples
+    restarted = make_cascade(path=path)
+    restarted.calibrate()
+    assert restarted.thresholds["company"] == 0.15
+    restarted.close()
+
+    # Samples scored against an earlier version of a context are ignored
+    changed = ScoringCascade(
+        {}, {**CONTEXTS, "company": {"industry": "Robotics"}},
+        path=path, target_recall=0.9, min_relevant_samples=10,
+    )
+    changed.calibrate()
+    assert changed.thresholds["company"] == 0.0
+    changed.close()
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from serialization import (
+    CONTENT_ENCODING_HEADER,
+    CONTENT_TYPE_HEADER,
+    SCHEMA_VERSION,
+    SCHEMA_VERSION_HEADER,
+    MessageCodec,
+    TopicCodecs,
+)
+
+RECORD = {
+    "id": "http://arxiv.org/abs/2410.01234v1",
+    "title": "Ünïcode title",
+    "authors": ["A. Author", "B. Author"],
+    "score": 73,
+    "nested": {"ratio": 0.5, "flags": [True, False, None]},
+}
+
+FORMATS = [
+    ("json", None),
+    ("json", "zstd"),
+    ("msgpack", None),
+    ("msgpack", "zstd"),
+]
+
+
+def make_codec(format, compression):
+    if format == "msgpack":
+        pytest.importorskip("msgpack")
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    return MessageCodec(format, compression)
+
+
+class FakeMessage:
+    def __init__(self, value, headers):
+        self._value = value
+        self._headers = headers
+
+    def value(self):
+        return self._value
+
+    def headers(self):
+        return self._headers
+
+
+@pytest.mark.parametrize("format,compression", FORMATS)
+def test_round_trip(format, compression):
+    codec = make_codec(format, compression)
+    value, headers = codec.encode(RECORD)
+    assert MessageCodec.decode(value, headers) == RECORD
+
+
+@pytest.mark.parametrize("format,compression", FORMATS)
+def test_headers_describe_the_encoding(format, compression):
+    codec = make_codec(format, compression)
+    _, headers = codec.encode(RECORD)
+    meta = dict(headers)
+    assert meta[CONTENT_TYPE_HEADER] == f"application/{format}".encode()
+    assert meta[SCHEMA_VERSION_HEADER] == str(SCHEMA_VERSION).encode()
+    if compression:
+        assert meta[CONTENT_ENCODING_HEADER] == compression.encode()
+    else:
+        assert CONTENT_ENCODING_HEADER not in meta
+
+
+def test_encode_returns_a_fresh_header_list():
+    codec = MessageCodec()
+    _, headers = codec.encode(RECORD)
+    headers.append(("traceparent", b"00-x"))
+    _, again = codec.encode(RECORD)
+    assert ("traceparent", b"00-x") not in again
+
+
+def test_messages_without_headers_are_json():
+    value = json.dumps(RECORD).encode("utf-8")
+    assert MessageCodec.decode(value, None) == RECORD
+    assert MessageCodec.decode(value, []) == RECORD
+
+
+def test_string_header_values_are_accepted():
+    value, headers = MessageCodec().encode(RECORD)
+    headers = [(key, val.decode()) for key, val in headers]
+    assert MessageCodec.decode(value, headers) == RECORD
+
+
+def test_newer_schema_version_is_rejected():
+    value, headers = MessageCodec().encode(RECORD)
+    headers = [
+        (key, str(SCHEMA_VERSION + 1).encode() if key == SCHEMA_VERSION_HEADER else val)
+        for key, val in headers
+    ]
+    with pytest.raises(ValueError):
+        MessageCodec.decode(value, headers)
+
+
+def test_unknown_format_or_compression_is_rejected():
+    with pytest.raises(ValueError):
+        MessageCodec("avro")
+    with pytest.raises(ValueError):
+        MessageCodec("json", "gzip")
+
+
+def test_topic_codecs_pick_per_topic_format():
+    pytest.importorskip("zstandard")
+    codecs = TopicCodecs({"topics": {"papers": {"format": "json", "compression": "zstd"}}})
+    assert codecs.compresses("papers")
+    assert not codecs.compresses("research_ideas")
+
+    value, headers = codecs.encode("papers", RECORD)
+    assert TopicCodecs.decode(FakeMessage(value, headers)) == RECORD
+    # Output topics stay plain JSON for the dashboard
+    value, headers = codecs.encode("research_ideas", RECORD)
+    assert json.loads(value) == RECORD
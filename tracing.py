@@ -0,0 +1,213 @@
+"""Lightweight per-stage tracing spans, propagated through Kafka headers.
+
+Trace context travels in a W3C ``traceparent`` header, so one paper or post
+can be followed from fetch to its output topics. Finished spans are written
+as Chrome trace events (open the file in Perfetto or ``chrome://tracing``),
+one file per process.
+
+Tracing is off unless ``PIPELINE_TRACE_DIR`` is set; disabled spans are a
+shared no-op. ``PIPELINE_TRACE_SAMPLE_RATE`` (default 1.0) samples new traces.
+"""
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import List, Optional, Tuple
+
+TRACEPARENT_HEADER = "traceparent"
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def traceparent(self) -> bytes:
+        return f"00-{self.trace_id}-{self.span_id}-01".encode()
+
+
+class _NoopSpan:
+    context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext,
+                 parent_id: Optional[str], attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = 0.0
+        self._previous = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start = time.time()
+        self._previous = self.tracer._swap_current(self.context)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer._swap_current(self._previous)
+        if exc_type is not None:
+            self.attributes["error"] = repr(exc)
+        self.tracer.record(self.name, self.context, self.parent_id, self.start,
+                           time.time(), self.attributes)
+        return False
+
+
+class Tracer:
+    """Creates spans and appends them to ``<directory>/trace-<pid>.json``"""
+
+    def __init__(self, directory: Optional[str] = None, sample_rate: float = 1.0,
+                 flush_interval: float = 1.0):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.enabled = bool(directory)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._last_flush = time.time()
+        self._file = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(
+            os.getenv("PIPELINE_TRACE_DIR") or None,
+            float(os.getenv("PIPELINE_TRACE_SAMPLE_RATE", "1.0")),
+        )
+
+    @staticmethod
+    def _new_id(bits: int) -> str:
+        return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+    def current(self) -> Optional[SpanContext]:
+        return getattr(self._local, "current", None)
+
+    def _swap_current(self, context: Optional[SpanContext]) -> Optional[SpanContext]:
+        previous = getattr(self._local, "current", None)
+        self._local.current = context
+        return previous
+
+    def span(self, name: str, parent: Optional[SpanContext] = None, **attributes):
+        """Context manager timing one stage.
+
+        The parent is ``parent`` if given, else the span active on this
+        thread; without either a new trace is started (subject to sampling).
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = parent or self.current()
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return NOOP_SPAN
+            context = SpanContext(self._new_id(128), self._new_id(64))
+            return Span(self, name, context, None, attributes)
+        return Span(self, name, SpanContext(parent.trace_id, self._new_id(64)),
+                    parent.span_id, attributes)
+
+    def record(self, name: str, context: SpanContext, parent_id: Optional[str],
+               start: float, end: float, attributes: Optional[dict] = None):
+        """Write a finished span, e.g. one timed before it was known to be of interest"""
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": int(start * 1e6),
+            "dur": max(0, int((end - start) * 1e6)),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {
+                "trace_id": context.trace_id,
+                "span_id": context.span_id,
+                "parent_id": parent_id,
+                **(attributes or {}),
+            },
+        }
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self._buffer.append(line)
+            if time.time() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def record_child(self, name: str, parent: Optional[SpanContext], start: float,
+                     end: float, **attributes):
+        """Record an already-finished span under ``parent`` (skipped without one)"""
+        if not self.enabled or parent is None:
+            return
+        context = SpanContext(parent.trace_id, self._new_id(64))
+        self.record(name, context, parent.span_id, start, end, attributes)
+
+    def _flush_locked(self):
+        self._last_flush = time.time()
+        if not self._buffer:
+            return
+        try:
+            if self._file is None or self._pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                self._pid = os.getpid()
+                path = os.path.join(self.directory, f"trace-{self._pid}.json")
+                self._file = open(path, "w")
+                self._file.write("[\n")
+                self._file.write(",\n".join(self._buffer))
+            else:
+                self._file.write(",\n" + ",\n".join(self._buffer))
+            self._file.flush()
+        except OSError as e:
+            logging.error(f"Error writing trace events: {e}")
+        self._buffer = []
+
+    def close(self):
+        """Flush buffered spans and terminate the JSON array"""
+        with self._lock:
+            # Later spans (e.g. from daemon threads) would reopen and truncate the file
+            self.enabled = False
+            self._flush_locked()
+            if self._file is not None:
+                self._file.write("\n]\n")
+                self._file.close()
+                self._file = None
+
+    def inject(self, headers: Optional[List[Tuple[str, bytes]]],
+               context: Optional[SpanContext]) -> Optional[List[Tuple[str, bytes]]]:
+        """Kafka headers with ``context`` added as ``traceparent``"""
+        if context is None:
+            return headers
+        return [*(headers or []), (TRACEPARENT_HEADER, context.traceparent())]
+
+    def extract(self, headers: Optional[List]) -> Optional[SpanContext]:
+        """Span context from a consumed message's ``traceparent`` header"""
+        if not self.enabled or not headers:
+            return None
+        for key, value in headers:
+            if key == TRACEPARENT_HEADER and value:
+                parts = (value.decode() if isinstance(value, bytes) else value).split("-")
+                if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+                    return SpanContext(parts[1], parts[2])
+        return None
+
+
+TRACER = Tracer.from_env()
+atexit.register(TRACER.close)
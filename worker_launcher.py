@@ -0,0 +1,115 @@
+import logging
+import os
+import signal
+from typing import Callable, Dict, Optional
+
+import heartbeat as stage_heartbeat
+from profiling import install_profiler_hook
+from tracing import TRACER
+
+
+def _request_stop(signum, frame):
+    # Stage loops only catch Exception, so SystemExit unwinds them; ignore
+    # further signals so a second one cannot interrupt the cleanup
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise SystemExit(0)
+
+
+def _run_stage(name: str, index: int, heartbeat, build: Callable, run: Callable,
+               metrics_port: Optional[int] = None, metrics_host: str = "127.0.0.1"):
+    """Run one stage in this worker process until it exits or is told to stop.
+
+    ``heartbeat`` is a shared ``multiprocessing.Value`` the supervisor reads to
+    tell a live worker from a wedged one; the stage loop beats it (see
+    ``heartbeat.py``). SIGTERM stops the stage and closes
+    the processor so finished work is committed before exit; SIGINT is left
+    to the supervisor so Ctrl-C shuts the pipeline down in order. SIGUSR1
+    takes a sampling profile. With ``metrics_port`` the worker serves its
+    metrics on that port of ``metrics_host``.
+    """
+    logging.basicConfig(level=logging.INFO)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _request_stop)
+    install_profiler_hook()
+    if heartbeat is not None:
+        stage_heartbeat.install(
+            heartbeat, float(os.getenv("PIPELINE_HEARTBEAT_SECONDS", "5"))
+        )
+
+    if metrics_port:
+        from metrics import start_metrics_server
+
+        start_metrics_server(metrics_port, metrics_host)
+
+    logging.info(f"Starting {name} worker {index} (pid {os.getpid()})")
+    processor = build()
+    try:
+        run(processor)
+    finally:
+        logging.info(f"Stopping {name} worker {index}")
+        processor.close()
+        TRACER.close()
+
+
+def _arxiv_processor(processor_config: Dict):
+    from arxiv_stream_processor import ArxivStreamProcessor
+
+    return ArxivStreamProcessor(**processor_config)
+
+
+def _reddit_processor(processor_config: Dict):
+    from reddit_stream_processor import RedditStreamProcessor
+
+    return RedditStreamProcessor(**processor_config)
+
+
+def run_arxiv_fetch_worker(
+    index: int, processor_config: Dict, process_kwargs: Dict, heartbeat=None,
+    metrics_port: Optional[int] = None, metrics_host: str = "127.0.0.1",
+):
+    """Entry point for the arXiv fetch stage"""
+    _run_stage(
+        "arxiv_fetch", index, heartbeat,
+        lambda: _arxiv_processor(processor_config),
+        lambda processor: processor.stream_papers_to_kafka(**process_kwargs),
+        metrics_port, metrics_host,
+    )
+
+
+def run_idea_worker(
+    index: int, processor_config: Dict, process_kwargs: Dict, heartbeat=None,
+    metrics_port: Optional[int] = None, metrics_host: str = "127.0.0.1",
+):
+    """Entry point for one idea-scoring consumer in the ``arxiv_processor`` group"""
+    _run_stage(
+        "idea_scoring", index, heartbeat,
+        lambda: _arxiv_processor(processor_config),
+        lambda processor: processor.process_ideas(**process_kwargs),
+        metrics_port, metrics_host,
+    )
+
+
+def run_reddit_fetch_worker(
+    index: int, processor_config: Dict, process_kwargs: Dict, heartbeat=None,
+    metrics_port: Optional[int] = None, metrics_host: str = "127.0.0.1",
+):
+    """Entry point for the Reddit fetch stage"""
+    _run_stage(
+        "reddit_fetch", index, heartbeat,
+        lambda: _reddit_processor(processor_config),
+        lambda processor: processor.stream_reddit_data(**process_kwargs),
+        metrics_port, metrics_host,
+    )
+
+
+def run_sentiment_worker(
+    index: int, processor_config: Dict, process_kwargs: Dict, heartbeat=None,
+    metrics_port: Optional[int] = None, metrics_host: str = "127.0.0.1",
+):
+    """Entry point for one sentiment consumer in the ``reddit_processor`` group"""
+    _run_stage(
+        "sentiment", index, heartbeat,
+        lambda: _reddit_processor(processor_config),
+        lambda processor: processor.process_sentiment(**process_kwargs),
+        metrics_port, metrics_host,
+    )